@@ -0,0 +1,73 @@
+# benchmarks/import_time.py
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Optional, Tuple
+
+# --- PRESUPUESTO DE TIEMPO DE IMPORTACIÓN ---
+# Cada módulo de entrada se importa en un intérprete nuevo con `python -X importtime` (sin cachés del proceso)
+# y se comprueba (1) que su tiempo acumulado de importación no supere el presupuesto y (2) que no haya
+# cargado ninguna dependencia que no le corresponde (google.adk fuera del modo agente, markdown/lxml fuera
+# de la compilación de CVs, pandas en la línea de comandos). Termina con código 1 si algo se sale.
+#
+#   python -m benchmarks.import_time
+#   python -m benchmarks.import_time --scale 2    # presupuestos x2 en una máquina lenta o compartida
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPEATS = 3
+AGENT_MODULES = ("google.adk", "google.genai", "dotenv")
+CV_COMPILE_MODULES = ("markdown", "lxml")
+
+# Módulo -> (presupuesto en ms, prefijos de módulos que no debe cargar).
+BUDGETS: Dict[str, Tuple[float, Tuple[str, ...]]] = {
+    "incident_agent.cli": (50.0, ("pandas", "numpy") + AGENT_MODULES + CV_COMPILE_MODULES),
+    "incident_agent.direct": (1000.0, AGENT_MODULES + CV_COMPILE_MODULES),
+    "incident_agent.batch": (1000.0, AGENT_MODULES + CV_COMPILE_MODULES),
+    "incident_agent.service": (1000.0, AGENT_MODULES + CV_COMPILE_MODULES),
+    "incident_agent.sharding": (1000.0, AGENT_MODULES + CV_COMPILE_MODULES),
+}
+
+_IMPORTTIME_LINE = re.compile(r"^import time:\s+\d+ \|\s+(\d+) \| (\S+)$", re.MULTILINE)
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    """Tiempo acumulado (ms) de `import module` en un intérprete nuevo y los módulos de primer nivel cargados."""
+    code = f"import sys, {module}; print('\\n'.join(sorted(sys.modules)))"
+    completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    # La línea sin sangría del propio módulo acumula todo lo que su importación cargó (no el arranque del intérprete).
+    cumulative_us = sum(int(match.group(1)) for match in _IMPORTTIME_LINE.finditer(completed.stderr) if match.group(2) == module)
+    return cumulative_us / 1000, completed.stdout.split()
+
+
+def check(scale: float = 1.0, repeats: int = REPEATS) -> List[str]:
+    failures = []
+    print(f"{'módulo':<28}{'ms (mín)':>10}{'presupuesto':>13}")
+    for module, (budget_ms, forbidden) in BUDGETS.items():
+        runs = [measure(module) for _ in range(repeats)]
+        elapsed_ms, loaded = min(run[0] for run in runs), runs[0][1]
+        limit = budget_ms * scale
+        print(f"{module:<28}{elapsed_ms:>10.1f}{limit:>13.1f}")
+        if elapsed_ms > limit: failures.append(f"{module}: {elapsed_ms:.1f} ms > {limit:.1f} ms")
+        leaked = sorted({name for name in loaded for prefix in forbidden if name == prefix or name.startswith(prefix + ".")})
+        if leaked: failures.append(f"{module}: importa {', '.join(leaked[:5])}{' ...' if len(leaked) > 5 else ''}")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Comprueba el presupuesto de tiempo de importación de los puntos de entrada.")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiplica todos los presupuestos (máquinas lentas).")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    args = parser.parse_args(argv)
+    failures = check(args.scale, args.repeats)
+    if failures:
+        print("\n" + "\n".join(f"❌ REGRESIÓN: {line}" for line in failures))
+        return 1
+    print("\n✅ Importaciones dentro del presupuesto.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
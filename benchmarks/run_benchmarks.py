@@ -0,0 +1,253 @@
+# benchmarks/run_benchmarks.py
+
+import argparse
+import collections
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks import synthetic_data
+from incident_agent.tools import cv_store, data_loaders, detection_engine, orchestrator_tools, profiling, snapshot_cache
+
+# --- BENCHMARK DEL PIPELINE DE DETECCIÓN ---
+# Genera datasets sintéticos (benchmarks/synthetic_data.py) a distintas escalas y mide cada etapa del pipeline:
+# compilación de CVs, lectura de files.json, caché columnar, motor de detección, detectores por fuente y el
+# análisis completo. Tiempo de pared, CPU y pico de memoria salen de incident_agent/tools/profiling.py.
+# Los resultados se comparan con benchmarks/baseline.json: una etapa más lenta o más pesada que la tolerancia,
+# o un conteo de incidencias distinto, es una regresión y el proceso termina con código 1. No usa red.
+#
+# Los tiempos de la línea base son razones frente a una calibración (una carga fija de Python, numpy y pandas
+# que se mide al arrancar), así la tolerancia vale en cualquier máquina; la máquina se guarda solo como referencia.
+# El motor y la referencia por fuente reciben todas las tablas de los CVs (`to_cv_patterns(all_tables=True)`):
+# con la proyección del pipeline no se evaluarían las reglas de horario, volumen ni vacíos esperados.
+#
+#   python -m benchmarks.run_benchmarks                        # escalas tiny y small contra la línea base
+#   python -m benchmarks.run_benchmarks --scales medium large  # 1.000 y 10.000 fuentes (varios minutos)
+#   python -m benchmarks.run_benchmarks --update-baseline      # re-graba la línea base en esta máquina
+
+SCALES = {"tiny": 10, "small": 100, "medium": 1000, "large": 10000}
+DEFAULT_SCALES = ["tiny", "small"]
+BENCHMARK_DATE = "2025-09-12"
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+BASELINE_VERSION = 2
+CALIBRATION_REPEATS = 5
+
+# Una etapa regresiona si supera `línea base * tolerancia + piso`. El piso absorbe el ruido de las etapas cortas.
+TIME_TOLERANCE = 1.5
+TIME_FLOOR_S = 0.05
+MEMORY_TOLERANCE = 1.5
+MEMORY_FLOOR_MB = 5.0
+# La implementación de referencia (detectors.py, fuente por fuente) es cuadrática en la práctica: se omite en escalas mayores.
+PER_SOURCE_MAX_SOURCES = 1000
+# Desde esta escala el dataset debe activar todas las reglas del motor (en "tiny" hay muy pocas fuentes para todas).
+EXERCISED_RULES = ("Duplicated File (Flag)", "Failed File", "File Upload After Schedule", "Historical Duplicate", "Intraday Duplicate",
+                   "Missing File", "Previous Period Upload", "Unexpected Empty File", "Unexpected Volume Variation")
+COVERAGE_MIN_SOURCES = 100
+
+
+def calibrate() -> float:
+    """Segundos (mínimo de varias repeticiones) de una carga fija: la unidad de los tiempos de la línea base."""
+    values = np.random.default_rng(0).random(1_000_000)
+    best = float("inf")
+    for _ in range(CALIBRATION_REPEATS):
+        start = time.perf_counter()
+        np.sort(values)
+        pd.Series(values).groupby((values * 1000).astype(np.int64)).sum()
+        sum(i * i for i in range(300_000))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _stage(results: Dict[str, Dict[str, Any]], name: str, rows: Optional[int] = None):
+    """Tramo de primer nivel del benchmark; el registro se recoge al final con `_collect`."""
+    results[name] = {}
+    return profiling.span(name, "benchmark", rows=rows)
+
+
+def _collect(results: Dict[str, Dict[str, Any]], calibration_s: float) -> None:
+    for record in profiling.build_report()["spans"]:
+        if record["category"] != "benchmark" or record["name"] not in results: continue
+        results[record["name"]].update({"wall_s": record["wall_s"], "cpu_s": record["cpu_s"], "wall_ratio": round(record["wall_s"] / calibration_s, 4),
+                                        "peak_mb": record["peak_mb"], "rows": record["rows"]})
+
+
+def _count_by_type(incidents: List[Dict[str, Any]]) -> Dict[str, int]:
+    return dict(sorted(collections.Counter(incident["incident_type"] for incident in incidents).items()))
+
+
+def _all_tables_cv_patterns(store: cv_store.CVBaselineStore, source_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    cv_patterns_by_source = {}
+    for source_id in source_ids:
+        baseline = store.get(source_id)
+        cv_patterns_by_source[source_id] = baseline.to_cv_patterns(all_tables=True) if baseline else {"cv_type": "Error"}
+    return cv_patterns_by_source
+
+
+def run_scale(scale: str, n_sources: int, data_dir: str, calibration_s: float, files_per_source: int = 20, seed: int = 7) -> Dict[str, Any]:
+    """
+    Genera el dataset de la escala en `data_dir` y mide cada etapa sobre él, con todas las cachés en frío.
+    `expected` trae, por etapa, los conteos del motor sobre la misma proyección de CVs (deben coincidir).
+    """
+    config = synthetic_data.SyntheticConfig(n_sources=n_sources, files_per_source=files_per_source, dates=[BENCHMARK_DATE],
+                                            full_day_names=True, seed=seed)
+    shutil.rmtree(data_dir, ignore_errors=True)
+    summary = synthetic_data.generate(data_dir, config)
+    data_loaders.DATA_BASE_PATH = data_dir
+    cv_store._default_stores.clear()
+    profiling.reset()
+
+    snapshot_dir = data_loaders.get_snapshot_dir(BENCHMARK_DATE)
+    daily_path, historical_path = os.path.join(snapshot_dir, "files.json"), os.path.join(snapshot_dir, "files_last_weekday.json")
+    stages: Dict[str, Dict[str, Any]] = {}
+    incidents: Dict[str, Dict[str, int]] = {}
+
+    source_ids = data_loaders.get_all_source_ids()
+    with _stage(stages, "cv_compile", rows=len(source_ids)):
+        store = cv_store.get_default_store(); store.warm(source_ids)
+    with _stage(stages, "process_files_json") as step:
+        step.rows = len(data_loaders.process_files_json(daily_path, BENCHMARK_DATE))
+    with _stage(stages, "snapshot_cache_build"):
+        for path in (daily_path, historical_path): snapshot_cache.build_snapshot_cache(path)
+    with _stage(stages, "snapshot_cache_load") as step:
+        daily_files_df = snapshot_cache.load_files_frame(daily_path, BENCHMARK_DATE)
+        historical_files_df = snapshot_cache.load_files_frame(historical_path, BENCHMARK_DATE)
+        step.rows = len(daily_files_df) + len(historical_files_df)
+
+    cv_patterns_by_source = _all_tables_cv_patterns(store, source_ids)
+    with _stage(stages, "detection_engine", rows=len(daily_files_df)):
+        incidents["detection_engine"] = _count_by_type(detection_engine.run_all_detectors(daily_files_df, historical_files_df, cv_patterns_by_source, BENCHMARK_DATE))
+    if n_sources <= PER_SOURCE_MAX_SOURCES:
+        with _stage(stages, "per_source_detectors", rows=len(daily_files_df)):
+            incidents["per_source_detectors"] = _count_by_type(detection_engine.run_per_source_detectors(daily_files_df, historical_files_df, cv_patterns_by_source, BENCHMARK_DATE))
+    with _stage(stages, "run_full_analysis", rows=len(daily_files_df)):
+        incidents["run_full_analysis"] = _count_by_type(orchestrator_tools.run_full_analysis(BENCHMARK_DATE))
+    # El análisis completo usa la proyección del pipeline (solo estadísticas de archivos): se compara con el motor sobre esa misma proyección.
+    pipeline_counts = _count_by_type(detection_engine.run_all_detectors(daily_files_df, historical_files_df,
+                                                                        orchestrator_tools._cv_patterns_by_source(store, source_ids), BENCHMARK_DATE))
+
+    _collect(stages, calibration_s)
+    return {"sources": n_sources, "files_per_source": files_per_source, "seed": seed,
+            "records": summary["snapshots"][BENCHMARK_DATE], "stages": stages, "incidents": incidents,
+            "expected": {"per_source_detectors": incidents["detection_engine"], "run_full_analysis": pipeline_counts}}
+
+
+def _machine() -> Dict[str, Any]:
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+
+
+def load_baseline(path: str = BASELINE_PATH) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f: baseline = json.load(f)
+        if baseline.get("version") == BASELINE_VERSION: return baseline
+        logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: Línea base '{path}' con otro formato; se ignora.")
+    except FileNotFoundError: pass
+    return {"version": BASELINE_VERSION, "machine": None, "scales": {}}
+
+
+def save_baseline(results: Dict[str, Dict[str, Any]], calibration_s: float, path: str = BASELINE_PATH) -> None:
+    """Re-graba en la línea base las escalas medidas; las demás escalas se conservan."""
+    baseline = load_baseline(path)
+    baseline["machine"], baseline["calibration_s"] = _machine(), round(calibration_s, 6)
+    # Solo razones, memoria y filas: los segundos absolutos dependen de la máquina.
+    for scale, result in results.items():
+        stages = {stage: {name: measured[name] for name in ("wall_ratio", "peak_mb", "rows")} for stage, measured in result["stages"].items()}
+        baseline["scales"][scale] = {**{key: value for key, value in result.items() if key not in ("stages", "expected")}, "stages": stages}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(baseline, f, indent=2, ensure_ascii=False); f.write("\n")
+    os.replace(tmp_path, path)
+
+
+def compare(scale: str, result: Dict[str, Any], reference: Dict[str, Any], calibration_s: float) -> List[str]:
+    """Regresiones de `result` frente a la línea base de la escala (lista vacía si no hay). Los tiempos se comparan como razones."""
+    regressions = []
+    if (result["sources"], result["files_per_source"], result["seed"]) != (reference["sources"], reference["files_per_source"], reference["seed"]):
+        return [f"{scale}: el dataset no coincide con el de la línea base (use --update-baseline)."]
+    for stage, expected in reference["incidents"].items():
+        found = result["incidents"].get(stage)
+        if found is not None and found != expected: regressions.append(f"{scale}/{stage}: incidencias {found} != línea base {expected}")
+    for stage, measured in result["stages"].items():
+        expected = reference["stages"].get(stage)
+        if not expected: continue
+        time_limit = expected["wall_ratio"] * TIME_TOLERANCE + TIME_FLOOR_S / calibration_s
+        if measured["wall_ratio"] > time_limit:
+            regressions.append(f"{scale}/{stage}: {measured['wall_ratio']:.2f}u > {time_limit:.2f}u (línea base {expected['wall_ratio']:.2f}u; 1u = {calibration_s:.3f}s)")
+        memory_limit = expected["peak_mb"] * MEMORY_TOLERANCE + MEMORY_FLOOR_MB
+        if measured["peak_mb"] > memory_limit:
+            regressions.append(f"{scale}/{stage}: pico {measured['peak_mb']:.1f} MB > {memory_limit:.1f} MB (línea base {expected['peak_mb']:.1f} MB)")
+    return regressions
+
+
+def print_table(scale: str, result: Dict[str, Any], reference: Optional[Dict[str, Any]]) -> None:
+    print(f"\n=== {scale}: {result['sources']} fuentes, {result['records']['files.json']} registros en files.json ===")
+    print(f"{'etapa':<22}{'pared (s)':>11}{'CPU (s)':>10}{'pico (MB)':>11}{'filas':>10}{'filas/s':>12}{'vs base':>9}")
+    for stage, measured in result["stages"].items():
+        rows = measured.get("rows") or 0
+        throughput = f"{rows / measured['wall_s']:,.0f}" if rows and measured["wall_s"] else "-"
+        expected = (reference or {}).get("stages", {}).get(stage)
+        ratio = f"{measured['wall_ratio'] / expected['wall_ratio']:.2f}x" if expected and expected["wall_ratio"] else "-"
+        print(f"{stage:<22}{measured['wall_s']:>11.3f}{measured['cpu_s']:>10.3f}{measured['peak_mb']:>11.1f}{rows:>10}{throughput:>12}{ratio:>9}")
+    for stage, counts in result["incidents"].items(): print(f"  {stage}: {counts}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del pipeline de detección sobre datos sintéticos.")
+    parser.add_argument("--scales", nargs="+", default=DEFAULT_SCALES, choices=list(SCALES), help="Escalas a medir.")
+    parser.add_argument("--files-per-source", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--data-dir", help="Carpeta donde generar los datasets (se conservan). Por defecto, una temporal.")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Graba los resultados como nueva línea base en lugar de compararlos.")
+    parser.add_argument("--output", help="Escribe aquí los resultados completos (JSON).")
+    args = parser.parse_args(argv)
+
+    # Los logs por fuente del pipeline no aportan nada a estas escalas.
+    logging.basicConfig(level=logging.WARNING, format='%(message)s')
+    profiling.enable()
+    baseline = load_baseline(args.baseline)
+    calibration_s = calibrate()
+    print(f"Calibración: {calibration_s:.3f}s (1u en las razones de la línea base)")
+    if baseline["machine"] and baseline["machine"] != _machine() and not args.update_baseline:
+        logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: La línea base se grabó en otra máquina ({baseline['machine']}); se comparan razones frente a la calibración.")
+
+    results: Dict[str, Dict[str, Any]] = {}
+    regressions: List[str] = []
+    with tempfile.TemporaryDirectory(prefix="incident_bench_") as tmp_dir:
+        for scale in args.scales:
+            data_dir = os.path.join(args.data_dir or tmp_dir, scale)
+            results[scale] = run_scale(scale, SCALES[scale], data_dir, calibration_s, args.files_per_source, args.seed)
+            reference = baseline["scales"].get(scale)
+            print_table(scale, results[scale], reference)
+            # Las tres rutas de detección deben coincidir con el motor, haya o no línea base.
+            regressions += [f"{scale}/{stage}: incidencias {counts} != motor {results[scale]['expected'][stage]}"
+                            for stage, counts in results[scale]["incidents"].items() if stage in results[scale]["expected"] and counts != results[scale]["expected"][stage]]
+            if SCALES[scale] >= COVERAGE_MIN_SOURCES:
+                silent = [rule for rule in EXERCISED_RULES if rule not in results[scale]["incidents"]["detection_engine"]]
+                if silent: regressions.append(f"{scale}: el dataset sintético no activa las reglas {silent}")
+            if args.update_baseline: continue
+            if reference is None: print(f"  (sin línea base para '{scale}': use --update-baseline)"); continue
+            regressions += compare(scale, results[scale], reference, calibration_s)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f: json.dump({"machine": _machine(), "calibration_s": calibration_s, "scales": results}, f, indent=2, ensure_ascii=False)
+    if args.update_baseline and not regressions:
+        save_baseline(results, calibration_s, args.baseline)
+        print(f"\n💾 Línea base actualizada en '{args.baseline}' ({', '.join(results)}).")
+        return 0
+    if regressions:
+        print("\n" + "\n".join(f"❌ REGRESIÓN: {line}" for line in regressions))
+        return 1
+    print("\n✅ Sin regresiones frente a la línea base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
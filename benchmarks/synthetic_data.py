@@ -0,0 +1,218 @@
+# benchmarks/synthetic_data.py
+
+import argparse
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# --- GENERADOR DE DATOS SINTÉTICOS ---
+# Escribe una carpeta con la misma forma que data/: los CVs en datasource_cvs/ (Tipo A, con tablas, y Tipo B,
+# con "Volume Characteristics") y una foto diaria por fecha (<fecha>_20_00_UTC/files.json y files_last_weekday.json).
+# Todo sale de la semilla: la misma configuración genera exactamente los mismos archivos, sin red.
+#
+# El pipeline lee files_last_weekday.json con el mismo filtro por fecha que files.json: solo llegan a las reglas
+# los registros con uploaded_at del día analizado (con las fotos reales, el marco histórico queda vacío). Para que
+# la regla de duplicado histórico tenga con qué comparar, el generador agrega a esa foto, con fecha del día
+# analizado, una fracción (`historical_duplicate_rate`) de los archivos de hoy.
+
+DAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+FULL_DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+ENTITIES = ["Clube", "Donation", "Shop", "DataOnly", "WhiteLabel", "CBK", "Beneficios", "Saipos"]
+STATUS_MESSAGES = {
+    "stopped": "File duplicated. If you reprocess the records, the information will be duplicated within the source.",
+    "failure": "There are differences in the column structure between this file and the first uploaded file.",
+}
+FIRST_SOURCE_ID = 300000
+
+
+@dataclass
+class SyntheticConfig:
+    n_sources: int = 100
+    # Archivos por fuente y por día (en promedio; cada día varía un poco).
+    files_per_source: int = 20
+    dates: List[str] = field(default_factory=lambda: ["2025-09-12"])
+    # Días anteriores que también aparecen en cada files.json, como en las fotos reales.
+    history_days: int = 3
+    duplicate_rate: float = 0.02
+    intraday_duplicate_rate: float = 0.01
+    empty_rate: float = 0.05
+    failed_rate: float = 0.01
+    late_rate: float = 0.02
+    previous_period_rate: float = 0.01
+    historical_duplicate_rate: float = 0.02
+    # Fracción de días de una fuente con un volumen fuera del rango del CV (la mitad por arriba, la mitad por abajo).
+    # Solo se reportan en los CVs Tipo A: la regla de volumen no lee la columna 'Row Statistics' de los Tipo B (igual que con los reales).
+    volume_anomaly_rate: float = 0.1
+    # Archivos esperados por el CV que no llegan (activa "Missing File" con --full-day-names).
+    missing_rate: float = 0.02
+    # Fracción de CVs en formato Tipo B ("Volume Characteristics").
+    type_b_ratio: float = 0.3
+    # Los CVs reales usan 'Mon', 'Tue'...; con nombres completos se activan las reglas que dependen del día.
+    full_day_names: bool = False
+    seed: int = 7
+
+
+def _source_profile(config: SyntheticConfig, index: int) -> Dict[str, Any]:
+    rng = np.random.default_rng([config.seed, index])
+    return {
+        "source_id": str(FIRST_SOURCE_ID + index),
+        "type_b": bool(rng.random() < config.type_b_ratio),
+        "upload_hour": int(rng.integers(5, 15)),
+        "rows_mean": float(rng.choice([50, 2_000, 40_000, 150_000])),
+        "entity": ENTITIES[index % len(ENTITIES)],
+        "files_by_day": [max(0, int(round(config.files_per_source * factor))) for factor in rng.uniform(0.7, 1.3, size=7)],
+    }
+
+
+# --- CVs ---
+
+def _day_labels(config: SyntheticConfig) -> List[str]:
+    return FULL_DAYS if config.full_day_names else DAYS
+
+
+def _stats_cell(values: Dict[str, Any]) -> str:
+    return "<br>".join(f"• {name}: {value}" for name, value in values.items())
+
+
+def render_cv(config: SyntheticConfig, profile: Dict[str, Any]) -> str:
+    """Markdown del CV con las secciones y tablas que usan los CVs reales (Tipo A o Tipo B)."""
+    days, hour = _day_labels(config), profile["upload_hour"]
+    name = f"Synthetic_{profile['entity']}_{profile['source_id']}"
+    lines = [f"# {name}", "", "    ## Metadata", f"    - **Resource ID**: {profile['source_id']}", "    - **Workspace ID**: 9999", "",
+             f"    Datasource CV: '{name}'", "", "## **1. Filename Patterns**", "",
+             f"- Generic structure  \n  `{{randomId}}_{profile['entity']}_report_batch_{{batchNo}}_{{yyyymmdd}}.csv`", "",
+             "## **2. Upload Schedule and File Processing Patterns**", "",
+             "- **File Processing Statistics by Day**: The following table presents key metrics about file processing:", "",
+             "| Day | Mean Files | Median Files | Mode Files | StdDev Files | Min Files | Max Files |",
+             "|-----|------------|--------------|------------|--------------|-----------|-----------|"]
+    for day, n in zip(days, profile["files_by_day"]):
+        lines.append(f"| {day} | {n} | {n} | {n} | {max(1, n // 10)} | {int(n * 0.8)} | {int(n * 1.2) + 1} |")
+    lines += ["", "- **Upload Schedule Patterns by Day**: This table shows the timing patterns for file uploads:", "",
+              "| Day | Upload Hour Slot Mean (UTC) | Upload Hour Slot Median (UTC) | Upload Hour Slot Mode (UTC) | Upload Hour Slot StdDev | Upload Time Window Expected |",
+              "|-----|---------------------------|----------------------------|--------------------------|----------------------|-----------------|"]
+    for day in days:
+        lines.append(f"| {day} | {hour:02d}:00 | {hour:02d}:00 | {hour:02d}:00 | 00 h 20 m | {hour:02d}:00:00–{hour + 1:02d}:00:00 UTC |")
+    daily_rows = [int(n * profile["rows_mean"]) for n in profile["files_by_day"]]
+    if profile["type_b"]:
+        lines += ["", "## **3. Volume Characteristics (Estimates)**", "", "Summary statistics calculated from the most recent 1,000 files", "",
+                  f"- Mean: {profile['rows_mean']:.2f}", "- Min: 0", f"- Max: {int(profile['rows_mean'] * 3)}",
+                  f"- Daily total median: {float(np.median(daily_rows)):.2f}", "",
+                  "## **4. Day-of-Week Summary (Core Reference)**", "",
+                  "| Day | Row Statistics | Empty Files Analysis | Processing Notes |", "|-----|----------------|---------------------|------------------|"]
+        for day, total in zip(days, daily_rows):
+            rows_cell = _stats_cell({"Min": f"{int(total * 0.5):,}", "Max": f"{int(total * 1.5):,}", "Mean": f"{total:,}"})
+            lines.append(f"| {day} | {rows_cell} | {_stats_cell({'Min': 0, 'Max': 1, 'Mean': 0.1})} | Synthetic |")
+    else:
+        lines += ["", "## **3. Day-of-Week Summary**", "",
+                  "| Day | Total Rows Processed | Empty Files | Duplicated Files | Failed Files | Analysis |",
+                  "|-----|----------------------|-------------|------------------|--------------|----------|"]
+        zeros = _stats_cell({"Min": 0, "Max": 0, "Mean": 0})
+        for day, total in zip(days, daily_rows):
+            rows_cell = _stats_cell({"Min": f"{int(total * 0.5):,}", "Max": f"{int(total * 1.5):,}", "Mean": f"{total:,}"})
+            lines.append(f"| {day} | {rows_cell} | {zeros} | {zeros} | {zeros} | Synthetic |")
+    return "\n".join(lines) + "\n"
+
+
+# --- Fotos diarias ---
+
+def day_records(config: SyntheticConfig, profile: Dict[str, Any], index: int, day: pd.Timestamp) -> List[Dict[str, Any]]:
+    """Archivos subidos por la fuente el día `day`. Son los mismos en todas las fotos donde aparece ese día."""
+    rng = np.random.default_rng([config.seed, index, int(day.value // 86_400_000_000_000)])
+    n = profile["files_by_day"][day.dayofweek]
+    if n == 0: return []
+    draw = rng.random((n, 6))
+    volume_factor = rng.choice([0.2, 3.0]) if rng.random() < config.volume_anomaly_rate else 1.0
+    rows = np.maximum(1, rng.lognormal(np.log(profile["rows_mean"] * volume_factor), 0.5, size=n)).astype(np.int64)
+    minutes = rng.integers(0, 60, size=n); seconds = rng.random(n) * 60
+    late = draw[:, 3] < config.late_rate
+    hours = np.where(late, np.minimum(profile["upload_hour"] + rng.integers(5, 9, size=n), 23), profile["upload_hour"])
+    reference = day - pd.Timedelta(days=1)
+    records = []
+    for i in range(n):
+        if draw[i, 5] < config.missing_rate: continue
+        status, is_duplicated, file_rows = "processed", False, int(rows[i])
+        if draw[i, 0] < config.empty_rate: status, file_rows = "empty", 0
+        elif draw[i, 1] < config.failed_rate: status = "failure"
+        elif draw[i, 2] < config.duplicate_rate: status, is_duplicated = "stopped", True
+        file_date = reference - pd.Timedelta(days=30) if draw[i, 4] < config.previous_period_rate else reference
+        uploaded_at = day + pd.Timedelta(hours=int(hours[i]), minutes=int(minutes[i]), seconds=float(seconds[i]))
+        records.append({
+            "filename": f"S{profile['source_id']}x{i:05d}_{profile['entity']}_report_batch_{i}_{file_date.strftime('%Y%m%d')}.csv",
+            "rows": file_rows, "status": status, "is_duplicated": is_duplicated,
+            "file_size": file_rows * 0.00029, "uploaded_at": uploaded_at.isoformat(timespec='microseconds'),
+            "status_message": STATUS_MESSAGES.get(status),
+        })
+    # Re-subidas del mismo archivo más tarde el mismo día (duplicados intradía).
+    for i in np.flatnonzero(rng.random(len(records)) < config.intraday_duplicate_rate):
+        again = dict(records[i]); again["uploaded_at"] = (pd.Timestamp(again["uploaded_at"]) + pd.Timedelta(minutes=37)).isoformat(timespec='microseconds')
+        records.append(again)
+    return records
+
+
+def historical_copies(config: SyntheticConfig, profile: Dict[str, Any], index: int, day: pd.Timestamp) -> List[Dict[str, Any]]:
+    """Archivos de hoy que también figuran en files_last_weekday.json (con fecha de hoy, ver el encabezado)."""
+    records = day_records(config, profile, index, day)
+    rng = np.random.default_rng([config.seed, index, int(day.value // 86_400_000_000_000), 1])
+    return [dict(records[i]) for i in np.flatnonzero(rng.random(len(records)) < config.historical_duplicate_rate)]
+
+
+def _write_snapshot(path: str, items) -> int:
+    """Misma forma que json.dump(..., indent=4), escrita fuente por fuente para no tener toda la foto en memoria. Devuelve los registros escritos."""
+    sources = records_written = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("{")
+        for source_id, records in items:
+            body = json.dumps(records, indent=4).replace("\n", "\n    ")
+            f.write(("\n" if sources == 0 else ",\n") + f"    {json.dumps(source_id)}: {body}")
+            sources += 1; records_written += len(records)
+        f.write("\n}" if sources else "}")
+    return records_written
+
+
+def generate(out_dir: str, config: SyntheticConfig) -> Dict[str, Any]:
+    """Genera el dataset en `out_dir` y devuelve un resumen (fuentes, registros por archivo, configuración)."""
+    profiles = [_source_profile(config, i) for i in range(config.n_sources)]
+    cv_dir = os.path.join(out_dir, "datasource_cvs"); os.makedirs(cv_dir, exist_ok=True)
+    for profile in profiles:
+        with open(os.path.join(cv_dir, f"{profile['source_id']}_native.md"), 'w', encoding='utf-8') as f: f.write(render_cv(config, profile))
+    summary: Dict[str, Any] = {"config": asdict(config), "sources": len(profiles), "snapshots": {}}
+    for date_str in config.dates:
+        target = pd.Timestamp(date_str, tz='UTC')
+        snapshot_dir = os.path.join(out_dir, f"{date_str}_20_00_UTC"); os.makedirs(snapshot_dir, exist_ok=True)
+        days = [target - pd.Timedelta(days=k) for k in range(config.history_days, -1, -1)]
+        daily = ((p["source_id"], [r for day in days for r in day_records(config, p, i, day)]) for i, p in enumerate(profiles))
+        last_weekday = target - pd.Timedelta(days=7)
+        weekly = ((p["source_id"], day_records(config, p, i, last_weekday) + historical_copies(config, p, i, target)) for i, p in enumerate(profiles))
+        summary["snapshots"][date_str] = {
+            "files.json": _write_snapshot(os.path.join(snapshot_dir, "files.json"), daily),
+            "files_last_weekday.json": _write_snapshot(os.path.join(snapshot_dir, "files_last_weekday.json"), weekly),
+        }
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera un dataset sintético con la estructura de data/.")
+    parser.add_argument("out_dir")
+    parser.add_argument("--sources", type=int, default=100)
+    parser.add_argument("--files-per-source", type=int, default=20)
+    parser.add_argument("--dates", nargs="+", default=["2025-09-12"])
+    parser.add_argument("--history-days", type=int, default=3)
+    parser.add_argument("--duplicate-rate", type=float, default=0.02)
+    parser.add_argument("--empty-rate", type=float, default=0.05)
+    parser.add_argument("--late-rate", type=float, default=0.02)
+    parser.add_argument("--historical-duplicate-rate", type=float, default=0.02)
+    parser.add_argument("--volume-anomaly-rate", type=float, default=0.1)
+    parser.add_argument("--missing-rate", type=float, default=0.02)
+    parser.add_argument("--type-b-ratio", type=float, default=0.3)
+    parser.add_argument("--full-day-names", action="store_true")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    config = SyntheticConfig(n_sources=args.sources, files_per_source=args.files_per_source, dates=args.dates, history_days=args.history_days,
+                             duplicate_rate=args.duplicate_rate, empty_rate=args.empty_rate, late_rate=args.late_rate, missing_rate=args.missing_rate,
+                             historical_duplicate_rate=args.historical_duplicate_rate, volume_anomaly_rate=args.volume_anomaly_rate,
+                             type_b_ratio=args.type_b_ratio, full_day_names=args.full_day_names, seed=args.seed)
+    print(json.dumps(generate(args.out_dir, config)["snapshots"], indent=4))
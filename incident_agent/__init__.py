@@ -1 +1,8 @@
-from . import agent
\ No newline at end of file
+# El agente (y con él google.adk) se importa solo cuando alguien lo pide,
+# así el modo directo puede usar incident_agent.tools sin cargar el SDK.
+import importlib
+
+def __getattr__(name):
+    if name == "agent":
+        return importlib.import_module(f"{__name__}.agent")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,70 @@
+# incident_agent/batch.py
+
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from .tools import cv_store, data_loaders, orchestrator_tools
+
+# --- EJECUCIÓN POR LOTES (VARIAS FECHAS / REPROCESOS) ---
+# Reparte las fechas entre un pool de procesos. El almacén de CVs se compila una sola vez en el
+# proceso principal y cada worker lo carga desde disco al arrancar, así ninguna fecha re-parsea CVs.
+
+def resolve_dates(start: Optional[str] = None, end: Optional[str] = None) -> List[str]:
+    """Fechas con foto diaria en data/, opcionalmente acotadas a [start, end] (ambas inclusive)."""
+    dates = data_loaders.list_snapshot_dates()
+    if start and end:
+        for day in pd.date_range(start, end, freq="D").strftime("%Y-%m-%d"):
+            if day not in dates: logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: No hay foto diaria para {day}. Se omite.")
+    # Las fechas ISO se ordenan igual como texto que como fecha.
+    return [date_str for date_str in dates if (not start or date_str >= start) and (not end or date_str <= end)]
+
+
+def _init_worker(data_base_path: str, log_level: int) -> None:
+    # Con 'spawn' el worker no hereda el estado del padre: se replica la configuración mínima.
+    data_loaders.DATA_BASE_PATH = data_base_path
+    logging.basicConfig(level=log_level, format='%(message)s')
+    cv_store.get_default_store()
+
+
+def _analyze_date(date_str: str) -> List[Dict[str, Any]]:
+    try:
+        return orchestrator_tools.run_full_analysis(date_str)
+    except Exception as e:
+        logging.error(f"Error al analizar la fecha {date_str}: {e}")
+        return [{"incident_type": "Process Error", "description": f"Falló el análisis de la fecha: {e}", "date": date_str}]
+
+
+def run_batch(dates: Iterable[str], workers: Optional[int] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Analiza cada fecha en paralelo y devuelve {fecha: incidencias}, en el orden de `dates`."""
+    dates = list(dates)
+    if not dates: return {}
+    logging.info(f"\n🚀 === INICIANDO LOTE DE {len(dates)} FECHAS ({dates[0]} → {dates[-1]}) === 🚀")
+    cv_stats = cv_store.get_default_store().warm(data_loaders.get_all_source_ids())
+    logging.info(f"--- Líneas base de CVs listas para los workers ({cv_stats['compiled']} compiladas).")
+    workers = min(workers or os.cpu_count() or 1, len(dates))
+    if workers == 1:
+        return {date_str: _analyze_date(date_str) for date_str in dates}
+    init_args = (data_loaders.DATA_BASE_PATH, logging.getLogger().getEffectiveLevel())
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+        return dict(zip(dates, pool.map(_analyze_date, dates)))
+
+
+def write_batch_outputs(results: Dict[str, List[Dict[str, Any]]], output_dir: str) -> List[str]:
+    """Escribe un archivo `incidents_<fecha>.json` por fecha y devuelve sus rutas."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for date_str, incidents in results.items():
+        path = os.path.join(output_dir, f"incidents_{date_str}.json")
+        with open(path, 'w', encoding='utf-8') as f: json.dump(incidents, f, indent=4)
+        paths.append(path)
+    return paths
+
+
+def merged_incidents(results: Dict[str, List[Dict[str, Any]]]) -> Iterable[Dict[str, Any]]:
+    """Recorre las incidencias de todas las fechas como un único flujo, en orden de fecha."""
+    for incidents in results.values(): yield from incidents
@@ -0,0 +1,267 @@
+# incident_agent/cli.py
+
+import argparse
+import logging
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Optional
+
+# --- LÍNEA DE COMANDOS (python -m incident_agent <subcomando>) ---
+# Este módulo solo importa la biblioteca estándar: pandas, el motor de detección y google.adk se cargan
+# dentro del subcomando que los necesita, así `--help` o una comprobación corta del planificador arrancan
+# en milisegundos. El agente (y GOOGLE_API_KEY) solo se piden con `analyze --agent`.
+#
+#   python -m incident_agent analyze --date 2025-09-12            # modo directo, sin LLM
+#   python -m incident_agent analyze --date 2025-09-12 --agent    # a través del agente
+#   python -m incident_agent analyze --date 2025-09-12 --format ndjson   # una incidencia por línea, en streaming
+#   python -m incident_agent analyze --date 2025-09-12 --summary         # solo conteos por tipo y severidad
+#   python -m incident_agent batch --start 2025-09-08 --end 2025-09-12 --output-dir out/
+#   python -m incident_agent warm-cache cv snapshots
+#   python -m incident_agent watch --sink sqlite:incidents.db
+#   python -m incident_agent shard --date 2025-09-12 --shards 4 --output-dir shards/
+#   python -m incident_agent cache-stats
+
+DEFAULT_DATE = "2025-09-08"
+ENV_PATH = os.path.join("incident_agent", ".env")
+WARM_TARGETS = ("cv", "snapshots", "history")
+OUTPUT_FORMATS = ("json", "ndjson")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # Las opciones comunes se aceptan antes o después del subcomando.
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--json-only", action="store_true", default=argparse.SUPPRESS, help="Solo imprime el JSON final, sin logs de proceso.")
+    common.add_argument("--profile", nargs="?", const="profile.json", default=argparse.SUPPRESS,
+                        help="Mide tiempos, CPU, memoria y filas por fase, archivo, CV y detector, y escribe el reporte JSON (por defecto profile.json).")
+    common.add_argument("--profile-trace", default=argparse.SUPPRESS, help="Además del reporte, escribe los tramos en formato Chrome trace.")
+
+    parser = argparse.ArgumentParser(prog="incident_agent", parents=[common], description="Detección de incidencias sobre las fotos diarias de data/.")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="{analyze,batch,warm-cache,watch,shard,merge-shards,cache-stats}")
+
+    analyze = commands.add_parser("analyze", parents=[common], help="Analiza una fecha (sin agente salvo --agent).")
+    analyze.add_argument("--date", default=DEFAULT_DATE, help="Fecha a analizar (YYYY-MM-DD).")
+    analyze.add_argument("--agent", action="store_true", help="Ejecuta el análisis a través del agente (requiere GOOGLE_API_KEY en incident_agent/.env).")
+    analyze.add_argument("--incremental", action="store_true", help="Modo intradía: solo los archivos nuevos desde la última ejecución de la fecha.")
+    analyze.add_argument("--close-day", action="store_true", help="Con --incremental, evalúa además archivos faltantes y variación de volumen.")
+    analyze.add_argument("--format", choices=OUTPUT_FORMATS, default="json", help="json: un array (por defecto); ndjson: una incidencia por línea.")
+    analyze.add_argument("--summary", action="store_true", help="En lugar de las incidencias, imprime los conteos por tipo y severidad.")
+    analyze.set_defaults(handler=_analyze)
+
+    batch = commands.add_parser("batch", parents=[common], help="Analiza varias fechas en paralelo (sin agente).")
+    batch.add_argument("--start", help="Primera fecha del lote (YYYY-MM-DD, inclusive).")
+    batch.add_argument("--end", help="Última fecha del lote (YYYY-MM-DD, inclusive).")
+    batch.add_argument("--workers", type=int, help="Procesos del lote (por defecto, uno por CPU).")
+    batch.add_argument("--output-dir", help="Escribe un incidents_<fecha>.json por fecha aquí en lugar de un único JSON combinado.")
+    batch.set_defaults(handler=_batch)
+
+    warm = commands.add_parser("warm-cache", parents=[common], help="Pre-calienta las cachés de data/.cache y termina.")
+    warm.add_argument("targets", nargs="*", choices=WARM_TARGETS, default=["cv", "snapshots"],
+                      help="cv: almacén de líneas base; snapshots: caché columnar; history: índice de nombres (por defecto: cv snapshots).")
+    warm.add_argument("--start", help="Con history: primera fecha a ingresar.")
+    warm.add_argument("--end", help="Con history: última fecha a ingresar.")
+    warm.set_defaults(handler=_warm_cache)
+
+    watch = commands.add_parser("watch", parents=[common], help="Servicio de larga vida: analiza cada foto diaria nueva o modificada.")
+    watch.add_argument("--sink", default="stdout", help="stdout, jsonl:<ruta> o sqlite:<ruta>.")
+    watch.add_argument("--workers", type=int, help="Procesos de detección (por defecto, uno por CPU).")
+    watch.add_argument("--interval", type=float, default=5.0, help="Segundos entre sondeos.")
+    watch.add_argument("--debounce", type=float, default=2.0, help="Segundos sin cambios antes de encolar una fecha.")
+    watch.add_argument("--queue-size", type=int, default=8, help="Fechas pendientes como máximo antes de frenar el sondeo.")
+    watch.add_argument("--metrics-file", help="Escribe aquí las métricas del servicio (JSON) en cada sondeo.")
+    watch.set_defaults(handler=_watch)
+
+    shard = commands.add_parser("shard", parents=[common], help="Ejecuta una partición de fuentes (un nodo) o, sin --index, todas como procesos locales.")
+    shard.add_argument("--date", default=DEFAULT_DATE, help="Fecha a analizar (YYYY-MM-DD).")
+    shard.add_argument("--shards", type=int, required=True, help="Número total de particiones.")
+    shard.add_argument("--index", type=int, help="Partición a ejecutar (0..N-1). Sin ella se ejecutan todas y se combinan.")
+    shard.add_argument("--output-dir", required=True, help="Carpeta (compartida entre nodos) para los resultados de cada partición.")
+    shard.add_argument("--workers", type=int, help="Sin --index: procesos locales (por defecto, uno por CPU).")
+    shard.set_defaults(handler=_shard)
+
+    merge = commands.add_parser("merge-shards", parents=[common], help="Combina los resultados de las particiones de una fecha en orden.")
+    merge.add_argument("--date", default=DEFAULT_DATE, help="Fecha a combinar (YYYY-MM-DD).")
+    merge.add_argument("--shards", type=int, required=True, help="Número total de particiones.")
+    merge.add_argument("--output-dir", required=True, help="Carpeta con los resultados de las particiones.")
+    merge.add_argument("--wait", type=float, default=0.0, help="Segundos a esperar por las particiones que falten.")
+    merge.set_defaults(handler=_merge_shards)
+
+    stats = commands.add_parser("cache-stats", parents=[common], help="Muestra aciertos, fallos y desalojos de la caché de resultados por fuente.")
+    stats.add_argument("--clear", action="store_true", help="Vacía la caché de resultados (las estadísticas acumuladas se conservan).")
+    stats.set_defaults(handler=_cache_stats)
+    return parser
+
+
+# --- Subcomandos (cada uno importa solo lo que usa) ---
+
+def _write_incidents(incidents: Iterable[Any], args: argparse.Namespace) -> None:
+    """Escribe las incidencias a medida que llegan en el formato pedido; la descripción se arma recién aquí."""
+    from . import direct
+    from .tools import incidents as records
+    if args.summary:
+        import json
+        print(json.dumps(records.summarize(incidents), indent=4))
+    elif args.format == "ndjson": records.write_ndjson(incidents)
+    else: direct.write_incidents_json(incidents)
+
+
+def _analyze(args: argparse.Namespace) -> int:
+    if args.agent:
+        if args.summary or args.format != "json": logging.warning("--- ↳ ⚠️  ADVERTENCIA: --format y --summary no aplican con --agent; se imprime el JSON del agente.")
+        return _analyze_with_agent(args.date)
+    from . import direct
+    if args.incremental:
+        from .tools import orchestrator_tools
+        _write_incidents(orchestrator_tools.run_incremental_analysis(args.date, close_day=args.close_day), args)
+        return 0
+    _write_incidents(direct.iter_analysis(args.date), args)
+    logging.info("\n✅ === WORKFLOW COMPLETADO === ✅")
+    return 0
+
+
+def _batch(args: argparse.Namespace) -> int:
+    from . import batch, direct
+    if getattr(args, "profile", None) or getattr(args, "profile_trace", None):
+        if args.workers != 1:
+            # Los tramos se registran en el proceso que los ejecuta: el lote perfilado corre en serie.
+            logging.warning("--- ↳ ⚠️  ADVERTENCIA: Con --profile el lote corre con un solo worker.")
+            args.workers = 1
+    results = batch.run_batch(batch.resolve_dates(args.start, args.end), workers=args.workers)
+    if args.output_dir:
+        for path in batch.write_batch_outputs(results, args.output_dir): logging.info(f"--- 💾 {path}")
+    else:
+        direct.write_incidents_json(batch.merged_incidents(results))
+    logging.info("\n✅ === LOTE COMPLETADO === ✅")
+    return 0
+
+
+def _warm_cache(args: argparse.Namespace) -> int:
+    from .tools import data_loaders
+    if "cv" in args.targets:
+        from .tools import cv_store
+        store = cv_store.get_default_store()
+        stats = store.warm(data_loaders.get_all_source_ids())
+        logging.info(f"✅ Almacén de CVs listo en '{store.store_path}': {stats}")
+    if "snapshots" in args.targets:
+        from .tools import snapshot_cache
+        for path in snapshot_cache.warm_snapshot_caches(): logging.info(f"--- 💾 {path}")
+        logging.info("✅ Caché columnar de fotos diarias lista.")
+    if "history" in args.targets:
+        from . import batch
+        from .tools import filename_index
+        ingested = filename_index.ingest_dates(batch.resolve_dates(args.start, args.end))
+        logging.info(f"✅ Índice de nombres actualizado: {len(ingested)} fechas nuevas.")
+    return 0
+
+
+def _watch(args: argparse.Namespace) -> int:
+    import asyncio
+    from . import service
+    watch_service = service.WatchService(service.make_sink(args.sink), workers=args.workers, queue_size=args.queue_size,
+                                         interval=args.interval, debounce=args.debounce, metrics_path=args.metrics_file)
+    try:
+        asyncio.run(watch_service.run())
+    except KeyboardInterrupt:
+        logging.info(f"\n✅ === SERVICIO DETENIDO === ✅ {watch_service.metrics}")
+    return 0
+
+
+def _shard(args: argparse.Namespace) -> int:
+    from . import direct, sharding
+    if args.index is not None:
+        if not 0 <= args.index < args.shards:
+            logging.critical(f"ERROR: --index debe estar entre 0 y {args.shards - 1}.")
+            return 2
+        sharding.run_shard(args.date, args.index, args.shards, args.output_dir)
+        return 0
+    incidents, problems = sharding.run_local(args.date, args.shards, args.output_dir, workers=args.workers)
+    direct.write_incidents_json(incidents)
+    return 1 if problems else 0
+
+
+def _merge_shards(args: argparse.Namespace) -> int:
+    from . import direct, sharding
+    incidents, problems = sharding.merge_shards(args.date, args.shards, args.output_dir, wait=args.wait)
+    direct.write_incidents_json(incidents)
+    # La salida se escribe igual (con un "Process Error" por partición), pero el código de salida marca el fallo.
+    return 1 if problems else 0
+
+
+def _cache_stats(args: argparse.Namespace) -> int:
+    import json
+    from .tools import result_cache
+    cache = result_cache.get_default_cache()
+    if args.clear: cache.clear(); cache.save()
+    print(json.dumps(cache.report(), indent=4))
+    return 0
+
+
+# --- Modo agente ---
+
+async def run_agent_analysis(date_to_analyze: str, agent=None) -> str:
+    """Ejecuta el análisis a través del agente y devuelve el texto de su respuesta final."""
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from google.genai.types import Content, Part
+    if agent is None:
+        from .agent import root_agent as agent
+
+    session_service = InMemorySessionService()
+    runner = Runner(agent=agent, app_name="incident_factory_app", session_service=session_service)
+    session_id = f"daily_run_{date_to_analyze}"
+    await session_service.create_session(app_name=runner.app_name, user_id="system_supervisor", session_id=session_id)
+    initial_prompt = f"Ejecuta el análisis completo para la fecha '{date_to_analyze}'."
+
+    logging.info(f"💬 Enviando orden al agente: '{initial_prompt}'")
+    content = Content(role="user", parts=[Part(text=initial_prompt)])
+    final_response_text = ""
+    async for event in runner.run_async(user_id="system_supervisor", session_id=session_id, new_message=content):
+        if event.is_final_response() and event.content and event.content.parts:
+            if event.content.parts[0].function_response:
+                 final_response_text = str(event.content.parts[0].function_response.response)
+            else: # Si el agente responde con texto por algún error
+                 final_response_text = event.content.parts[0].text
+            break
+    return final_response_text
+
+
+def _analyze_with_agent(date_to_analyze: str) -> int:
+    import ast
+    import asyncio
+    import json
+    from dotenv import load_dotenv
+    load_dotenv(ENV_PATH)
+    if not os.getenv("GOOGLE_API_KEY"):
+        logging.critical("ERROR: La variable GOOGLE_API_KEY no está en incident_agent/.env")
+        return 1
+    if os.name == 'nt':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+    logging.info(f"\n🚀 === INICIANDO ANÁLISIS DE INCIDENCIAS PARA LA FECHA: {date_to_analyze} === 🚀")
+    final_response_text = asyncio.run(run_agent_analysis(date_to_analyze))
+    logging.info("\n✅ === WORKFLOW COMPLETADO === ✅")
+    try:
+        all_incidents = ast.literal_eval(final_response_text)
+        # El print final es el único que no es un log, es el resultado.
+        print(json.dumps(all_incidents, indent=4))
+    except Exception as e:
+        logging.error("\nNo se pudo procesar la respuesta final del agente.")
+        logging.error(f"Error de parseo: {e}")
+        # Si hay un error, imprimimos la respuesta en bruto para depurar
+        print(f'{{"error": "Failed to parse agent response", "raw_response": "{final_response_text}"}}')
+        return 1
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # Si no es json-only, configuramos un logging visible. Si lo es, los logs se ocultarán.
+    logging.basicConfig(level=logging.CRITICAL if getattr(args, "json_only", False) else logging.INFO, format='%(message)s')
+
+    # --- Instrumentación: el reporte se escribe al terminar el proceso, sea cual sea el subcomando ---
+    profile_path, trace_path = getattr(args, "profile", None), getattr(args, "profile_trace", None)
+    if profile_path or trace_path:
+        import atexit
+        from .tools import profiling
+        profiling.enable()
+        atexit.register(profiling.write_reports, profile_path, trace_path)
+    return args.handler(args)
@@ -0,0 +1,41 @@
+# incident_agent/direct.py
+
+import json
+import logging
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO
+
+from .tools import orchestrator_tools
+from .tools.incidents import Incident, IncidentLike, as_dict
+
+# --- MODO DIRECTO (SIN LLM) ---
+# Ejecuta la herramienta orquestadora tal cual, sin agente, sin sesión y sin importar google.adk.
+# Produce exactamente las mismas incidencias que el agente, sin el viaje al modelo ni el re-parseo del texto.
+
+def run_analysis(date_str: str) -> List[Dict[str, Any]]:
+    """Ejecuta el análisis completo para la fecha y devuelve la lista de incidencias."""
+    logging.info(f"\n🚀 === INICIANDO ANÁLISIS DIRECTO (SIN AGENTE) PARA LA FECHA: {date_str} === 🚀")
+    return orchestrator_tools.run_full_analysis(date_str)
+
+
+def iter_analysis(date_str: str) -> Iterator[Incident]:
+    """Como `run_analysis`, pero entrega las incidencias una a una (registros compactos) para escribirlas en streaming."""
+    logging.info(f"\n🚀 === INICIANDO ANÁLISIS DIRECTO (SIN AGENTE) PARA LA FECHA: {date_str} === 🚀")
+    return orchestrator_tools.iter_full_analysis(date_str)
+
+
+def write_incidents_json(incidents: Iterable[IncidentLike], stream: Optional[TextIO] = None) -> int:
+    """
+    Escribe las incidencias como un array JSON, una a una, sin construir el texto completo en memoria.
+    El resultado es idéntico a `json.dumps(list(incidents), indent=4)`. Devuelve cuántas se escribieron.
+    """
+    # `sys.stdout` se resuelve al llamar (no al importar): así se respeta una salida redirigida después.
+    stream = stream or sys.stdout
+    count = 0
+    for incident in incidents:
+        body = json.dumps(as_dict(incident), indent=4).replace("\n", "\n    ")
+        stream.write(("[\n    " if count == 0 else ",\n    ") + body)
+        count += 1
+    stream.write("\n]\n" if count else "[]\n")
+    stream.flush()
+    return count
@@ -0,0 +1,289 @@
+# incident_agent/service.py
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Set, TextIO, Tuple
+
+from . import batch
+from .tools import cv_store, data_loaders, orchestrator_tools
+from .tools.incidents import write_ndjson
+
+# --- SERVICIO DE VIGILANCIA (ASYNCIO) ---
+# Proceso de larga vida que sondea data/ (o cualquier carpeta con la misma estructura) buscando fotos
+# diarias nuevas o modificadas y cambios en los CVs. Una ráfaga de escrituras se agrupa (debounce) y cada
+# fecha se encola una sola vez; la cola acotada frena el sondeo si los workers no dan abasto (backpressure).
+# La detección corre en un pool de procesos acotado, sin bloquear el loop, y las incidencias van a un sumidero.
+
+SERVICE_STATE_VERSION = 1
+SERVICE_STATE_FILENAME = "service_state.json"
+SNAPSHOT_FILES = ("files.json", "files_last_weekday.json")
+
+Signature = List[Optional[List[int]]]
+
+
+# --- Sumideros de incidencias ---
+
+class StdoutSink:
+    """Una línea JSON por incidencia (mismo formato que `--ndjson`) en la salida estándar o el flujo indicado."""
+
+    def __init__(self, stream: Optional[TextIO] = None):
+        # Sin flujo, sys.stdout se resuelve al escribir: respeta una redirección hecha después de crear el sumidero.
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, date_str: str, incidents: List[Dict[str, Any]]) -> None:
+        with self._lock: write_ndjson(incidents, self.stream or sys.stdout)
+
+    def close(self) -> None: pass
+
+
+class JsonlSink(StdoutSink):
+    """Añade una línea JSON por incidencia al archivo. Un re-análisis de la fecha vuelve a añadir sus incidencias."""
+
+    def __init__(self, path: str):
+        if os.path.dirname(path): os.makedirs(os.path.dirname(path), exist_ok=True)
+        super().__init__(open(path, 'a', encoding='utf-8'))
+
+    def close(self) -> None: self.stream.close()
+
+
+class SqliteSink:
+    """Tabla `incidents` en SQLite. Un re-análisis reemplaza las incidencias de esa fecha."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS incidents (date TEXT, source_id TEXT, incident_type TEXT, severity TEXT, description TEXT)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS incidents_date ON incidents (date)")
+        self.connection.commit()
+
+    def write(self, date_str: str, incidents: List[Dict[str, Any]]) -> None:
+        rows = [(date_str, i.get("source_id"), i.get("incident_type"), i.get("severity"), i.get("description")) for i in incidents]
+        with self._lock, self.connection:
+            self.connection.execute("DELETE FROM incidents WHERE date = ?", (date_str,))
+            self.connection.executemany("INSERT INTO incidents VALUES (?, ?, ?, ?, ?)", rows)
+
+    def close(self) -> None: self.connection.close()
+
+
+def make_sink(spec: str):
+    """'stdout', 'jsonl:<ruta>' o 'sqlite:<ruta>'."""
+    kind, _, path = spec.partition(":")
+    if kind == "stdout": return StdoutSink()
+    if kind == "jsonl" and path: return JsonlSink(path)
+    if kind == "sqlite" and path: return SqliteSink(path)
+    raise ValueError(f"Sumidero no reconocido: '{spec}' (use stdout, jsonl:<ruta> o sqlite:<ruta>)")
+
+
+# --- Firmas de lo vigilado ---
+
+def snapshot_signature(date_str: str) -> Signature:
+    """[mtime_ns, tamaño] de cada archivo de la foto diaria (None si no existe)."""
+    signature = []
+    for filename in SNAPSHOT_FILES:
+        try: fingerprint = data_loaders.file_fingerprint(os.path.join(data_loaders.get_snapshot_dir(date_str), filename))
+        except FileNotFoundError: signature.append(None); continue
+        signature.append([fingerprint["mtime_ns"], fingerprint["size"]])
+    return signature
+
+
+def cv_signature() -> Dict[str, List[int]]:
+    signature = {}
+    for source_id in data_loaders.get_all_source_ids():
+        try: fingerprint = data_loaders.file_fingerprint(data_loaders.get_cv_path(source_id))
+        except FileNotFoundError: continue
+        signature[source_id] = [fingerprint["mtime_ns"], fingerprint["size"]]
+    return signature
+
+
+def _scan() -> Tuple[Dict[str, Signature], Dict[str, List[int]]]:
+    return {date_str: snapshot_signature(date_str) for date_str in data_loaders.list_snapshot_dates()}, cv_signature()
+
+
+@dataclass
+class ServiceMetrics:
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    in_flight: int = 0
+    analyzed: int = 0
+    failed: int = 0
+    cv_reloads: int = 0
+    pool_restarts: int = 0
+    incidents: int = 0
+    last_duration_s: float = 0.0
+
+
+class WatchService:
+    """
+    Vigila las fotos diarias y los CVs y analiza cada fecha que cambia.
+    Una fecha se encola cuando su firma (mtime/tamaño de sus archivos) lleva `debounce` segundos sin cambiar
+    y difiere de la última analizada; las firmas analizadas se guardan en data/.cache/, así un reinicio
+    no re-analiza lo ya procesado. Un cambio de CV recompila sus líneas base y re-analiza la fecha más reciente.
+    Una fecha que falla vuelve a la cola tras una espera que se duplica con cada fallo seguido (de `retry_base`
+    a `retry_max` segundos); si un worker muere, el pool se reemplaza y la fecha se reintenta igual.
+    """
+
+    def __init__(self, sink, workers: Optional[int] = None, queue_size: int = 8, interval: float = 5.0,
+                 debounce: float = 2.0, metrics_path: Optional[str] = None, retry_base: float = 1.0, retry_max: float = 300.0):
+        self.sink = sink
+        self.workers = max(1, workers or os.cpu_count() or 1)
+        self.interval, self.debounce = interval, debounce
+        self.retry_base, self.retry_max = retry_base, retry_max
+        self.metrics_path = metrics_path
+        self.metrics = ServiceMetrics()
+        self.queue: "asyncio.Queue[Tuple[str, Signature]]" = asyncio.Queue(maxsize=queue_size)
+        self.state_path = os.path.join(data_loaders.get_cache_dir(), SERVICE_STATE_FILENAME)
+        self.done: Dict[str, Signature] = self._read_state()
+        self._busy: Set[str] = set()
+        self._pending: Dict[str, Tuple[Signature, float]] = {}
+        # Fallos seguidos por fecha, y las esperas de reintento en curso.
+        self._failures: Dict[str, int] = {}
+        self._retries: Set["asyncio.Task[None]"] = set()
+        self.pool: Optional[ProcessPoolExecutor] = None
+        # `_reload_cvs` (en otro hilo) reemplaza el pool: los envíos de los workers y el reemplazo no se cruzan.
+        self._pool_lock = threading.Lock()
+
+    # --- Estado persistente (firmas ya analizadas) ---
+
+    def _read_state(self) -> Dict[str, Signature]:
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f: state = json.load(f)
+            if state.get("version") == SERVICE_STATE_VERSION: return state["done"]
+        except (FileNotFoundError, ValueError): pass
+        return {}
+
+    def _write_state(self) -> None:
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = data_loaders.get_tmp_path(self.state_path)
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump({"version": SERVICE_STATE_VERSION, "done": self.done}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _publish_metrics(self) -> None:
+        depth = self.queue.qsize()
+        if depth != self.metrics.queue_depth: logging.info(f"--- 📥 Cola: {depth} fechas pendientes, {self.metrics.in_flight} en proceso.")
+        self.metrics.queue_depth = depth; self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, depth)
+        if self.metrics_path:
+            tmp_path = data_loaders.get_tmp_path(self.metrics_path)
+            with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(asdict(self.metrics), f)
+            os.replace(tmp_path, self.metrics_path)
+
+    # --- Sondeo ---
+
+    def _settled(self, key: str, signature: Any, now: float) -> bool:
+        """True cuando la firma lleva `debounce` segundos sin cambiar (una ráfaga de escrituras cuenta como una)."""
+        seen = self._pending.get(key)
+        if seen is None or seen[0] != signature: self._pending[key] = (signature, now); return False
+        return now - seen[1] >= self.debounce
+
+    async def _watch(self) -> None:
+        loop = asyncio.get_running_loop()
+        cv_done: Optional[Dict[str, List[int]]] = None
+        while True:
+            snapshots, cvs = await asyncio.to_thread(_scan)
+            now = loop.time()
+            if cv_done is None: cv_done = cvs
+            elif cvs != cv_done and self._settled("__cv__", cvs, now):
+                compiled = await asyncio.to_thread(self._reload_cvs, list(cvs))
+                logging.info(f"--- 📝 CVs modificados: {compiled} líneas base recompiladas.")
+                cv_done = cvs; self.metrics.cv_reloads += 1; self._pending.pop("__cv__", None)
+                if snapshots: self.done.pop(max(snapshots), None)
+            for date_str, signature in sorted(snapshots.items()):
+                if date_str in self._busy or self.done.get(date_str) == signature: continue
+                if not self._settled(date_str, signature, now): continue
+                self._pending.pop(date_str, None); self._busy.add(date_str)
+                # Con la cola llena este `put` espera: el sondeo se detiene hasta que un worker libere lugar.
+                await self.queue.put((date_str, signature))
+                self._publish_metrics()
+            self._publish_metrics()
+            await asyncio.sleep(self.interval)
+
+    # --- Workers ---
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        init_args = (data_loaders.DATA_BASE_PATH, logging.getLogger().getEffectiveLevel())
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=batch._init_worker, initargs=init_args)
+
+    def _reload_cvs(self, source_ids: List[str]) -> int:
+        """Recompila en el proceso principal los CVs que cambiaron y renueva el pool para que los workers los relean."""
+        store = cv_store.get_default_store(); compiled_before = store.stats["compiled"]
+        store.invalidate(); store.warm(source_ids)
+        # Los workers guardan las líneas base en memoria: el pool viejo termina lo que tiene en curso y se descarta.
+        with self._pool_lock:
+            old_pool, self.pool = self.pool, self._new_pool()
+            old_pool.shutdown(wait=False)
+        return store.stats["compiled"] - compiled_before
+
+    def _replace_broken_pool(self, broken: ProcessPoolExecutor) -> None:
+        # Todos los envíos en curso al pool roto fallan a la vez: solo el primer worker que se entera lo reemplaza.
+        with self._pool_lock:
+            if self.pool is not broken: return
+            self.pool = self._new_pool(); self.metrics.pool_restarts += 1
+        broken.shutdown(wait=False, cancel_futures=True)
+        logging.warning("--- ↳ ⚠️  ADVERTENCIA: Un worker del servicio terminó abruptamente; se creó un pool nuevo.")
+
+    def _retry_delay(self, failures: int) -> float:
+        return min(self.retry_base * 2 ** (failures - 1), self.retry_max)
+
+    async def _requeue_later(self, date_str: str, signature: Signature, delay: float) -> None:
+        # Tarea aparte (no un worker): esperar lugar en la cola llena no deja a nadie sin consumirla.
+        await asyncio.sleep(delay)
+        await self.queue.put((date_str, signature))
+        self._publish_metrics()
+
+    def _schedule_retry(self, date_str: str, signature: Signature) -> float:
+        failures = self._failures[date_str] = self._failures.get(date_str, 0) + 1
+        delay = self._retry_delay(failures)
+        task = asyncio.create_task(self._requeue_later(date_str, signature, delay))
+        self._retries.add(task); task.add_done_callback(self._retries.discard)
+        return delay
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            date_str, signature = await self.queue.get()
+            self.metrics.in_flight += 1; self._publish_metrics()
+            started = loop.time(); retrying = False
+            try:
+                # Sin el envoltorio de `batch._analyze_date`: un fallo llega hasta aquí como excepción
+                # (no como una incidencia "Process Error"), se cuenta y la fecha se reintenta.
+                with self._pool_lock: pool = self.pool; future = pool.submit(orchestrator_tools.run_full_analysis, date_str)
+                incidents = await asyncio.wrap_future(future)
+                await asyncio.to_thread(self.sink.write, date_str, incidents)
+                self.done[date_str] = signature; self._write_state(); self._failures.pop(date_str, None)
+                self.metrics.analyzed += 1; self.metrics.incidents += len(incidents)
+                logging.info(f"--- ✅ {date_str}: {len(incidents)} incidencias enviadas al sumidero.")
+            except Exception as e:
+                # La firma no se marca como analizada y la fecha sigue ocupada hasta volver a la cola.
+                if isinstance(e, BrokenProcessPool): self._replace_broken_pool(pool)
+                self.metrics.failed += 1; retrying = True
+                delay = self._schedule_retry(date_str, signature)
+                logging.error(f"Error al procesar la fecha {date_str} en el servicio: {e} (reintento en {delay:g}s)")
+            finally:
+                self.metrics.in_flight -= 1; self.metrics.last_duration_s = round(loop.time() - started, 3)
+                if not retrying: self._busy.discard(date_str)
+                self.queue.task_done(); self._publish_metrics()
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> ServiceMetrics:
+        """Ejecuta el servicio hasta que se active `stop` (o se cancele la tarea) y devuelve sus métricas."""
+        logging.info(f"\n🚀 === SERVICIO DE VIGILANCIA: '{data_loaders.DATA_BASE_PATH}' cada {self.interval}s, {self.workers} workers === 🚀")
+        await asyncio.to_thread(cv_store.get_default_store().warm, data_loaders.get_all_source_ids())
+        self.pool = self._new_pool()
+        tasks = [asyncio.create_task(self._watch())] + [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        try:
+            if stop is None: await asyncio.gather(*tasks)
+            else: await stop.wait()
+        finally:
+            tasks += self._retries
+            for task in tasks: task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.sink.close()
+        return self.metrics
@@ -0,0 +1,167 @@
+# incident_agent/sharding.py
+
+import hashlib
+import json
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import batch
+from .tools import cv_store, data_loaders, orchestrator_tools, result_cache, snapshot_cache
+
+# --- EJECUCIÓN PARTICIONADA POR FUENTES (VARIOS NODOS) ---
+# Las fuentes se reparten entre N particiones con un hash consistente de source_id (SHA-1, igual en todas
+# las máquinas): pasar de N a N+1 particiones mueve solo ~1/(N+1) de las fuentes. Cada nodo ejecuta su partición
+# leyendo solo los registros de sus fuentes (de la caché columnar si ya está construida; si no, en streaming y sin
+# construirla) y escribe <salida>/<fecha>/shard-K-of-N.json en el sistema de archivos compartido. El coordinador
+# combina los archivos en el orden de la lista maestra (la misma salida que un análisis completo) y detecta
+# particiones faltantes, fallidas o calculadas con otra lista de fuentes.
+#
+#   nodo K:        python -m incident_agent shard --date 2025-09-12 --shards 8 --index K --output-dir /compartido/shards
+#   coordinador:   python -m incident_agent merge-shards --date 2025-09-12 --shards 8 --output-dir /compartido/shards --wait 600
+#   local:         python -m incident_agent shard --date 2025-09-12 --shards 8 --output-dir shards/   (N procesos + combinación)
+
+SHARD_FORMAT_VERSION = 1
+
+
+def _source_hash(source_id: str) -> int:
+    return int.from_bytes(hashlib.sha1(source_id.encode('utf-8')).digest()[:8], 'big')
+
+
+def shard_of(source_id: str, n_shards: int) -> int:
+    """
+    Partición de la fuente con "jump consistent hash" (Lamping y Veach): reparto parejo, sin tabla,
+    y al pasar de N a N+1 particiones solo se mueven las fuentes que van a la nueva.
+    """
+    if n_shards < 1: raise ValueError(f"El número de particiones debe ser al menos 1 (se recibió {n_shards}).")
+    key, bucket, jump = _source_hash(source_id), -1, 0
+    while jump < n_shards:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+    return bucket
+
+
+def partition(source_ids: List[str], n_shards: int) -> List[List[str]]:
+    """Fuentes de cada partición, conservando el orden de la lista maestra."""
+    shards: List[List[str]] = [[] for _ in range(n_shards)]
+    for source_id in source_ids: shards[shard_of(source_id, n_shards)].append(source_id)
+    return shards
+
+
+def get_shard_path(output_dir: str, date_str: str, shard: int, n_shards: int) -> str:
+    return os.path.join(output_dir, date_str, f"shard-{shard:04d}-of-{n_shards:04d}.json")
+
+
+def _write_atomic(path: str, payload: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = data_loaders.get_tmp_path(path)
+    with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def snapshot_fingerprint(date_str: str) -> Dict[str, Optional[Dict[str, int]]]:
+    """mtime/tamaño de los archivos de la foto diaria: una partición calculada sobre otra versión no se combina."""
+    fingerprint = {}
+    for filename in ("files.json", "files_last_weekday.json"):
+        try: fingerprint[filename] = data_loaders.file_fingerprint(os.path.join(data_loaders.get_snapshot_dir(date_str), filename))
+        except FileNotFoundError: fingerprint[filename] = None
+    return fingerprint
+
+
+def run_shard(date_str: str, shard: int, n_shards: int, output_dir: str) -> str:
+    """Analiza las fuentes de la partición `shard` y escribe su archivo de resultados (también si falla)."""
+    source_ids = partition(data_loaders.get_all_source_ids(), n_shards)[shard]
+    payload: Dict[str, Any] = {"version": SHARD_FORMAT_VERSION, "date": date_str, "shard": shard, "n_shards": n_shards,
+                               "sources": source_ids, "snapshot": snapshot_fingerprint(date_str), "host": socket.gethostname(), "pid": os.getpid()}
+    started = time.perf_counter()
+    logging.info(f"\n🚀 === PARTICIÓN {shard + 1}/{n_shards} PARA {date_str}: {len(source_ids)} fuentes === 🚀")
+    try:
+        # Caché de resultados propia de la partición: sus fuentes son siempre las mismas y ningún otro nodo la pisa.
+        cache = result_cache.ResultCache(os.path.join(data_loaders.get_cache_dir(), f"detection_results.shard-{shard}-of-{n_shards}.json"))
+        incidents = orchestrator_tools.run_sources_analysis(date_str, source_ids, cache) if source_ids else []
+        payload.update(status="ok", incidents=incidents)
+    except Exception as e:
+        logging.error(f"Error en la partición {shard} de {date_str}: {e}")
+        payload.update(status="failed", error=str(e), incidents=[])
+    payload["duration_s"] = round(time.perf_counter() - started, 3)
+    path = get_shard_path(output_dir, date_str, shard, n_shards)
+    _write_atomic(path, payload)
+    logging.info(f"--- 💾 {path} ({payload['status']}, {len(payload['incidents'])} incidencias, {payload['duration_s']}s)")
+    return path
+
+
+def _read_shard(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f: return json.load(f)
+    except FileNotFoundError: return None
+
+
+def _shard_problem(payload: Optional[Dict[str, Any]], date_str: str, shard: int, n_shards: int, expected: List[str],
+                   snapshot: Dict[str, Any]) -> Optional[str]:
+    if payload is None: return "faltante"
+    if payload.get("version") != SHARD_FORMAT_VERSION or payload.get("date") != date_str or payload.get("n_shards") != n_shards:
+        return "formato, fecha o número de particiones distinto"
+    if payload.get("status") != "ok": return f"fallida en {payload.get('host')}: {payload.get('error')}"
+    if sorted(payload.get("sources") or []) != sorted(expected): return "calculada con otra lista de fuentes (¿cambiaron los CVs?)"
+    if payload.get("snapshot") != snapshot: return "calculada sobre otra versión de la foto diaria"
+    return None
+
+
+def merge_shards(date_str: str, n_shards: int, output_dir: str, wait: float = 0.0, poll: float = 2.0) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    """
+    Combina las particiones de la fecha en una sola lista, en el orden de la lista maestra de fuentes.
+    Espera hasta `wait` segundos a que aparezcan las que faltan. Devuelve las incidencias y {partición: problema};
+    cada partición con problema aporta además una incidencia "Process Error" para que la falta sea visible.
+    """
+    all_source_ids = data_loaders.get_all_source_ids()
+    expected, snapshot = partition(all_source_ids, n_shards), snapshot_fingerprint(date_str)
+    paths = [get_shard_path(output_dir, date_str, shard, n_shards) for shard in range(n_shards)]
+    deadline = time.monotonic() + wait
+    while True:
+        payloads = [_read_shard(path) for path in paths]
+        if all(payload is not None for payload in payloads) or time.monotonic() >= deadline: break
+        logging.info(f"--- ⏳ Esperando particiones: {sum(payload is None for payload in payloads)} de {n_shards} sin resultados.")
+        time.sleep(poll)
+
+    problems: Dict[int, str] = {}
+    by_source: Dict[str, List[Dict[str, Any]]] = {}
+    for shard, payload in enumerate(payloads):
+        problem = _shard_problem(payload, date_str, shard, n_shards, expected[shard], snapshot)
+        if problem: problems[shard] = problem; continue
+        for incident in payload["incidents"]: by_source.setdefault(incident["source_id"], []).append(incident)
+    merged = [incident for source_id in all_source_ids for incident in by_source.get(source_id, [])]
+    for shard, problem in problems.items():
+        logging.error(f"❌ Partición {shard} de {date_str}: {problem} ({paths[shard]}).")
+        merged.append({"incident_type": "Process Error", "date": date_str,
+                       "description": f"Partición {shard + 1}/{n_shards} sin resultados válidos ({problem}); faltan {len(expected[shard])} fuentes."})
+    logging.info(f"--- ✅ {n_shards - len(problems)}/{n_shards} particiones combinadas: {len(merged)} incidencias.")
+    return merged, problems
+
+
+def _run_shard_task(task: Tuple[str, int, int, str]) -> str:
+    return run_shard(*task)
+
+
+def run_local(date_str: str, n_shards: int, output_dir: str, workers: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    """Ejecuta las N particiones como procesos locales (en lugar de nodos) y las combina."""
+    # Como en el lote: CVs y caché columnar se preparan una vez aquí, así los procesos no compiten por construirlas.
+    cv_store.get_default_store().warm(data_loaders.get_all_source_ids())
+    snapshot_cache.warm_snapshot_caches([date_str])
+    for shard in range(n_shards):
+        # Los resultados de una ejecución anterior no deben confundirse con los de esta.
+        try: os.remove(get_shard_path(output_dir, date_str, shard, n_shards))
+        except FileNotFoundError: pass
+    workers = min(workers or os.cpu_count() or 1, n_shards)
+    init_args = (data_loaders.DATA_BASE_PATH, logging.getLogger().getEffectiveLevel())
+    tasks = [(date_str, shard, n_shards, output_dir) for shard in range(n_shards)]
+    with ProcessPoolExecutor(max_workers=workers, initializer=batch._init_worker, initargs=init_args) as pool:
+        futures = [pool.submit(_run_shard_task, task) for task in tasks]
+        for shard, future in enumerate(futures):
+            # Un proceso que muere no escribe su archivo: la combinación la reporta como faltante.
+            try: future.result()
+            except Exception as e: logging.error(f"Error al ejecutar la partición {shard} de {date_str}: {e}")
+    return merge_shards(date_str, n_shards, output_dir)
@@ -0,0 +1,193 @@
+# incident_agent/tools/cv_store.py
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from . import data_loaders, profiling
+
+# --- ALMACÉN COMPILADO DE LÍNEAS BASE (HOJAS DE VIDA) ---
+# Cada CV se parsea una sola vez (Markdown -> HTML -> tablas) y se guarda en disco
+# como una estructura compacta. La entrada se invalida sola cuando cambia el .md.
+
+# Subir este número cuando cambie la lógica de compilación: invalida todo el almacén.
+CV_STORE_VERSION = 1
+CV_STORE_FILENAME = "cv_baselines.json"
+
+# Esquemas (columnas mínimas) que identifican cada tabla del CV.
+TABLE_SCHEMAS = {
+    "file_processing_stats": {"Day", "Mean Files"},
+    "upload_schedule_patterns": {"Day", "Upload Time Window Expected"},
+}
+
+
+def _table_role(columns: List[str]) -> Optional[str]:
+    for role, schema in TABLE_SCHEMAS.items():
+        if schema.issubset(set(columns)): return role
+    # La tabla resumen por día cambia de nombres entre CV Tipo A y Tipo B; la reconocemos por 'Empty Files'.
+    if "Day" in columns and any("Empty Files" in col for col in columns): return "day_of_week_summary"
+    return None
+
+
+@dataclass
+class CVTable:
+    """Tabla del CV guardada por columnas, con valores nativos de Python (serializables a JSON)."""
+    columns: List[str]
+    data: Dict[str, List[Any]]
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "CVTable":
+        columns = [str(col) for col in df.columns]
+        data = {}
+        for col, name in zip(df.columns, columns):
+            data[name] = [None if pd.isna(value) else value for value in df[col].tolist()]
+        return cls(columns=columns, data=data)
+
+    def to_frame(self) -> pd.DataFrame:
+        # Se construye un DataFrame nuevo en cada llamada: algunos detectores modifican las columnas en sitio.
+        return pd.DataFrame({col: self.data[col] for col in self.columns}, columns=self.columns)
+
+
+@dataclass
+class CVBaseline:
+    source_id: str
+    cv_type: str
+    tables: Dict[str, CVTable] = field(default_factory=dict)
+
+    def to_cv_patterns(self, all_tables: bool = False) -> Dict[str, Any]:
+        """
+        Reproduce el diccionario que devuelve `data_loaders.parse_cv_data_and_text`.
+        Solo se expone 'file_processing_stats' para no alterar las incidencias actuales. Con `all_tables` se
+        exponen todas las tablas compiladas (horario y resumen por día incluidos), p. ej. para el benchmark.
+        """
+        cv_patterns: Dict[str, Any] = {"cv_type": self.cv_type}
+        for role in (self.tables if all_tables else ("file_processing_stats",)):
+            if role in self.tables: cv_patterns[role] = self.tables[role].to_frame()
+        return cv_patterns
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "source_id": self.source_id, "cv_type": self.cv_type,
+            "tables": {role: {"columns": t.columns, "data": t.data} for role, t in self.tables.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Dict[str, Any]) -> "CVBaseline":
+        tables = {role: CVTable(columns=t["columns"], data=t["data"]) for role, t in payload.get("tables", {}).items()}
+        return cls(source_id=payload["source_id"], cv_type=payload["cv_type"], tables=tables)
+
+
+def compile_cv_baseline(source_id: str, md_content: str) -> CVBaseline:
+    """Parsea el Markdown del CV una vez y extrae todas las tablas conocidas (la primera de cada tipo)."""
+    baseline = CVBaseline(source_id=source_id, cv_type=data_loaders.detect_cv_type(md_content))
+    for df in data_loaders.extract_cv_tables(md_content):
+        role = _table_role([str(col) for col in df.columns])
+        if role and role not in baseline.tables:
+            baseline.tables[role] = CVTable.from_frame(df)
+    return baseline
+
+
+def _content_hash(content: bytes) -> str:
+    return hashlib.sha1(content).hexdigest()
+
+
+class CVBaselineStore:
+    """
+    Almacén persistente de líneas base compiladas, indexado por source_id.
+    Cada entrada guarda mtime/tamaño y el hash SHA-1 del .md: si el mtime cambia pero el
+    contenido no, se reutiliza la entrada; si el contenido cambia, se recompila.
+    """
+
+    def __init__(self, store_path: Optional[str] = None):
+        self.store_path = store_path or os.path.join(data_loaders.get_cache_dir(), CV_STORE_FILENAME)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._baselines: Dict[str, CVBaseline] = {}
+        self._dirty = False
+        self.stats = {"hits": 0, "compiled": 0, "errors": 0}
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.store_path, 'r', encoding='utf-8') as f: payload = json.load(f)
+        except FileNotFoundError: return
+        except Exception as e:
+            logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: Almacén de CVs ilegible ('{self.store_path}'), se reconstruirá: {e}")
+            return
+        if payload.get("version") != CV_STORE_VERSION: return
+        self._entries = payload.get("entries", {})
+
+    def save(self) -> None:
+        if not self._dirty: return
+        os.makedirs(os.path.dirname(self.store_path) or ".", exist_ok=True)
+        tmp_path = data_loaders.get_tmp_path(self.store_path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": CV_STORE_VERSION, "entries": self._entries}, f, ensure_ascii=False)
+        # Reemplazo atómico: otro proceso nunca ve un almacén a medio escribir.
+        os.replace(tmp_path, self.store_path)
+        self._dirty = False
+
+    def get(self, source_id: str, force: bool = False) -> Optional[CVBaseline]:
+        """Devuelve la línea base compilada de la fuente, recompilándola solo si el CV cambió."""
+        if not force and source_id in self._baselines: return self._baselines[source_id]
+        cv_path = data_loaders.get_cv_path(source_id)
+        try:
+            fingerprint = data_loaders.file_fingerprint(cv_path)
+            entry = self._entries.get(source_id)
+            if not force and entry and all(entry.get(k) == v for k, v in fingerprint.items()):
+                baseline = CVBaseline.from_dict(entry["baseline"])
+                self.stats["hits"] += 1
+            else:
+                with open(cv_path, 'rb') as f: raw = f.read()
+                content_hash = _content_hash(raw)
+                if not force and entry and entry.get("sha1") == content_hash:
+                    baseline = CVBaseline.from_dict(entry["baseline"])
+                    self.stats["hits"] += 1
+                else:
+                    logging.info(f"--- Lógica: Compilando CV de la fuente {source_id} ---")
+                    with profiling.span(source_id, "cv_compile", rows=raw.count(b"\n")):
+                        baseline = compile_cv_baseline(source_id, raw.decode('utf-8'))
+                    self.stats["compiled"] += 1
+                self._entries[source_id] = {**fingerprint, "sha1": content_hash, "baseline": baseline.to_dict()}
+                self._dirty = True
+        except Exception as e:
+            logging.error(f"Error crítico al compilar la Hoja de Vida de '{source_id}': {e}")
+            self.stats["errors"] += 1
+            return None
+        self._baselines[source_id] = baseline
+        return baseline
+
+    def get_cv_patterns(self, source_id: str) -> Dict[str, Any]:
+        """Equivalente cacheado de `data_loaders.parse_cv_data_and_text(source_id)[0]`."""
+        baseline = self.get(source_id)
+        if baseline is None: return {"cv_type": "Error"}
+        return baseline.to_cv_patterns()
+
+    def digest(self, source_id: str) -> Optional[str]:
+        """Huella de la línea base compilada (hash del .md más la versión del compilador), o None si no se pudo compilar."""
+        if self.get(source_id) is None: return None
+        return f"{CV_STORE_VERSION}:{self._entries[source_id]['sha1']}"
+
+    def invalidate(self) -> None:
+        """Olvida las líneas base ya resueltas: el próximo `get` vuelve a comprobar la huella de cada CV (procesos de larga vida)."""
+        self._baselines.clear()
+
+    def warm(self, source_ids: Iterable[str], force: bool = False) -> Dict[str, int]:
+        """Compila (si hace falta) las líneas base de todas las fuentes y persiste el almacén."""
+        for source_id in source_ids: self.get(source_id, force=force)
+        self.save()
+        return dict(self.stats)
+
+
+_default_stores: Dict[str, CVBaselineStore] = {}
+
+def get_default_store() -> CVBaselineStore:
+    """Almacén compartido del proceso para el DATA_BASE_PATH actual."""
+    store_path = os.path.join(data_loaders.get_cache_dir(), CV_STORE_FILENAME)
+    if store_path not in _default_stores: _default_stores[store_path] = CVBaselineStore(store_path)
+    return _default_stores[store_path]
+
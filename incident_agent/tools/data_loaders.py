@@ -1,31 +1,71 @@
 import pandas as pd
+import hashlib
 import json
-import markdown
 import os
 import io
 import re
 import logging # <-- Importamos logging
-from typing import Dict, Any, List, Tuple
+import socket
+from typing import Collection, Dict, Any, Iterator, List, Optional, Tuple
 
 DATA_BASE_PATH = "data"
+# Carpeta (dentro de data/) donde se guardan los artefactos compilados/cacheados.
+CACHE_DIR_NAME = ".cache"
+# Cada foto diaria de archivos vive en data/<YYYY-MM-DD>_20_00_UTC/.
+SNAPSHOT_DIR_SUFFIX = "_20_00_UTC"
+
+def get_cv_path(source_id: str) -> str:
+    return os.path.join(DATA_BASE_PATH, "datasource_cvs", f"{source_id}_native.md")
+
+def get_snapshot_dir(date_str: str) -> str:
+    return os.path.join(DATA_BASE_PATH, f"{date_str}{SNAPSHOT_DIR_SUFFIX}")
+
+def get_cache_dir() -> str:
+    return os.path.join(DATA_BASE_PATH, CACHE_DIR_NAME)
+
+def file_fingerprint(path: str) -> Dict[str, int]:
+    """Huella barata (mtime + tamaño) para decidir si un artefacto cacheado sigue vigente."""
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+def get_tmp_path(path: str) -> str:
+    """Temporal junto a `path` para escribirlo con `os.replace`. El pid no basta entre máquinas (data/.cache compartida): va también el host."""
+    return f"{path}.{socket.gethostname()}.{os.getpid()}.tmp"
+
+def file_sha1(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''): digest.update(block)
+    return digest.hexdigest()
+
+def detect_cv_type(md_content: str) -> str:
+    if "Volume Characteristics (Estimates)" in md_content: return "Tipo B (Texto)"
+    return "Tipo A (Tabla)"
+
+def extract_cv_tables(md_content: str) -> List[pd.DataFrame]:
+    """Renderiza el Markdown del CV y devuelve todas sus tablas (con cabecera de un solo nivel)."""
+    # markdown (y lxml, que carga pandas.read_html) solo hacen falta al compilar un CV: con el almacén caliente no se importan.
+    import markdown
+    html_content = markdown.markdown(md_content, extensions=['tables'])
+    tables = []
+    for table_df in pd.read_html(io.StringIO(html_content), flavor='lxml'):
+        df = table_df.copy()
+        if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.droplevel(0)
+        tables.append(df)
+    return tables
 
 # (El código de las funciones es el mismo, solo cambiamos print por logging.info)
 def parse_cv_data_and_text(source_id: str) -> Tuple[Dict[str, Any], str]:
     logging.info(f"--- Lógica: Parseando CV Universal desde: data/datasource_cvs/{source_id}_native.md ---")
     md_content = ""
     try:
-        with open(os.path.join(DATA_BASE_PATH, "datasource_cvs", f"{source_id}_native.md"), 'r', encoding='utf-8') as f:
+        with open(get_cv_path(source_id), 'r', encoding='utf-8') as f:
             md_content = f.read()
-        if "Volume Characteristics (Estimates)" in md_content: cv_type = "Tipo B (Texto)"
-        else: cv_type = "Tipo A (Tabla)"
+        cv_type = detect_cv_type(md_content)
         logging.info(f"--- Lógica: Detectado CV de '{cv_type}' para la fuente {source_id}. ---")
         final_patterns = {"cv_type": cv_type}
-        html_content = markdown.markdown(md_content, extensions=['tables'])
-        tables = pd.read_html(io.StringIO(html_content), flavor='lxml')
         SCHEMA_PROCESSING_STATS = {'Day', 'Mean Files'}
-        for table_df in tables:
-            df = table_df.copy()
-            if isinstance(df.columns, pd.MultiIndex): df.columns = df.columns.droplevel(0)
+        for df in extract_cv_tables(md_content):
             if SCHEMA_PROCESSING_STATS.issubset(set(df.columns)):
                 final_patterns["file_processing_stats"] = df
                 break
@@ -34,17 +74,104 @@ def parse_cv_data_and_text(source_id: str) -> Tuple[Dict[str, Any], str]:
         logging.error(f"Error crítico al parsear la Hoja de Vida de '{source_id}': {e}")
         return {"cv_type": "Error"}, ""
 
-def process_files_json(file_path: str, date_str: str) -> pd.DataFrame:
-    # ... (lógica sin cambios)
+# --- Lectura en streaming de las fotos diarias (files.json) ---
+# El archivo se recorre por bloques con un escáner de regex anclado: cada registro queda como texto
+# y solo se decodifica si su 'uploaded_at' cae cerca de la fecha pedida. Las columnas se construyen
+# ya tipadas, así la memoria crece con el volumen del día y no con el tamaño de la foto.
+SNAPSHOT_READ_CHUNK = 1 << 20
+SNAPSHOT_FIELDS = ['filename', 'rows', 'status', 'is_duplicated', 'file_size', 'uploaded_at', 'status_message']
+# Cadena JSON en forma "desenrollada" (sin ambigüedad, sin retroceso exponencial).
+_JSON_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_SNAPSHOT_OPEN = re.compile(r'\s*\{')
+_SNAPSHOT_SOURCE = re.compile(r'\s*,?\s*(?:(?P<key>' + _JSON_STRING + r')\s*:\s*\[|(?P<end>\}))')
+# Registro plano (sin objetos ni listas anidadas): es la forma de todas las entradas de files.json.
+# Mismo "desenrollado" que las cadenas: un registro incompleto al final del bloque falla en tiempo lineal.
+_SNAPSHOT_RECORD = re.compile(r'\s*,?\s*(?:(?P<record>\{[^{}\[\]"]*(?:' + _JSON_STRING + r'[^{}\[\]"]*)*\})|(?P<end>\]))')
+_UPLOADED_AT_VALUE = re.compile(r'"uploaded_at"\s*:\s*"([^"]*)"')
+
+class SnapshotFormatError(ValueError):
+    """La foto diaria no tiene la forma {source_id: [registro plano, ...]} que reconoce el escáner."""
+
+def iter_snapshot_records(file_path: str) -> Iterator[Tuple[str, str]]:
+    """Recorre files.json por bloques y produce (source_id, texto JSON del registro) sin decodificarlo."""
+    with open(file_path, 'r', encoding='utf-8') as f:
+        buffer, pos, eof = f.read(SNAPSHOT_READ_CHUNK), 0, False
+        pattern, source_id = _SNAPSHOT_OPEN, None
+        while True:
+            match = pattern.match(buffer, pos)
+            if match is None:
+                if eof: raise SnapshotFormatError(f"estructura inesperada en '{file_path}' cerca de: {buffer[pos:pos + 80]!r}")
+                chunk = f.read(SNAPSHOT_READ_CHUNK); eof = not chunk
+                buffer, pos = buffer[pos:] + chunk, 0
+                continue
+            pos = match.end()
+            if pattern is _SNAPSHOT_OPEN: pattern = _SNAPSHOT_SOURCE
+            elif pattern is _SNAPSHOT_SOURCE:
+                if match.group('end'): return
+                source_id, pattern = json.loads(match.group('key')), _SNAPSHOT_RECORD
+            elif match.group('end'): pattern = _SNAPSHOT_SOURCE
+            else: yield source_id, match.group('record')
+
+def normalize_files_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Aplica los tipos compactos del esquema (categorías, enteros, booleanos, datetime64) sobre un DataFrame de archivos."""
+    if 'source_id' in df: df['source_id'] = df['source_id'].astype('category')
+    if 'status' in df: df['status'] = df['status'].astype('category')
+    # Solo se fuerzan int/bool si no hay nulos; con nulos se conserva el tipo que inferiría pandas.
+    if 'rows' in df and df['rows'].notna().all(): df['rows'] = df['rows'].astype('int64')
+    if 'is_duplicated' in df and df['is_duplicated'].notna().all(): df['is_duplicated'] = df['is_duplicated'].astype(bool)
+    # ISO8601 explícito: admite marcas con y sin microsegundos en la misma foto.
+    if 'uploaded_at' in df: df['uploaded_at'] = pd.to_datetime(df['uploaded_at'], utc=True, format='ISO8601')
+    return df
+
+def _typed_files_frame(source_ids: List[str], records: List[Dict[str, Any]]) -> pd.DataFrame:
+    """Construye el DataFrame por columnas (sin una lista de diccionarios intermedia) y lo tipa."""
+    fields = list(dict.fromkeys(key for record in records for key in record if key != 'source_id')) or SNAPSHOT_FIELDS
+    df = pd.DataFrame({name: [record.get(name) for record in records] for name in fields})
+    df['source_id'] = source_ids
+    return normalize_files_frame(df)
+
+def _candidate_days(target_day: pd.Timestamp) -> set:
+    # Un desfase horario mueve la fecha como mucho un día: el resto se descarta sin decodificar.
+    return {(target_day + pd.Timedelta(days=k)).strftime('%Y-%m-%d') for k in (-1, 0, 1)}
+
+def process_files_json(file_path: str, date_str: str, source_ids: Optional[Collection[str]] = None) -> pd.DataFrame:
+    """Archivos subidos el día `date_str`; con `source_ids`, solo los de esas fuentes (el resto ni se decodifica)."""
+    try:
+        target_day = pd.Timestamp(date_str).normalize()
+        candidate_days = _candidate_days(target_day)
+        record_sources, records, seen = [], [], 0
+        for source_id, record_text in iter_snapshot_records(file_path):
+            seen += 1
+            if source_ids is not None and source_id not in source_ids: continue
+            uploaded_at = _UPLOADED_AT_VALUE.search(record_text)
+            if uploaded_at and uploaded_at.group(1)[:10] not in candidate_days: continue
+            record_sources.append(source_id); records.append(json.loads(record_text))
+        if not seen: return pd.DataFrame()
+        df = _typed_files_frame(record_sources, records)
+        return df[df['uploaded_at'].dt.normalize() == target_day.tz_localize('UTC')].reset_index(drop=True)
+    except FileNotFoundError: return pd.DataFrame()
+    except SnapshotFormatError as e:
+        logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: Lectura en streaming no aplicable ({e}); se carga el JSON completo.")
+        return _process_files_json_eager(file_path, date_str, source_ids)
+    except Exception as e: logging.error(f"Error al procesar el archivo '{file_path}': {e}"); return pd.DataFrame()
+
+def _process_files_json_eager(file_path: str, date_str: str, source_ids: Optional[Collection[str]] = None) -> pd.DataFrame:
+    # Carga completa original: respaldo para fotos con una forma que el escáner no reconoce.
+    # Se preseleccionan los mismos registros que en streaming, así el DataFrame sale con las mismas columnas y tipos.
     try:
         with open(file_path, 'r', encoding='utf-8') as f: data = json.load(f)
-        all_files = []
+        if not any(data.values()): return pd.DataFrame()
+        target_day = pd.Timestamp(date_str).normalize()
+        candidate_days = _candidate_days(target_day)
+        record_sources, records = [], []
         for source_id, files_list in data.items():
-            for file_info in files_list: file_info['source_id'] = source_id; all_files.append(file_info)
-        if not all_files: return pd.DataFrame()
-        df = pd.DataFrame(all_files); df['uploaded_at'] = pd.to_datetime(df['uploaded_at'], utc=True)
-        target_date = pd.to_datetime(date_str).date(); df = df[df['uploaded_at'].dt.date == target_date]
-        return df
+            if source_ids is not None and source_id not in source_ids: continue
+            for file_info in files_list:
+                uploaded_at = file_info.get('uploaded_at')
+                if isinstance(uploaded_at, str) and uploaded_at[:10] not in candidate_days: continue
+                record_sources.append(source_id); records.append(file_info)
+        df = _typed_files_frame(record_sources, records)
+        return df[df['uploaded_at'].dt.normalize() == target_day.tz_localize('UTC')].reset_index(drop=True)
     except FileNotFoundError: return pd.DataFrame()
     except Exception as e: logging.error(f"Error al procesar el archivo '{file_path}': {e}"); return pd.DataFrame()
 
@@ -54,4 +181,13 @@ def get_all_source_ids() -> List[str]:
     try:
         all_cv_files = os.listdir(cv_folder_path)
         return [filename.split('_')[0] for filename in all_cv_files if filename.endswith('_native.md')]
-    except Exception as e: logging.error(f"Error al leer los source_ids de los CVs: {e}"); return []
\ No newline at end of file
+    except Exception as e: logging.error(f"Error al leer los source_ids de los CVs: {e}"); return []
+
+def list_snapshot_dates() -> List[str]:
+    """Fechas (YYYY-MM-DD) con carpeta de foto diaria en data/, en orden cronológico."""
+    try:
+        dir_names = os.listdir(DATA_BASE_PATH)
+    except Exception as e: logging.error(f"Error al listar las fotos diarias en '{DATA_BASE_PATH}': {e}"); return []
+    pattern = re.compile(rf"^(\d{{4}}-\d{{2}}-\d{{2}}){re.escape(SNAPSHOT_DIR_SUFFIX)}$")
+    dates = [m.group(1) for m in map(pattern.match, dir_names) if m and os.path.isdir(os.path.join(DATA_BASE_PATH, m.group(0)))]
+    return sorted(dates)
@@ -0,0 +1,361 @@
+# incident_agent/tools/detection_engine.py
+
+import functools
+import logging
+import re
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import detectors, profiling
+from .incidents import Incident
+
+# --- MOTOR DE DETECCIÓN VECTORIZADO ---
+# Evalúa las reglas de `detectors.py` en una sola pasada sobre el DataFrame del día
+# (agrupado una vez por source_id) en lugar de re-filtrarlo por cada fuente y detector.
+# La salida es idéntica a ejecutar los seis detectores fuente por fuente, en el mismo orden.
+# Las reglas producen `incidents.Incident` (plantilla + valores): el texto se arma recién al escribir la salida.
+
+# Orden en el que el orquestador ejecuta los detectores para cada fuente.
+DETECTOR_RANK = {
+    "missing": 0, "duplicated_or_failed": 1, "empty": 2,
+    "volume": 3, "late": 4, "previous_period": 5,
+}
+
+FILE_COLUMNS = ["source_id", "filename", "rows", "status", "is_duplicated", "uploaded_at"]
+
+# Una incidencia encontrada junto con su clave de orden: (fuente, detector, etapa, fila).
+Found = Tuple[int, int, int, int, Incident]
+
+# Etapa de "sin duplicado reportado" para las claves del modo incremental (ver KeyHistory).
+NO_STAGE = 3
+
+
+@dataclass
+class KeyHistory:
+    """Lo ya procesado del día por (fuente, archivo) en ejecuciones incrementales anteriores."""
+    uploads: Dict[Tuple[str, str], int] = field(default_factory=dict)
+    # Etapa de duplicado más prioritaria ya reportada por clave (0 bandera, 1 intradía, 2 histórico).
+    # Una etapa más prioritaria que llega después (p. ej. una segunda subida) se vuelve a reportar.
+    reported: Dict[Tuple[str, str], int] = field(default_factory=dict)
+
+
+def _incident(source_id: str, incident_type: str, template: str, args: Tuple[Any, ...], severity: str, date_str: str) -> Incident:
+    return Incident(source_id, incident_type, template, severity, date_str, args)
+
+
+def _select_sources(files_df: pd.DataFrame, source_index: pd.Index) -> Tuple[pd.DataFrame, np.ndarray]:
+    """Filtra (una sola vez) las filas de las fuentes monitoreadas y devuelve su posición en la lista maestra."""
+    if files_df.empty or "source_id" not in files_df.columns:
+        return pd.DataFrame(columns=FILE_COLUMNS), np.empty(0, dtype=np.intp)
+    ranks = source_index.get_indexer(files_df["source_id"].astype(object))
+    keep = ranks >= 0
+    return files_df[keep], ranks[keep]
+
+
+# --- Lectura de umbrales del CV (una vez por fuente, misma lógica que los detectores) ---
+# Filtrar cada tabla con una máscara de pandas (y copiarla) cuesta milisegundos por fuente y dominaba el motor:
+# aquí se recorre la columna del día como lista y se toman solo los valores de la fila encontrada.
+
+class _DayRow:
+    """Fila del día de una tabla del CV: cada valor se lee recién cuando una regla lo pide."""
+    __slots__ = ("table", "row", "columns")
+
+    def __init__(self, table: pd.DataFrame, row: int, columns: List[Any]):
+        self.table, self.row, self.columns = table, row, columns
+
+    def __iter__(self) -> Iterator[Any]: return iter(self.columns)
+    def __contains__(self, column: Any) -> bool: return column in self.columns
+    def __getitem__(self, column: Any) -> Any: return self.table.iat[self.row, self.columns.index(column)]
+
+
+def _day_row(table: Optional[pd.DataFrame], day_column: str, day_of_week: str, lower_columns: bool = False) -> Optional[_DayRow]:
+    """Primera fila del día; compara igual que los detectores (`.str.lower() == día`). Con `lower_columns`, columnas en minúsculas."""
+    if table is None or table.empty: return None
+    columns = [str(col).lower() for col in table.columns] if lower_columns else list(table.columns)
+    target = day_of_week.lower()
+    for row, day in enumerate(table[table.columns[columns.index(day_column)]].tolist()):
+        if isinstance(day, str) and day.lower() == target: return _DayRow(table, row, columns)
+    return None
+
+
+def _expected_files_mean(cv_patterns: Dict[str, Any], day_of_week: str) -> Optional[Any]:
+    day_stats = _day_row(cv_patterns.get("file_processing_stats"), 'day', day_of_week, lower_columns=True)
+    return None if day_stats is None else day_stats['mean files']
+
+
+def _empty_files_expected(cv_patterns: Dict[str, Any], day_of_week: str) -> bool:
+    day_stats = _day_row(cv_patterns.get("day_of_week_summary"), 'Day', day_of_week)
+    if day_stats is None: return False
+    empty_files_col_name = next((col for col in day_stats if 'Empty Files' in col), None)
+    if not empty_files_col_name: return False
+    max_empty_match = re.search(r'Max:\s*([\d\.]+)', str(day_stats[empty_files_col_name]))
+    return bool(max_empty_match and float(max_empty_match.group(1)) > 0)
+
+
+def _volume_day_stats(cv_patterns: Dict[str, Any], day_of_week: str) -> Optional[_DayRow]:
+    return _day_row(cv_patterns.get("day_of_week_summary"), 'Day', day_of_week)
+
+
+@functools.lru_cache(maxsize=1024)
+def _utc_timestamp(text: str) -> pd.Timestamp:
+    # Las ventanas de los CVs repiten pocas horas de cierre: cada una se convierte una sola vez.
+    return pd.to_datetime(text, utc=True)
+
+
+def _upload_deadline(cv_patterns: Dict[str, Any], day_of_week: str, date_str: str) -> Optional[pd.Timestamp]:
+    day_schedule = _day_row(cv_patterns.get("upload_schedule_patterns"), 'Day', day_of_week)
+    if day_schedule is None or 'Upload Time Window Expected' not in day_schedule: return None
+    match = re.search(r'–(\d{2}:\d{2}:\d{2})', day_schedule['Upload Time Window Expected'])
+    if not match: return None
+    return _utc_timestamp(f"{date_str} {match.group(1)}")
+
+
+def _first_per_key(mask: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Marca, entre las filas seleccionadas, solo la primera aparición de cada clave."""
+    selected = np.flatnonzero(mask)
+    _, first = np.unique(codes[selected], return_index=True)
+    out = np.zeros(len(mask), dtype=bool); out[selected[first]] = True
+    return out
+
+
+# --- Reglas ---
+
+def _missing_files(counts: np.ndarray, source_ids: List[str], cv_by_rank: List[Dict[str, Any]], day_of_week: str, date_str: str) -> List[Found]:
+    found = []
+    for rank, source_id in enumerate(source_ids):
+        try:
+            expected_files_mean = _expected_files_mean(cv_by_rank[rank], day_of_week)
+            if expected_files_mean is None: continue
+            actual_files_count = int(counts[rank])
+            if actual_files_count < expected_files_mean:
+                missing_count = int(expected_files_mean - actual_files_count)
+                if missing_count >= 1:
+                    found.append((rank, DETECTOR_RANK["missing"], 0, 0, _incident(source_id, "Missing File", "Faltan {} archivos. Se esperaban ~{:.0f}, se recibieron {}.", (missing_count, expected_files_mean, actual_files_count), "URGENT", date_str)))
+        except Exception as e: logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: No se pudieron contar los archivos faltantes de {source_id}: {e}")
+    return found
+
+
+def _duplicated_or_failed(df: pd.DataFrame, ranks: np.ndarray, historical_files_df: pd.DataFrame, source_ids: List[str], date_str: str, history_index: Optional[Any] = None, key_history: Optional[KeyHistory] = None) -> List[Found]:
+    if df.empty: return []
+    rule = DETECTOR_RANK["duplicated_or_failed"]
+    status = df['status'].astype(str).fillna('unknown')
+    status_lower = status.str.lower().to_numpy()
+    filenames = df['filename'].to_numpy()
+    # Clave (fuente, nombre de archivo) como entero: el conjunto de "ya reportados" es un vector booleano.
+    codes = df.groupby([df['source_id'].astype(object), df['filename']], sort=False, dropna=False).ngroup().to_numpy()
+    reported = np.zeros(codes.max() + 1, dtype=bool)
+    uploads_per_key = np.bincount(codes)
+    # Sin historial (modo normal) ninguna clave tiene etapas previas: `prior_stage` no bloquea nada.
+    prior_stage = np.full(codes.max() + 1, NO_STAGE, dtype=np.int8)
+    # (fuente, archivo) de cada código, solo para cruzar con el historial del modo incremental.
+    keys = [(source_ids[ranks[pos]], filenames[pos]) for pos in np.unique(codes, return_index=True)[1]] if key_history is not None else []
+    found: List[Found] = []
+
+    def emit(stage: int, rows: np.ndarray, incident_type: str, template: str, severity: str, with_status: bool = False) -> None:
+        for pos in np.flatnonzero(rows):
+            args = (filenames[pos], status.iat[pos]) if with_status else (filenames[pos],)
+            found.append((ranks[pos], rule, stage, pos, _incident(source_ids[ranks[pos]], incident_type, template, args, severity, date_str)))
+
+    if key_history is not None:
+        # Modo incremental: cuentan también las subidas y los reportes de los tramos anteriores del día.
+        uploads_per_key += np.array([key_history.uploads.get(key, 0) for key in keys], dtype=uploads_per_key.dtype)
+        prior_stage[:] = [key_history.reported.get(key, NO_STAGE) for key in keys]
+
+    flagged = _first_per_key((df['is_duplicated'] == True).to_numpy() & (status_lower == 'stopped') & (prior_stage[codes] > 0), codes)
+    emit(0, flagged, "Duplicated File (Flag)", "Archivo marcado como duplicado: '{}'.", "URGENT")
+    reported[codes[flagged]] = True
+
+    intraday = _first_per_key((uploads_per_key[codes] > 1) & ~reported[codes] & (prior_stage[codes] > 1), codes)
+    emit(1, intraday, "Intraday Duplicate", "Archivo subido múltiples veces hoy: '{}'.", "REQUIERE ATENCIÓN")
+    reported[codes[intraday]] = True
+
+    in_last_weekday = np.zeros(len(df), dtype=bool)
+    if not historical_files_df.empty:
+        historical_keys = pd.MultiIndex.from_arrays([historical_files_df['source_id'].astype(object), historical_files_df['filename']])
+        in_last_weekday = pd.MultiIndex.from_arrays([df['source_id'].astype(object), df['filename']]).isin(historical_keys)
+    in_index, first_seen = np.zeros(len(df), dtype=bool), None
+    if history_index is not None:
+        # Horizonte largo: cualquier día anterior ya ingerido en el índice persistente de nombres.
+        in_index, first_seen = history_index.seen_before(df['source_id'], df['filename'], date_str)
+    historical = _first_per_key((in_last_weekday | in_index) & ~reported[codes] & (prior_stage[codes] > 2), codes)
+    for pos in np.flatnonzero(historical):
+        if in_last_weekday[pos]: template, args = "Archivo duplicado de la semana anterior: '{}'.", (filenames[pos],)
+        else: template, args = "Archivo ya recibido el {}: '{}'.", (str(first_seen[pos]), filenames[pos])
+        found.append((ranks[pos], rule, 2, pos, _incident(source_ids[ranks[pos]], "Historical Duplicate", template, args, "REQUIERE ATENCIÓN", date_str)))
+    reported[codes[historical]] = True
+
+    failed = (status_lower != 'processed') & ~reported[codes] & (prior_stage[codes] == NO_STAGE)
+    emit(3, failed, "Failed File", "Archivo con procesamiento fallido: '{}' (Estado: {}).", "REQUIERE ATENCIÓN", with_status=True)
+    if key_history is not None:
+        for stage, rows in ((2, historical), (1, intraday), (0, flagged)): prior_stage[codes[rows]] = stage
+        for code, key in enumerate(keys):
+            key_history.uploads[key] = int(uploads_per_key[code])
+            if prior_stage[code] != NO_STAGE: key_history.reported[key] = int(prior_stage[code])
+    return found
+
+
+def _unexpected_empty_files(df: pd.DataFrame, ranks: np.ndarray, source_ids: List[str], cv_by_rank: List[Dict[str, Any]], day_of_week: str, date_str: str) -> List[Found]:
+    empty_rows = (df['rows'] == 0).to_numpy()
+    if not empty_rows.any(): return []
+    # El CV solo se consulta para las fuentes que de verdad tienen archivos vacíos hoy.
+    expected = {rank: _empty_files_expected(cv_by_rank[rank], day_of_week) for rank in np.unique(ranks[empty_rows])}
+    filenames = df['filename'].to_numpy()
+    found = []
+    for pos in np.flatnonzero(empty_rows):
+        rank = ranks[pos]
+        if not expected[rank]:
+            found.append((rank, DETECTOR_RANK["empty"], 0, pos, _incident(source_ids[rank], "Unexpected Empty File", "Archivo vacío inesperado: '{}'.", (filenames[pos],), "REQUIERE ATENCIÓN", date_str)))
+    return found
+
+
+def _volume_variations(df: pd.DataFrame, ranks: np.ndarray, source_ids: List[str], cv_by_rank: List[Dict[str, Any]], day_of_week: str, date_str: str) -> List[Found]:
+    rows_sum = df['rows'].groupby(ranks).sum() if not df.empty else pd.Series(dtype='int64')
+    return _volume_from_totals(rows_sum, df['rows'].iloc[:0].sum(), source_ids, cv_by_rank, day_of_week, date_str)
+
+
+def _volume_from_totals(rows_sum: pd.Series, zero: Any, source_ids: List[str], cv_by_rank: List[Dict[str, Any]], day_of_week: str, date_str: str) -> List[Found]:
+    # `rows_sum` va indexado por posición de la fuente; las fuentes sin archivos suman `zero`.
+    found = []
+    for rank, source_id in enumerate(source_ids):
+        day_stats = _volume_day_stats(cv_by_rank[rank], day_of_week)
+        if day_stats is None: continue
+        total_rows_today = rows_sum.get(rank, zero)
+        try:
+            stats_col_name = next((col for col in day_stats if 'Rows' in col), None)
+            if not stats_col_name: continue
+            stats_text = str(day_stats[stats_col_name])
+            min_rows_match = re.search(r'Min:\s*([\d,]+)', stats_text); max_rows_match = re.search(r'Max:\s*([\d,]+)', stats_text)
+            if min_rows_match and max_rows_match:
+                expected_min = int(min_rows_match.group(1).replace(',', '')); expected_max = int(max_rows_match.group(1).replace(',', ''))
+                if total_rows_today > expected_max or total_rows_today < expected_min:
+                    found.append((rank, DETECTOR_RANK["volume"], 0, 0, _incident(source_id, "Unexpected Volume Variation", "Variación de volumen: Se recibieron {:,} filas, fuera del rango esperado ({:,} - {:,}).", (total_rows_today, expected_min, expected_max), "REQUIERE ATENCIÓN", date_str)))
+        except Exception as e: logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: No se pudo procesar la variación de volumen para {source_id}: {e}")
+    return found
+
+
+def _late_uploads(df: pd.DataFrame, ranks: np.ndarray, source_ids: List[str], cv_by_rank: List[Dict[str, Any]], day_of_week: str, date_str: str) -> List[Found]:
+    deadlines = [_upload_deadline(cv, day_of_week, date_str) for cv in cv_by_rank]
+    if df.empty or all(deadline is None for deadline in deadlines): return []
+    limit_by_rank = pd.Series([d + timedelta(hours=4) if d is not None else pd.NaT for d in deadlines], dtype='datetime64[ns, UTC]')
+    row_limits = limit_by_rank.iloc[ranks].reset_index(drop=True)
+    late = (df['uploaded_at'].reset_index(drop=True) > row_limits).to_numpy()
+    filenames = df['filename'].to_numpy(); uploaded_at = df['uploaded_at']
+    found = []
+    for pos in np.flatnonzero(late):
+        rank = ranks[pos]; deadline = deadlines[rank]
+        found.append((rank, DETECTOR_RANK["late"], 0, pos, _incident(
+            source_ids[rank], "File Upload After Schedule",
+            "Archivo '{}' subido a las {} UTC, más de 4h después del límite esperado de las {} UTC.",
+            (filenames[pos], uploaded_at.iat[pos].strftime('%H:%M'), deadline.strftime('%H:%M')), "ADVERTENCIA", date_str)))
+    return found
+
+
+def _previous_period_uploads(df: pd.DataFrame, ranks: np.ndarray, source_ids: List[str], date_str: str) -> List[Found]:
+    if df.empty: return []
+    upload_date = pd.to_datetime(date_str).date()
+    filenames = df['filename'].to_numpy()
+    # Las fechas distintas en los nombres son pocas: se convierten una vez cada una.
+    date_tokens = df['filename'].str.extract(r'(\d{4}[-]?\d{2}[-]?\d{2})', expand=False)
+    token_dates = {token: pd.to_datetime(token.replace('-', '')).date() for token in date_tokens.dropna().unique()}
+    found = []
+    for pos, token in zip(np.flatnonzero(date_tokens.notna().to_numpy()), date_tokens.dropna()):
+        filename_date = token_dates[token]
+        if (upload_date - filename_date).days > 7:
+            found.append((ranks[pos], DETECTOR_RANK["previous_period"], 0, pos, _incident(
+                source_ids[ranks[pos]], "Previous Period Upload",
+                "Archivo '{}' parece ser de un período anterior (Fecha en nombre: {}, Fecha de subida: {}).",
+                (filenames[pos], str(filename_date), str(upload_date)), "ADVERTENCIA", date_str)))
+    return found
+
+
+def iter_all_detectors(daily_files_df: pd.DataFrame, historical_files_df: pd.DataFrame, cv_patterns_by_source: Dict[str, Dict[str, Any]], date_str: str, history_index: Optional[Any] = None) -> Iterator[Incident]:
+    """
+    Ejecuta los seis detectores para todas las fuentes en una sola pasada y entrega las incidencias en orden.
+    Las reglas son vectorizadas y el orden final (fuente, detector, etapa, fila) mezcla todas: los registros se
+    ordenan antes de la primera entrega; lo que no se construye por adelantado es el diccionario ni el texto.
+    `cv_patterns_by_source` define la lista (y el orden) de fuentes; las que no tienen CV se omiten,
+    igual que en el ciclo fuente por fuente. Con `history_index` (un `filename_index.FilenameIndex`),
+    los duplicados históricos se buscan además en todo el historial ingerido, no solo en la semana anterior.
+    """
+    source_ids = [source_id for source_id, cv_patterns in cv_patterns_by_source.items() if cv_patterns]
+    cv_by_rank = [cv_patterns_by_source[source_id] for source_id in source_ids]
+    day_of_week = pd.to_datetime(date_str).day_name()
+    df, ranks = _select_sources(daily_files_df, pd.Index(source_ids, dtype=object))
+    counts = np.bincount(ranks, minlength=len(source_ids))
+
+    # Cada regla es un tramo propio en el perfil (main.py --profile), con las filas evaluadas y las incidencias halladas.
+    rules = [
+        ("missing", lambda: _missing_files(counts, source_ids, cv_by_rank, day_of_week, date_str)),
+        ("duplicated_or_failed", lambda: _duplicated_or_failed(df, ranks, historical_files_df, source_ids, date_str, history_index)),
+        ("empty", lambda: _unexpected_empty_files(df, ranks, source_ids, cv_by_rank, day_of_week, date_str)),
+        ("volume", lambda: _volume_variations(df, ranks, source_ids, cv_by_rank, day_of_week, date_str)),
+        ("late", lambda: _late_uploads(df, ranks, source_ids, cv_by_rank, day_of_week, date_str)),
+        ("previous_period", lambda: _previous_period_uploads(df, ranks, source_ids, date_str)),
+    ]
+    found: List[Found] = []
+    for name, rule in rules:
+        with profiling.span(name, "detector", rows=len(df)) as step:
+            step.args["incidents"] = len(found)
+            found += rule()
+            step.args["incidents"] = len(found) - step.args["incidents"]
+    found.sort(key=lambda item: item[:4])
+    for item in found: yield item[4]
+
+
+def run_all_detectors(daily_files_df: pd.DataFrame, historical_files_df: pd.DataFrame, cv_patterns_by_source: Dict[str, Dict[str, Any]], date_str: str, history_index: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """Como `iter_all_detectors`, pero devuelve la lista de diccionarios de siempre (herramientas del agente, lote, servicio)."""
+    return [incident.to_dict() for incident in iter_all_detectors(daily_files_df, historical_files_df, cv_patterns_by_source, date_str, history_index)]
+
+
+def run_delta_detectors(delta_files_df: pd.DataFrame, historical_files_df: pd.DataFrame, cv_patterns_by_source: Dict[str, Dict[str, Any]], date_str: str, key_history: KeyHistory, history_index: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """
+    Modo incremental: evalúa las reglas por archivo (duplicados, fallidos, vacíos, tardíos, período anterior)
+    solo sobre los archivos nuevos del día. `key_history` aporta lo visto en tramos anteriores y se actualiza
+    con este tramo. Las reglas agregadas (faltantes y volumen) quedan para `run_closing_detectors`.
+    """
+    source_ids = [source_id for source_id, cv_patterns in cv_patterns_by_source.items() if cv_patterns]
+    cv_by_rank = [cv_patterns_by_source[source_id] for source_id in source_ids]
+    day_of_week = pd.to_datetime(date_str).day_name()
+    df, ranks = _select_sources(delta_files_df, pd.Index(source_ids, dtype=object))
+
+    found = _duplicated_or_failed(df, ranks, historical_files_df, source_ids, date_str, history_index, key_history)
+    found += _unexpected_empty_files(df, ranks, source_ids, cv_by_rank, day_of_week, date_str)
+    found += _late_uploads(df, ranks, source_ids, cv_by_rank, day_of_week, date_str)
+    found += _previous_period_uploads(df, ranks, source_ids, date_str)
+    found.sort(key=lambda item: item[:4])
+    return [item[4].to_dict() for item in found]
+
+
+def run_closing_detectors(files_by_source: Dict[str, int], rows_by_source: Dict[str, Any], cv_patterns_by_source: Dict[str, Dict[str, Any]], date_str: str, rows_zero: Any = 0) -> List[Dict[str, Any]]:
+    """
+    Cierre del día en modo incremental: archivos faltantes y variación de volumen a partir de los totales acumulados.
+    `rows_zero` es el total de una fuente sin archivos (0 o 0.0, el mismo tipo que los de `rows_by_source`).
+    """
+    source_ids = [source_id for source_id, cv_patterns in cv_patterns_by_source.items() if cv_patterns]
+    cv_by_rank = [cv_patterns_by_source[source_id] for source_id in source_ids]
+    day_of_week = pd.to_datetime(date_str).day_name()
+    counts = np.array([files_by_source.get(source_id, 0) for source_id in source_ids], dtype=np.int64)
+    rows_sum = pd.Series({rank: rows_by_source[source_id] for rank, source_id in enumerate(source_ids) if source_id in rows_by_source}, dtype=object)
+
+    found = _missing_files(counts, source_ids, cv_by_rank, day_of_week, date_str)
+    found += _volume_from_totals(rows_sum, rows_zero, source_ids, cv_by_rank, day_of_week, date_str)
+    found.sort(key=lambda item: item[:4])
+    return [item[4].to_dict() for item in found]
+
+
+def run_per_source_detectors(daily_files_df: pd.DataFrame, historical_files_df: pd.DataFrame, cv_patterns_by_source: Dict[str, Dict[str, Any]], date_str: str) -> List[Dict[str, Any]]:
+    """Implementación de referencia (fuente por fuente, detector por detector) con la que se compara el motor."""
+    all_incidents = []
+    for source_id, cv_patterns in cv_patterns_by_source.items():
+        if not cv_patterns: continue
+        all_incidents.extend(detectors.find_missing_files(daily_files_df, cv_patterns, source_id, date_str))
+        all_incidents.extend(detectors.find_duplicated_or_failed_files(daily_files_df, historical_files_df, source_id, date_str))
+        all_incidents.extend(detectors.find_unexpected_empty_files(daily_files_df, cv_patterns, source_id, date_str))
+        all_incidents.extend(detectors.find_volume_variations(daily_files_df, cv_patterns, source_id, date_str))
+        all_incidents.extend(detectors.find_late_uploads(daily_files_df, cv_patterns, source_id, date_str))
+        all_incidents.extend(detectors.find_previous_period_uploads(daily_files_df, source_id, date_str))
+    return all_incidents
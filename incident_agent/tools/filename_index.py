@@ -0,0 +1,219 @@
+# incident_agent/tools/filename_index.py
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import data_loaders, snapshot_cache
+
+# --- ÍNDICE PERSISTENTE DE NOMBRES DE ARCHIVO (DUPLICADOS HISTÓRICOS) ---
+# Guarda, por cada (source_id, filename) ya recibido, el primer día en que se vio y cuántas veces se subió.
+# Es de solo-añadir: cada día ingerido escribe un segmento nuevo (claves hash ordenadas), y los segmentos
+# se compactan en uno solo cuando se acumulan. Un filtro de Bloom delante descarta en bloque los archivos
+# nunca vistos antes de buscar en los segmentos. Todas las consultas son vectorizadas (searchsorted).
+
+# Subir este número si cambia el formato o la función de hash: invalida el índice.
+FILENAME_INDEX_VERSION = 1
+FILENAME_INDEX_DIR = "filename_index"
+MANIFEST_FILENAME = "manifest.json"
+# Clave fija para pandas.util.hash_array (SipHash): los hashes deben ser estables entre ejecuciones.
+HASH_KEY = "incident-fn-idx1"
+KEY_SEPARATOR = "\x1f"
+# Se compacta cuando hay más segmentos que esto: cada consulta busca en todos.
+MAX_SEGMENTS = 8
+# Bloom: ~10 bits por clave y 7 funciones de hash dan ~1% de falsos positivos.
+BLOOM_BITS_PER_KEY = 10
+BLOOM_HASHES = 7
+_EPOCH = pd.Timestamp("1970-01-01")
+
+
+def _day_number(date_str: str) -> int:
+    return int((pd.Timestamp(date_str).normalize() - _EPOCH).days)
+
+
+def _day_str(day_number: int) -> str:
+    return (_EPOCH + pd.Timedelta(days=int(day_number))).strftime("%Y-%m-%d")
+
+
+def hash_keys(source_ids: pd.Series, filenames: pd.Series) -> np.ndarray:
+    """Hash de 64 bits de cada par (source_id, filename), calculado en bloque."""
+    keys = source_ids.astype(str).to_numpy(dtype=object) + KEY_SEPARATOR + filenames.astype(str).to_numpy(dtype=object)
+    return pd.util.hash_array(keys, hash_key=HASH_KEY, categorize=False)
+
+
+def _bloom_positions(keys: np.ndarray, n_bits: int) -> np.ndarray:
+    # Doble hashing (Kirsch-Mitzenmacher) a partir de las dos mitades de la clave de 64 bits.
+    h1 = keys & np.uint64(0xFFFFFFFF); h2 = (keys >> np.uint64(32)) | np.uint64(1)
+    steps = np.arange(BLOOM_HASHES, dtype=np.uint64)
+    return ((h1[:, None] + steps[None, :] * h2[:, None]) % np.uint64(n_bits)).astype(np.int64)
+
+
+class FilenameIndex:
+    """Índice (source_id, filename) -> (primer día visto, nº de subidas) guardado en data/.cache/filename_index/."""
+
+    def __init__(self, index_path: Optional[str] = None):
+        self.index_path = index_path or os.path.join(data_loaders.get_cache_dir(), FILENAME_INDEX_DIR)
+        self.manifest = self._read_manifest()
+        self._segments: Optional[List[Tuple[np.ndarray, np.ndarray, np.ndarray]]] = None
+        self._bloom: Optional[np.ndarray] = None
+        self._obsolete: List[str] = []
+
+    # --- Persistencia ---
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.index_path, MANIFEST_FILENAME), 'r', encoding='utf-8') as f: manifest = json.load(f)
+            if manifest.get("version") == FILENAME_INDEX_VERSION: return manifest
+            logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: Índice de nombres con versión distinta en '{self.index_path}'; se reconstruirá.")
+        except FileNotFoundError: pass
+        return {"version": FILENAME_INDEX_VERSION, "segments": [], "ingested_dates": [], "n_keys": 0, "bloom": None, "next_segment": 0}
+
+    def _write_manifest(self) -> None:
+        # El manifiesto es el punto de confirmación: los segmentos que no lista no existen para las consultas.
+        tmp_path = data_loaders.get_tmp_path(os.path.join(self.index_path, MANIFEST_FILENAME))
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(self.manifest, f)
+        os.replace(tmp_path, os.path.join(self.index_path, MANIFEST_FILENAME))
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.index_path, name)
+
+    def _load(self) -> None:
+        if self._segments is not None: return
+        self._segments = [
+            tuple(np.load(self._path(f"{segment}_{column}.npy"), mmap_mode='r') for column in ("keys", "first_seen", "count"))
+            for segment in self.manifest["segments"]
+        ]
+        bloom = self.manifest.get("bloom")
+        self._bloom = np.load(self._path(bloom["file"]), mmap_mode='r') if bloom else None
+
+    def _write_segment(self, keys: np.ndarray, first_seen: np.ndarray, count: np.ndarray) -> str:
+        segment = f"seg{self.manifest['next_segment']:06d}"
+        self.manifest["next_segment"] += 1
+        np.save(self._path(f"{segment}_keys.npy"), keys)
+        np.save(self._path(f"{segment}_first_seen.npy"), first_seen)
+        np.save(self._path(f"{segment}_count.npy"), count)
+        return segment
+
+    def _write_bloom(self, bits: np.ndarray) -> None:
+        old = self.manifest.get("bloom")
+        name = f"bloom{self.manifest['next_segment']:06d}.npy"
+        self.manifest["next_segment"] += 1
+        np.save(self._path(name), bits)
+        self.manifest["bloom"] = {"file": name, "n_bits": int(bits.size * 8), "capacity": int(bits.size * 8 // BLOOM_BITS_PER_KEY)}
+        if old: self._obsolete.append(old["file"])
+
+    # --- Ingesta ---
+
+    def is_ingested(self, date_str: str) -> bool:
+        return date_str in self.manifest["ingested_dates"]
+
+    def ingest(self, files_df: pd.DataFrame, date_str: str) -> int:
+        """
+        Añade al índice los archivos subidos el día `date_str` (un segmento nuevo) y devuelve cuántas claves tenía el día.
+        Es idempotente por fecha: un día ya ingerido no se vuelve a contar.
+        """
+        if self.is_ingested(date_str): return 0
+        os.makedirs(self.index_path, exist_ok=True)
+        keys = np.empty(0, dtype=np.uint64)
+        if not files_df.empty:
+            keys, counts = np.unique(hash_keys(files_df['source_id'], files_df['filename']), return_counts=True)
+            first_seen = np.full(keys.size, _day_number(date_str), dtype=np.int32)
+            # n_keys cuenta claves distintas: las que ya estaban en otro segmento no se vuelven a sumar.
+            self._load(); known, _ = self._lookup_keys(keys)
+            self.manifest["segments"].append(self._write_segment(keys, first_seen, counts.astype(np.int32)))
+            self.manifest["n_keys"] += int((known < 0).sum())
+            self._add_to_bloom(keys)
+        self.manifest["ingested_dates"] = sorted(self.manifest["ingested_dates"] + [date_str])
+        if len(self.manifest["segments"]) > MAX_SEGMENTS: self._compact()
+        self._write_manifest()
+        self._remove_obsolete()
+        self._segments = None
+        return int(keys.size)
+
+    def _add_to_bloom(self, keys: np.ndarray) -> None:
+        bloom = self.manifest.get("bloom")
+        # Si el filtro se quedó chico se reconstruye en la próxima compactación; mientras tanto solo sube su tasa de falsos positivos.
+        if bloom is None:
+            bits = np.zeros(max(keys.size * BLOOM_BITS_PER_KEY * 4 // 8, 1024), dtype=np.uint8)
+        else:
+            bits = np.array(np.load(self._path(bloom["file"])))
+        positions = _bloom_positions(keys, bits.size * 8).ravel()
+        np.bitwise_or.at(bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+        self._write_bloom(bits)
+
+    def _compact(self) -> None:
+        """Fusiona todos los segmentos en uno: primer día visto = mínimo, subidas = suma."""
+        self._segments = None; self._load()
+        keys = np.concatenate([s[0] for s in self._segments]); first_seen = np.concatenate([s[1] for s in self._segments]); count = np.concatenate([s[2] for s in self._segments])
+        order = np.argsort(keys, kind='stable')
+        keys, first_seen, count = keys[order], first_seen[order], count[order]
+        unique_keys, starts = np.unique(keys, return_index=True)
+        merged = self._write_segment(unique_keys, np.minimum.reduceat(first_seen, starts).astype(np.int32), np.add.reduceat(count, starts).astype(np.int32))
+        self._obsolete += [f"{segment}_{column}.npy" for segment in self.manifest["segments"] for column in ("keys", "first_seen", "count")]
+        self.manifest["segments"] = [merged]; self.manifest["n_keys"] = int(unique_keys.size)
+        self._segments = None
+        bits = np.zeros(max(unique_keys.size * BLOOM_BITS_PER_KEY * 2 // 8, 1024), dtype=np.uint8)
+        positions = _bloom_positions(unique_keys, bits.size * 8).ravel()
+        np.bitwise_or.at(bits, positions >> 3, (1 << (positions & 7)).astype(np.uint8))
+        self._write_bloom(bits)
+
+    def _remove_obsolete(self) -> None:
+        for name in self._obsolete:
+            try: os.remove(self._path(name))
+            except FileNotFoundError: pass
+        self._obsolete = []
+
+    # --- Consultas ---
+
+    def lookup(self, source_ids: pd.Series, filenames: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Para cada archivo devuelve (primer día visto como nº de día desde 1970, o -1; nº total de subidas).
+        Un archivo que el Bloom descarta no se busca en los segmentos.
+        """
+        self._load()
+        return self._lookup_keys(hash_keys(source_ids, filenames))
+
+    def _lookup_keys(self, keys: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        first_seen = np.full(keys.size, -1, dtype=np.int64); count = np.zeros(keys.size, dtype=np.int64)
+        if not self._segments or not keys.size: return first_seen, count
+        candidates = np.arange(keys.size)
+        if self._bloom is not None:
+            bits = self._bloom
+            positions = _bloom_positions(keys, bits.size * 8)
+            maybe = ((bits[positions >> 3] >> (positions & 7)) & 1).all(axis=1)
+            candidates = candidates[maybe]
+        query = keys[candidates]
+        for seg_keys, seg_first_seen, seg_count in self._segments:
+            idx = np.minimum(np.searchsorted(seg_keys, query), seg_keys.size - 1)
+            hit = seg_keys[idx] == query
+            rows = candidates[hit]; seen = seg_first_seen[idx[hit]]
+            first_seen[rows] = np.where(first_seen[rows] < 0, seen, np.minimum(first_seen[rows], seen))
+            count[rows] += seg_count[idx[hit]]
+        return first_seen, count
+
+    def seen_before(self, source_ids: pd.Series, filenames: pd.Series, date_str: str) -> Tuple[np.ndarray, List[Optional[str]]]:
+        """Máscara de archivos ya recibidos en un día anterior a `date_str`, y ese primer día (YYYY-MM-DD) por fila."""
+        first_seen, _ = self.lookup(source_ids, filenames)
+        mask = (first_seen >= 0) & (first_seen < _day_number(date_str))
+        return mask, [_day_str(day) if hit else None for day, hit in zip(first_seen, mask)]
+
+
+def open_default_index() -> Optional[FilenameIndex]:
+    """El índice de data/.cache/filename_index/ si ya se ingirió al menos un día; si no, None."""
+    index = FilenameIndex()
+    return index if index.manifest["ingested_dates"] else None
+
+
+def ingest_dates(dates: List[str]) -> Dict[str, int]:
+    """Ingresa (en orden) los archivos de cada fecha, leídos de su propia foto diaria."""
+    index = FilenameIndex(); ingested = {}
+    for date_str in dates:
+        if index.is_ingested(date_str): continue
+        files_df = snapshot_cache.load_files_frame(os.path.join(data_loaders.get_snapshot_dir(date_str), "files.json"), date_str)
+        ingested[date_str] = index.ingest(files_df, date_str)
+        logging.info(f"--- 🗂️  Índice de nombres: {date_str} → {ingested[date_str]} claves nuevas en segmento.")
+    return ingested
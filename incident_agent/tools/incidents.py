@@ -0,0 +1,88 @@
+# incident_agent/tools/incidents.py
+
+import collections
+import json
+import sys
+from typing import Any, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+
+# --- REGISTRO COMPACTO DE INCIDENCIAS ---
+# El motor produce `Incident` (con __slots__) en lugar de diccionarios: la plantilla de la descripción es una
+# constante compartida por todas las incidencias de la regla y solo se guardan sus valores. El texto se arma
+# al escribir la salida (`description`, `to_dict`, `write_ndjson`). Las funciones de este módulo aceptan
+# también los diccionarios de siempre, así un flujo puede mezclar ambos (p. ej. la caché de resultados).
+
+
+class Incident:
+    __slots__ = ("source_id", "incident_type", "severity", "date", "template", "args")
+
+    def __init__(self, source_id: Optional[str], incident_type: str, template: str, severity: Optional[str] = None,
+                 date: Optional[str] = None, args: Tuple[Any, ...] = ()):
+        self.source_id, self.incident_type, self.severity, self.date = source_id, incident_type, severity, date
+        # Sin `args`, la plantilla es el texto literal (no se interpretan llaves).
+        self.template, self.args = template, args
+
+    @property
+    def description(self) -> str:
+        return self.template.format(*self.args) if self.args else self.template
+
+    def to_dict(self) -> Dict[str, Any]:
+        """El diccionario de siempre (mismas claves, mismo orden); las claves vacías se omiten, como en los "Process Error"."""
+        incident = {"source_id": self.source_id, "incident_type": self.incident_type, "description": self.description,
+                    "severity": self.severity, "date": self.date}
+        for name in ("source_id", "severity", "date"):
+            if incident[name] is None: del incident[name]
+        return incident
+
+    def to_row(self) -> List[Any]:
+        """Forma serializable a JSON sin fuente ni fecha (las aporta quien la guarda, p. ej. la caché de resultados)."""
+        # Los escalares de numpy se pasan a Python: JSON conserva int/float y el formato de la plantilla no cambia.
+        return [self.incident_type, self.severity, self.template, [arg.item() if hasattr(arg, "item") else arg for arg in self.args]]
+
+    @classmethod
+    def from_row(cls, source_id: str, date: str, row: List[Any]) -> "Incident":
+        incident_type, severity, template, args = row
+        return cls(source_id, incident_type, template, severity, date, tuple(args))
+
+    def __repr__(self) -> str:
+        return f"Incident({self.source_id!r}, {self.incident_type!r}, {self.description!r})"
+
+
+IncidentLike = Union[Incident, Dict[str, Any]]
+
+
+def as_dict(incident: IncidentLike) -> Dict[str, Any]:
+    return incident.to_dict() if isinstance(incident, Incident) else incident
+
+
+def _field(incident: IncidentLike, name: str) -> Any:
+    return getattr(incident, name) if isinstance(incident, Incident) else incident.get(name)
+
+
+def write_ndjson(incidents: Iterable[IncidentLike], stream: Optional[TextIO] = None) -> int:
+    """
+    Una línea JSON por incidencia, a medida que llegan (la descripción se arma aquí). Devuelve cuántas se escribieron.
+    Los acentos se escapan igual que en el array de `direct.write_incidents_json`: ambas salidas coinciden.
+    """
+    stream = stream or sys.stdout
+    count = 0
+    for incident in incidents:
+        stream.write(json.dumps(as_dict(incident)) + "\n")
+        count += 1
+    stream.flush()
+    return count
+
+
+def summarize(incidents: Iterable[IncidentLike]) -> Dict[str, Any]:
+    """Conteos por tipo, por severidad y por ambos, recorriendo el flujo una sola vez y sin guardar las incidencias."""
+    by_type, by_severity, by_both = collections.Counter(), collections.Counter(), collections.Counter()
+    for incident in incidents:
+        incident_type, severity = _field(incident, "incident_type"), _field(incident, "severity") or "N/A"
+        by_type[incident_type] += 1; by_severity[severity] += 1; by_both[(incident_type, severity)] += 1
+    nested: Dict[str, Dict[str, int]] = {}
+    for (incident_type, severity), count in sorted(by_both.items()): nested.setdefault(incident_type, {})[severity] = count
+    return {"total": sum(by_type.values()), "by_type": dict(sorted(by_type.items())), "by_severity": dict(sorted(by_severity.items())),
+            "by_type_and_severity": nested}
+
+
+def iter_dicts(incidents: Iterable[IncidentLike]) -> Iterator[Dict[str, Any]]:
+    for incident in incidents: yield as_dict(incident)
@@ -0,0 +1,175 @@
+# incident_agent/tools/intraday.py
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import data_loaders, detection_engine
+
+# --- MODO INCREMENTAL INTRADÍA ---
+# Mientras el día está abierto, files.json crece. Cada invocación procesa solo los registros nuevos
+# (los que no se vieron en una ejecución anterior), así las incidencias por archivo que devuelve son siempre nuevas.
+# Un registro se identifica por (fuente, archivo, uploaded_at): uno que llega tarde con un uploaded_at
+# anterior a lo ya procesado se procesa igual en la siguiente ejecución.
+# El estado acumulado por fuente (archivos, filas, subidas por nombre, claves ya reportadas) se guarda
+# en data/.cache/intraday/<fecha>.json. Las claves ya procesadas van aparte, como hashes de 64 bits en un
+# registro de solo-añadir (<fecha>.seen): cada ejecución agrega las suyas en vez de reescribir las del día.
+# Las reglas agregadas (faltantes, volumen) se evalúan al cierre.
+# Se asume una sola invocación a la vez por fecha (p. ej. el cron la lanza con `flock`).
+
+# Subir este número si cambia el formato del estado: los estados viejos se descartan y el día se reprocesa.
+INTRADAY_STATE_VERSION = 3
+INTRADAY_DIR = "intraday"
+# Clave fija para pandas.util.hash_array (SipHash): los hashes del registro deben ser estables entre ejecuciones.
+RECORD_HASH_KEY = "incident-intrad1"
+KEY_SEPARATOR = "\x1f"
+
+
+@dataclass
+class IntradayState:
+    date: str
+    # uploaded_at más reciente ya procesado (ISO 8601, solo informativo).
+    watermark: Optional[str] = None
+    # Hashes de las claves (fuente, archivo, uploaded_at) ya procesadas; los primeros `n_saved` ya están en el registro en disco.
+    seen: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=np.uint64))
+    n_saved: int = 0
+    # Por fuente: {"files": n, "rows": suma, "uploads": {archivo: n}, "reported": {archivo: etapa de duplicado}}.
+    sources: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Huellas de las incidencias agregadas (faltantes, volumen) ya emitidas: un cierre repetido solo emite las que cambiaron.
+    emitted: List[str] = field(default_factory=list)
+    n_emitted: int = 0
+    closed: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"version": INTRADAY_STATE_VERSION, "date": self.date, "watermark": self.watermark, "n_seen": int(self.seen.size),
+                "sources": self.sources, "emitted": self.emitted, "n_emitted": self.n_emitted, "closed": self.closed}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], seen: np.ndarray) -> "IntradayState":
+        return cls(date=data["date"], watermark=data.get("watermark"), seen=seen, n_saved=int(seen.size),
+                   sources=data.get("sources", {}), emitted=data.get("emitted", []), n_emitted=data.get("n_emitted", 0), closed=data.get("closed", False))
+
+
+def get_state_path(date_str: str) -> str:
+    return os.path.join(data_loaders.get_cache_dir(), INTRADAY_DIR, f"{date_str}.json")
+
+
+def get_seen_path(date_str: str) -> str:
+    return os.path.join(data_loaders.get_cache_dir(), INTRADAY_DIR, f"{date_str}.seen")
+
+
+def _read_seen(date_str: str, n_seen: int) -> np.ndarray:
+    # Solo cuentan los hashes confirmados por el estado: lo que un corte dejó escrito de más se ignora (y se pisa al guardar).
+    if not n_seen: return np.empty(0, dtype=np.uint64)
+    if not os.path.exists(get_seen_path(date_str)): raise ValueError("falta el registro de claves")
+    seen = np.fromfile(get_seen_path(date_str), dtype=np.uint64, count=n_seen)
+    if seen.size < n_seen: raise ValueError(f"registro de claves incompleto ({seen.size} de {n_seen})")
+    return seen
+
+
+def load_state(date_str: str) -> IntradayState:
+    """Estado guardado del día, o uno vacío si es la primera ejecución (o el formato cambió)."""
+    try:
+        with open(get_state_path(date_str), 'r', encoding='utf-8') as f: data = json.load(f)
+        if data.get("version") == INTRADAY_STATE_VERSION and data.get("date") == date_str:
+            return IntradayState.from_dict(data, _read_seen(date_str, data["n_seen"]))
+        logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: Estado intradía de {date_str} con otro formato; se reprocesa el día.")
+    except FileNotFoundError: pass
+    except ValueError as e: logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: Estado intradía de {date_str} ilegible ({e}); se reprocesa el día.")
+    return IntradayState(date=date_str)
+
+
+def save_state(state: IntradayState) -> None:
+    path = get_state_path(state.date)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Primero el registro (se agregan solo los hashes nuevos), después el estado: el estado es el punto de confirmación.
+    with open(get_seen_path(state.date), 'ab') as f:
+        f.truncate(state.n_saved * state.seen.itemsize)
+        f.write(state.seen[state.n_saved:].tobytes())
+    state.n_saved = int(state.seen.size)
+    tmp_path = data_loaders.get_tmp_path(path)
+    with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(state.to_dict(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _record_hashes(files_df: pd.DataFrame) -> np.ndarray:
+    """Hash de 64 bits de la clave (fuente, archivo, uploaded_at) de cada registro (texto de las tres columnas, NaT y nulos incluidos)."""
+    keys = files_df['source_id'].astype(str).to_numpy(dtype=object)
+    for column in ('filename', 'uploaded_at'): keys = keys + KEY_SEPARATOR + files_df[column].astype(str).to_numpy(dtype=object)
+    return pd.util.hash_array(keys, hash_key=RECORD_HASH_KEY, categorize=False)
+
+
+def select_new_records(day_files_df: pd.DataFrame, state: IntradayState) -> pd.DataFrame:
+    """Registros del día cuya clave (fuente, archivo, uploaded_at) aún no se procesó, sin importar su uploaded_at."""
+    if day_files_df.empty or not state.seen.size: return day_files_df
+    return day_files_df[~np.isin(_record_hashes(day_files_df), state.seen)]
+
+
+def _key_history(state: IntradayState) -> detection_engine.KeyHistory:
+    history = detection_engine.KeyHistory()
+    for source_id, totals in state.sources.items():
+        history.uploads.update({(source_id, filename): n for filename, n in totals["uploads"].items()})
+        history.reported.update({(source_id, filename): stage for filename, stage in totals["reported"].items()})
+    return history
+
+
+def _advance(state: IntradayState, new_files_df: pd.DataFrame, history: detection_engine.KeyHistory) -> None:
+    """Suma el tramo procesado a los totales por fuente y registra sus claves como vistas."""
+    source_ids = new_files_df['source_id'].astype(object)
+    for source_id, rows in new_files_df['rows'].groupby(source_ids, sort=False):
+        totals = state.sources.setdefault(source_id, {"files": 0, "rows": 0, "uploads": {}, "reported": {}})
+        # Suma exacta del tramo (int o float según la columna); el tipo final lo fija el cierre.
+        totals["files"] += len(rows)
+        totals["rows"] += np.asarray(rows.sum()).item()
+    for name, by_key in (("uploads", history.uploads), ("reported", history.reported)):
+        for (source_id, filename), value in by_key.items():
+            if source_id in state.sources: state.sources[source_id][name][filename] = value
+    state.seen = np.concatenate([state.seen, np.unique(_record_hashes(new_files_df))])
+    watermark = new_files_df['uploaded_at'].max()
+    if pd.notna(watermark) and (state.watermark is None or watermark > pd.Timestamp(state.watermark)): state.watermark = watermark.isoformat()
+
+
+def _fingerprint(incident: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(incident, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
+
+
+def _only_new(state: IntradayState, incidents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    emitted = set(state.emitted); fresh = []
+    for incident in incidents:
+        fingerprint = _fingerprint(incident)
+        if fingerprint in emitted: continue
+        emitted.add(fingerprint); state.emitted.append(fingerprint); fresh.append(incident)
+    return fresh
+
+
+def process_update(state: IntradayState, day_files_df: pd.DataFrame, historical_files_df: pd.DataFrame,
+                   cv_patterns_by_source: Dict[str, Dict[str, Any]], history_index: Optional[Any] = None,
+                   close_day: bool = False) -> List[Dict[str, Any]]:
+    """
+    Procesa los registros nuevos de `day_files_df` (la foto actual del día) contra el estado y devuelve las
+    incidencias nuevas. Con `close_day`, agrega además las de faltantes y volumen sobre los totales del día.
+    El estado se actualiza en memoria; guardarlo es responsabilidad de quien llama (`save_state`).
+    """
+    new_files_df = select_new_records(day_files_df, state)
+    incidents: List[Dict[str, Any]] = []
+    if not new_files_df.empty:
+        history = _key_history(state)
+        incidents = detection_engine.run_delta_detectors(new_files_df, historical_files_df, cv_patterns_by_source, state.date, history, history_index)
+        _advance(state, new_files_df, history)
+    logging.info(f"--- Tramo intradía: {len(new_files_df)} registros nuevos (marca de agua: {state.watermark}).")
+    if close_day:
+        # Las filas suman con el tipo de la columna del día completo (float si algún registro no trae filas), como en una sola pasada.
+        rows_type = float if 'rows' in day_files_df and day_files_df['rows'].dtype.kind == 'f' else int
+        incidents += _only_new(state, detection_engine.run_closing_detectors(
+            {source_id: totals["files"] for source_id, totals in state.sources.items()},
+            {source_id: rows_type(totals["rows"]) for source_id, totals in state.sources.items()},
+            cv_patterns_by_source, state.date, rows_type()))
+        state.closed = True
+    state.n_emitted += len(incidents)
+    return incidents
@@ -1,64 +1,130 @@
-from google.adk.tools.tool_context import ToolContext
-from . import data_loaders, detectors
-from typing import List, Dict, Any
+from . import cv_store, data_loaders, detection_engine, filename_index, intraday, profiling, result_cache, snapshot_cache
+from .incidents import Incident
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional
 import logging # <-- Importamos logging
+import os
 
-def run_full_analysis(date_str: str, tool_context: ToolContext) -> List[Dict[str, Any]]:
+if TYPE_CHECKING:
+    # Solo para anotaciones: el modo directo no debe importar google.adk.
+    from google.adk.tools.tool_context import ToolContext
+
+def _cv_patterns_by_source(cv_baselines: cv_store.CVBaselineStore, all_source_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    cv_patterns_by_source = {}
+    for source_id in all_source_ids:
+        cv_patterns = cv_baselines.get_cv_patterns(source_id)
+        if not cv_patterns:
+            logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: No se pudo procesar el CV de {source_id}. Se omite esta fuente.")
+            continue
+        cv_patterns_by_source[source_id] = cv_patterns
+    return cv_patterns_by_source
+
+def _open_history_index() -> Optional[filename_index.FilenameIndex]:
+    history_index = filename_index.open_default_index()
+    if history_index is not None:
+        logging.info(f"--- Usando índice de nombres históricos ({history_index.manifest['n_keys']} claves, {len(history_index.manifest['ingested_dates'])} días).")
+    return history_index
+
+def run_full_analysis(date_str: str, tool_context: Optional["ToolContext"] = None) -> List[Dict[str, Any]]:
     """
     Herramienta Orquestadora. Ejecuta el flujo completo de análisis de incidencias.
     """
+    # `tool_context` solo lo provee el agente; el modo directo (incident_agent.direct) lo omite.
+    return [incident.to_dict() for incident in iter_full_analysis(date_str)]
+
+def iter_full_analysis(date_str: str) -> Iterator[Incident]:
+    """
+    El flujo completo de `run_full_analysis`, entregando las incidencias (registros compactos) a medida que
+    se consumen: el modo directo las escribe sin armar la lista de diccionarios ni las descripciones de antemano.
+    La detección de la fecha termina antes de la primera entrega (ver `result_cache.iter_memoized`). Los tramos
+    del perfil se cierran antes de cada `yield`: un consumidor que corta antes no deja tramos abiertos, y la
+    fase 3 mide solo el cierre, no el tiempo del consumidor.
+    """
     logging.info(f"\n--- ⚙️ Herramienta Orquestadora Activada: Análisis para {date_str} ---")
     
     # --- PASO 1: RECOLECCIÓN ---
     logging.info("--- fase 1: Recolectando y procesando todos los datos de entrada... ---")
     all_source_ids = data_loaders.get_all_source_ids()
     if not all_source_ids:
-        return [{"incident_type": "Process Error", "description": "No se encontraron Hojas de Vida (CVs)."}]
-    logging.info(f"--- Encontrada lista maestra de {len(all_source_ids)} fuentes a monitorear.")
-    daily_files_df = data_loaders.process_files_json(f"data/{date_str}_20_00_UTC/files.json", date_str)
-    historical_files_df = data_loaders.process_files_json(f"data/{date_str}_20_00_UTC/files_last_weekday.json", date_str)
+        yield Incident(None, "Process Error", "No se encontraron Hojas de Vida (CVs).")
+        return
+    with profiling.span("fase 1: recolección", "phase") as phase:
+        logging.info(f"--- Encontrada lista maestra de {len(all_source_ids)} fuentes a monitorear.")
+        cv_baselines = cv_store.get_default_store()
+        with profiling.span("cv_store.warm", "load", rows=len(all_source_ids)):
+            cv_stats = cv_baselines.warm(all_source_ids)
+        logging.info(f"--- Líneas base de CVs listas ({cv_stats['hits']} desde caché, {cv_stats['compiled']} compiladas).")
+        snapshot_dir = data_loaders.get_snapshot_dir(date_str)
+        daily_files_df = snapshot_cache.load_files_frame(os.path.join(snapshot_dir, "files.json"), date_str)
+        historical_files_df = snapshot_cache.load_files_frame(os.path.join(snapshot_dir, "files_last_weekday.json"), date_str)
+        phase.rows = len(daily_files_df) + len(historical_files_df)
     logging.info(f"--- Cargados {len(daily_files_df)} archivos de hoy y {len(historical_files_df)} archivos históricos.")
 
-    all_incidents = []
-    
-    # --- PASO 2: CICLO DE DETECCIÓN ---
-    logging.info("\n--- fase 2: Iniciando ciclo de detección fuente por fuente... ---")
-    for source_id in all_source_ids:
-        logging.info(f"\n--- 🕵️ Analizando fuente: {source_id} ---")
-        
-        cv_patterns, _ = data_loaders.parse_cv_data_and_text(source_id)
-        if not cv_patterns:
-            logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: No se pudo procesar el CV. Se omite esta fuente.")
-            continue
-
-        # --- Ejecutamos los 6 detectores ---
-        
-        logging.info("--- ↳ Ejecutando: Detector de Archivos Faltantes...")
-        missing_incidents = detectors.find_missing_files(daily_files_df, cv_patterns, source_id, date_str)
-        if missing_incidents: all_incidents.extend(missing_incidents)
+    # --- PASO 2: DETECCIÓN ---
+    # Los CVs se resuelven por fuente; las reglas se evalúan en una sola pasada vectorizada
+    # sobre los archivos del día (ver detection_engine.py), solo para las fuentes cuyo contenido
+    # cambió desde la última vez: el resto reutiliza sus incidencias (ver result_cache.py).
+    logging.info("\n--- fase 2: Ejecutando los 6 detectores sobre todas las fuentes... ---")
+    with profiling.span("fase 2: detección", "phase", rows=len(daily_files_df)) as phase:
+        cv_patterns_by_source = _cv_patterns_by_source(cv_baselines, all_source_ids)
+        history_index = _open_history_index()
+        cv_digests = {source_id: cv_baselines.digest(source_id) for source_id in cv_patterns_by_source}
+        incidents = result_cache.iter_memoized(daily_files_df, historical_files_df, cv_patterns_by_source, date_str, history_index, cv_digests=cv_digests)
+        # La detección corre al pedir la primera incidencia: se pide aquí para que su tiempo quede en esta fase.
+        first = next(incidents, None)
+        if profiling.is_enabled() and not daily_files_df.empty:
+            # El motor evalúa todas las fuentes en una pasada: por fuente se reportan las filas, no un tiempo propio.
+            phase.args["rows_by_source"] = {str(k): int(v) for k, v in daily_files_df['source_id'].value_counts(sort=False).items()}
 
-        logging.info("--- ↳ Ejecutando: Detector de Duplicados y Fallidos...")
-        duplicated_incidents = detectors.find_duplicated_or_failed_files(daily_files_df, historical_files_df, source_id, date_str)
-        if duplicated_incidents: all_incidents.extend(duplicated_incidents)
+    # --- PASO 3: CONSOLIDACIÓN ---
+    logging.info(f"\n--- fase 3: Detección completada. ---")
+    count = 0
+    if first is not None:
+        yield first; count += 1
+        for incident in incidents: yield incident; count += 1
+    with profiling.span("fase 3: consolidación", "phase", rows=count):
+        logging.info(f"--- ✅ Se consolidaron un total de {count} incidencias. ---")
 
-        logging.info("--- ↳ Ejecutando: Detector de Archivos Vacíos Inesperados...")
-        empty_file_incidents = detectors.find_unexpected_empty_files(daily_files_df, cv_patterns, source_id, date_str)
-        if empty_file_incidents: all_incidents.extend(empty_file_incidents)
-            
-        logging.info("--- ↳ Ejecutando: Detector de Variación de Volumen...")
-        volume_incidents = detectors.find_volume_variations(daily_files_df, cv_patterns, source_id, date_str)
-        if volume_incidents: all_incidents.extend(volume_incidents)
+def run_incremental_analysis(date_str: str, close_day: bool = False) -> List[Dict[str, Any]]:
+    """
+    Análisis intradía: procesa solo los archivos subidos desde la ejecución anterior de esta fecha y
+    devuelve solo las incidencias nuevas. Con `close_day`, cierra el día con los chequeos agregados.
+    """
+    logging.info(f"\n--- ⚙️ Análisis incremental para {date_str}{' (cierre del día)' if close_day else ''} ---")
+    all_source_ids = data_loaders.get_all_source_ids()
+    if not all_source_ids:
+        return [{"incident_type": "Process Error", "description": "No se encontraron Hojas de Vida (CVs)."}]
+    cv_baselines = cv_store.get_default_store()
+    cv_baselines.warm(all_source_ids)
+    cv_patterns_by_source = _cv_patterns_by_source(cv_baselines, all_source_ids)
+    snapshot_dir = data_loaders.get_snapshot_dir(date_str)
+    # files.json cambia durante el día: se lee en streaming (la caché columnar se reconstruiría en cada tramo).
+    # La foto de la semana anterior no cambia y sí se lee desde la caché.
+    day_files_df = data_loaders.process_files_json(os.path.join(snapshot_dir, "files.json"), date_str)
+    historical_files_df = snapshot_cache.load_files_frame(os.path.join(snapshot_dir, "files_last_weekday.json"), date_str)
 
-        logging.info("--- ↳ Ejecutando: Detector de Archivos Fuera de Horario...")
-        late_upload_incidents = detectors.find_late_uploads(daily_files_df, cv_patterns, source_id, date_str)
-        if late_upload_incidents: all_incidents.extend(late_upload_incidents)
+    state = intraday.load_state(date_str)
+    if state.closed: logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: El día {date_str} ya estaba cerrado; solo se emitirá lo nuevo.")
+    new_incidents = intraday.process_update(state, day_files_df, historical_files_df, cv_patterns_by_source, _open_history_index(), close_day)
+    intraday.save_state(state)
+    logging.info(f"--- ✅ {len(new_incidents)} incidencias nuevas ({state.n_emitted} emitidas en el día). ---")
+    return new_incidents
 
-        # --- LLAMADA CORREGIDA (HEMOS QUITADO 'cv_patterns') ---
-        logging.info("--- ↳ Ejecutando: Detector de Archivos de Periodos Anteriores...")
-        previous_period_incidents = detectors.find_previous_period_uploads(daily_files_df, source_id, date_str)
-        if previous_period_incidents: all_incidents.extend(previous_period_incidents)
+def run_sources_analysis(date_str: str, source_ids: List[str], cache: Optional[result_cache.ResultCache] = None) -> List[Dict[str, Any]]:
+    """
+    Análisis de un subconjunto de fuentes (una partición de incident_agent/sharding.py). Solo se compilan sus CVs
+    y solo se leen sus registros de las fotos diarias; las incidencias salen en el orden de `source_ids`.
+    """
+    logging.info(f"\n--- ⚙️ Análisis de {len(source_ids)} fuentes para {date_str} ---")
+    cv_baselines = cv_store.get_default_store()
+    with profiling.span("cv_store.warm", "load", rows=len(source_ids)):
+        cv_baselines.warm(source_ids)
+    wanted = set(source_ids)
+    snapshot_dir = data_loaders.get_snapshot_dir(date_str)
+    # La caché columnar se usa si ya está lista (run_local o `warm` la preparan); fría, cada partición lee solo lo suyo.
+    daily_files_df = snapshot_cache.load_files_frame(os.path.join(snapshot_dir, "files.json"), date_str, wanted, build=False)
+    historical_files_df = snapshot_cache.load_files_frame(os.path.join(snapshot_dir, "files_last_weekday.json"), date_str, wanted, build=False)
+    logging.info(f"--- Cargados {len(daily_files_df)} archivos de hoy y {len(historical_files_df)} archivos históricos de la partición.")
 
-    # --- PASO 3: CONSOLIDACIÓN ---
-    logging.info(f"\n--- fase 3: Ciclo de detección completado. ---")
-    logging.info(f"--- ✅ Se consolidaron un total de {len(all_incidents)} incidencias. ---")
-    return all_incidents
\ No newline at end of file
+    cv_patterns_by_source = _cv_patterns_by_source(cv_baselines, source_ids)
+    cv_digests = {source_id: cv_baselines.digest(source_id) for source_id in cv_patterns_by_source}
+    return result_cache.run_memoized(daily_files_df, historical_files_df, cv_patterns_by_source, date_str, _open_history_index(), cache, cv_digests)
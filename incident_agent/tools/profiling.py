@@ -0,0 +1,124 @@
+# incident_agent/tools/profiling.py
+
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+# --- INSTRUMENTACIÓN (TIEMPOS, CPU, MEMORIA, FILAS) ---
+# Tramos anidados (`with profiling.span(...)`) alrededor de las fases del orquestador, la carga de cada
+# archivo, la compilación de cada CV y cada detector. Desactivada por defecto: `span` devuelve un objeto
+# vacío y no mide nada. Con `enable()` (main.py --profile) se registran tiempo de pared, tiempo de CPU,
+# pico de memoria de Python/numpy (tracemalloc) y filas procesadas, y se exportan como JSON y/o Chrome trace.
+
+_enabled = False
+_origin = 0.0
+_records: List[Dict[str, Any]] = []
+_local = threading.local()
+
+
+class _NullSpan:
+    """Tramo de la instrumentación desactivada: acepta `rows` y `args` y no hace nada."""
+    rows: Optional[int] = None
+
+    def __init__(self): self.args: Dict[str, Any] = {}
+    def __enter__(self) -> "_NullSpan": return self
+    def __exit__(self, *exc) -> None: pass
+
+
+class _Span:
+    def __init__(self, name: str, category: str, rows: Optional[int], args: Dict[str, Any]):
+        self.name, self.category, self.rows, self.args = name, category, rows, args
+
+    def __enter__(self) -> "_Span":
+        stack = _stack()
+        self.depth = len(stack)
+        # tracemalloc tiene un solo pico global: se guarda el del tramo padre antes de reiniciarlo
+        # y se le devuelve al salir, así cada tramo anidado mide su propio pico.
+        current, self._peak_before = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        self._start_memory, self._carried_peak = current, 0
+        stack.append(self)
+        self._wall, self._cpu = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        wall, cpu = time.perf_counter() - self._wall, time.process_time() - self._cpu
+        stack = _stack(); stack.pop()
+        peak = max(tracemalloc.get_traced_memory()[1], self._carried_peak)
+        if stack: stack[-1]._carried_peak = max(stack[-1]._carried_peak, self._peak_before, peak)
+        _records.append({
+            "name": self.name, "category": self.category, "depth": self.depth, "thread": threading.get_ident(),
+            "start_s": round(self._wall - _origin, 6), "wall_s": round(wall, 6), "cpu_s": round(cpu, 6),
+            "peak_mb": round(max(peak - self._start_memory, 0) / 2**20, 3), "rows": self.rows, **({"args": self.args} if self.args else {}),
+        })
+
+
+def _stack() -> List[_Span]:
+    if not hasattr(_local, "stack"): _local.stack = []
+    return _local.stack
+
+
+def enable() -> None:
+    """Activa la instrumentación para el resto del proceso (inicia tracemalloc)."""
+    global _enabled, _origin
+    if _enabled: return
+    tracemalloc.start()
+    _enabled, _origin = True, time.perf_counter()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def reset() -> None:
+    """Descarta los tramos registrados (p. ej. entre escenarios de un benchmark)."""
+    global _origin
+    _records.clear(); _origin = time.perf_counter()
+
+
+def span(name: str, category: str = "step", rows: Optional[int] = None, **args: Any):
+    """Mide el bloque `with`. Las filas procesadas se pueden fijar después con `tramo.rows = n`."""
+    if not _enabled: return _NullSpan()
+    return _Span(name, category, rows, args)
+
+
+def build_report() -> Dict[str, Any]:
+    """Tramos en orden de inicio más un resumen por (categoría, nombre)."""
+    spans = sorted(_records, key=lambda record: record["start_s"])
+    summary: Dict[str, Dict[str, Any]] = {}
+    for record in spans:
+        entry = summary.setdefault(f"{record['category']}:{record['name']}", {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "peak_mb": 0.0, "rows": 0})
+        entry["calls"] += 1; entry["wall_s"] += record["wall_s"]; entry["cpu_s"] += record["cpu_s"]
+        entry["peak_mb"] = max(entry["peak_mb"], record["peak_mb"]); entry["rows"] += record["rows"] or 0
+    for entry in summary.values(): entry["wall_s"], entry["cpu_s"] = round(entry["wall_s"], 6), round(entry["cpu_s"], 6)
+    report = {"spans": spans, "summary": summary, "traced_peak_mb": round(tracemalloc.get_traced_memory()[1] / 2**20, 3) if _enabled else None}
+    try:
+        import resource
+        # ru_maxrss está en KiB en Linux (en bytes en macOS).
+        report["max_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError: pass
+    return report
+
+
+def chrome_trace(report: Dict[str, Any]) -> Dict[str, Any]:
+    """Formato Trace Event (chrome://tracing, Perfetto): un evento completo ('X') por tramo."""
+    events = []
+    for record in report["spans"]:
+        args = {"cpu_ms": round(record["cpu_s"] * 1000, 3), "peak_mb": record["peak_mb"], "rows": record["rows"], **record.get("args", {})}
+        events.append({"name": record["name"], "cat": record["category"], "ph": "X", "pid": os.getpid(), "tid": record["thread"],
+                       "ts": round(record["start_s"] * 1e6, 1), "dur": round(record["wall_s"] * 1e6, 1), "args": args})
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def write_reports(report_path: Optional[str] = None, trace_path: Optional[str] = None) -> None:
+    """Escribe el reporte JSON y/o el Chrome trace de todo lo medido en el proceso."""
+    if not _enabled or not _records: return
+    report = build_report()
+    for path, payload in ((report_path, report), (trace_path, chrome_trace(report) if trace_path else None)):
+        if not path: continue
+        with open(path, 'w', encoding='utf-8') as f: json.dump(payload, f, indent=2, ensure_ascii=False)
+        logging.info(f"--- ⏱️  Perfil escrito en '{path}'.")
@@ -0,0 +1,215 @@
+# incident_agent/tools/result_cache.py
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import cv_store, data_loaders, detection_engine, filename_index, profiling
+from .incidents import Incident
+
+# --- MEMOIZACIÓN DE RESULTADOS POR FUENTE (DIRECCIONADA POR CONTENIDO) ---
+# Las incidencias de una fuente dependen solo de sus filas del día, sus filas de la semana anterior, su CV,
+# la fecha, los días del índice de nombres anteriores a la fecha y el código de los detectores. Un hash de
+# todo eso es la clave: al re-analizar una fecha, las fuentes con la misma clave reutilizan sus incidencias
+# y el motor corre solo sobre las que cambiaron. El almacén (data/.cache/detection_results.json) está acotado
+# y desaloja por LRU. Cada entrada guarda las incidencias en forma compacta (`Incident.to_row`: tipo, severidad,
+# plantilla y valores), sin la descripción ya armada. El orden de uso y las estadísticas van en un archivo aparte
+# (detection_results.usage.json): una ejecución con solo aciertos no reescribe el almacén completo.
+
+# Subir este número si cambia el formato del almacén (o para invalidarlo a mano).
+RESULT_CACHE_VERSION = 3
+RESULT_CACHE_FILENAME = "detection_results.json"
+RESULT_CACHE_USAGE_SUFFIX = ".usage.json"
+DEFAULT_MAX_ENTRIES = 20000
+# Módulos cuyo código decide las incidencias: las reglas, la búsqueda de duplicados en el historial y la
+# proyección del CV que ven los detectores. Cualquier cambio en ellos invalida todas las claves.
+DETECTOR_MODULES = (detection_engine, detection_engine.detectors, filename_index, cv_store)
+
+_code_version: Optional[str] = None
+
+
+def detector_code_version() -> str:
+    """Hash del código fuente de los detectores (se calcula una vez por proceso)."""
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha1(str(RESULT_CACHE_VERSION).encode())
+        for module in DETECTOR_MODULES:
+            with open(module.__file__, 'rb') as f: digest.update(f.read())
+        _code_version = digest.hexdigest()
+    return _code_version
+
+
+def _cv_digest(cv_patterns: Dict[str, Any]) -> bytes:
+    """Huella de la línea base ya parseada (las tablas se serializan por valor)."""
+    payload = {name: [list(map(str, value.columns)), value.astype(object).values.tolist()] if isinstance(value, pd.DataFrame) else value
+               for name, value in sorted(cv_patterns.items())}
+    return json.dumps(payload, default=str, ensure_ascii=False).encode('utf-8')
+
+
+def _row_hashes_by_source(files_df: pd.DataFrame, source_ids: List[str]) -> Dict[str, bytes]:
+    """Por fuente, los hashes de sus filas en el orden del archivo (el orden importa: decide la primera subida)."""
+    if files_df.empty or "source_id" not in files_df.columns: return {}
+    df, ranks = detection_engine._select_sources(files_df, pd.Index(source_ids, dtype=object))
+    if df.empty: return {}
+    columns = [column for column in detection_engine.FILE_COLUMNS if column in df.columns]
+    frame = df[columns]
+    # Las fechas se hashean como enteros: todas en ns, así el streaming (µs) y la caché columnar (ns) dan la misma clave.
+    frame = frame.assign(**{column: frame[column].dt.as_unit('ns') for column in columns if pd.api.types.is_datetime64_any_dtype(frame[column])})
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    order = np.argsort(ranks, kind='stable')
+    bounds = np.cumsum(np.bincount(ranks, minlength=len(source_ids)))
+    hashes, start = hashes[order], 0
+    by_source = {}
+    for rank, end in enumerate(bounds):
+        if end > start: by_source[source_ids[rank]] = hashes[start:end].tobytes()
+        start = end
+    return by_source
+
+
+def source_keys(daily_files_df: pd.DataFrame, historical_files_df: pd.DataFrame, cv_patterns_by_source: Dict[str, Dict[str, Any]],
+                date_str: str, history_index: Optional[Any] = None, cv_digests: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Clave de contenido de cada fuente monitoreada (las que tienen CV). `cv_digests` (p. ej. de
+    `CVBaselineStore.digest`) evita re-serializar las tablas del CV en cada ejecución.
+    """
+    source_ids = [source_id for source_id, cv_patterns in cv_patterns_by_source.items() if cv_patterns]
+    daily, historical = _row_hashes_by_source(daily_files_df, source_ids), _row_hashes_by_source(historical_files_df, source_ids)
+    index_days = [day for day in history_index.manifest["ingested_dates"] if day < date_str] if history_index is not None else None
+    common = hashlib.sha1(json.dumps([detector_code_version(), date_str, index_days]).encode())
+    keys = {}
+    for source_id in source_ids:
+        digest = common.copy()
+        cv_digest = cv_digests[source_id].encode('utf-8') if cv_digests and cv_digests.get(source_id) else _cv_digest(cv_patterns_by_source[source_id])
+        for part in (source_id.encode('utf-8'), cv_digest, daily.get(source_id, b""), historical.get(source_id, b"")):
+            # Cada parte va precedida de su largo: dos partes distintas nunca producen la misma concatenación.
+            digest.update(len(part).to_bytes(8, 'little')); digest.update(part)
+        keys[source_id] = digest.hexdigest()
+    return keys
+
+
+class ResultCache:
+    """Incidencias por clave de contenido, con tope de entradas y desalojo LRU. Las estadísticas acumuladas se persisten."""
+
+    def __init__(self, cache_path: Optional[str] = None, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.cache_path = cache_path or os.path.join(data_loaders.get_cache_dir(), RESULT_CACHE_FILENAME)
+        self.usage_path = os.path.splitext(self.cache_path)[0] + RESULT_CACHE_USAGE_SUFFIX
+        self.max_entries = max_entries
+        # Los dict de Python conservan el orden de inserción: la primera entrada es la usada hace más tiempo.
+        self._entries: Dict[str, List[List[Any]]] = {}
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+        # Totales de ejecuciones anteriores (leídos del almacén); los de este proceso se suman al guardar.
+        self._previous = dict(self.stats)
+        # `_dirty`: cambiaron las entradas (se reescribe el almacén); `_touched`: solo el orden de uso o las estadísticas.
+        self._dirty = self._touched = False
+        self._load()
+
+    def _read(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f: payload = json.load(f)
+        except FileNotFoundError: return None
+        except Exception as e:
+            logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: Caché de resultados ilegible ('{path}'), se reconstruirá: {e}")
+            return None
+        return payload if payload.get("version") == RESULT_CACHE_VERSION else None
+
+    def _load(self) -> None:
+        payload = self._read(self.cache_path)
+        if payload is None: return
+        entries = payload.get("entries", {})
+        usage = self._read(self.usage_path) or {}
+        # Las claves sin uso registrado (p. ej. si el archivo de uso no se llegó a escribir) cuentan como las más antiguas.
+        order = [key for key in usage.get("order", []) if key in entries]
+        used = set(order)
+        self._entries = {key: entries[key] for key in entries if key not in used}
+        self._entries.update((key, entries[key]) for key in order)
+        self._previous.update(usage.get("lifetime", {}))
+
+    def _write_atomic(self, path: str, payload: Dict[str, Any]) -> None:
+        tmp_path = data_loaders.get_tmp_path(path)
+        with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(payload, f, ensure_ascii=False)
+        # Reemplazo atómico: un worker concurrente puede pisar las entradas de otro, nunca dejar un archivo corrupto.
+        os.replace(tmp_path, path)
+
+    def save(self) -> None:
+        if not (self._dirty or self._touched): return
+        os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+        if self._dirty: self._write_atomic(self.cache_path, {"version": RESULT_CACHE_VERSION, "entries": self._entries})
+        self._write_atomic(self.usage_path, {"version": RESULT_CACHE_VERSION, "lifetime": self.lifetime(), "order": list(self._entries)})
+        self._dirty = self._touched = False
+
+    def get(self, key: str) -> Optional[List[List[Any]]]:
+        incidents = self._entries.pop(key, None)
+        if incidents is None: self.stats["misses"] += 1; self._touched = True; return None
+        self._entries[key] = incidents; self._touched = True
+        self.stats["hits"] += 1
+        return incidents
+
+    def put(self, key: str, incidents: List[List[Any]]) -> None:
+        self._entries.pop(key, None); self._entries[key] = incidents; self._dirty = True
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        self._entries.clear(); self._dirty = True
+
+    def lifetime(self) -> Dict[str, int]:
+        return {name: self._previous.get(name, 0) + count for name, count in self.stats.items()}
+
+    def report(self) -> Dict[str, Any]:
+        """Estadísticas de este proceso y acumuladas, más la ocupación del almacén."""
+        lifetime = self.lifetime(); lookups = lifetime["hits"] + lifetime["misses"]
+        return {"path": self.cache_path, "entries": len(self._entries), "max_entries": self.max_entries, "session": dict(self.stats),
+                "lifetime": lifetime, "hit_rate": round(lifetime["hits"] / lookups, 4) if lookups else None}
+
+
+_default_caches: Dict[str, ResultCache] = {}
+
+def get_default_cache() -> ResultCache:
+    """Caché compartida del proceso para el DATA_BASE_PATH actual."""
+    cache_path = os.path.join(data_loaders.get_cache_dir(), RESULT_CACHE_FILENAME)
+    if cache_path not in _default_caches: _default_caches[cache_path] = ResultCache(cache_path)
+    return _default_caches[cache_path]
+
+
+def iter_memoized(daily_files_df: pd.DataFrame, historical_files_df: pd.DataFrame, cv_patterns_by_source: Dict[str, Dict[str, Any]],
+                  date_str: str, history_index: Optional[Any] = None, cache: Optional[ResultCache] = None,
+                  cv_digests: Optional[Dict[str, str]] = None) -> Iterator[Incident]:
+    """
+    Igual que `detection_engine.iter_all_detectors` (mismas incidencias, mismo orden), pero reutiliza las
+    incidencias de las fuentes cuya clave ya está en `cache` y corre el motor solo sobre las demás.
+    Las fuentes recalculadas se evalúan juntas en una pasada del motor, así que sus registros se reúnen (y la
+    caché se guarda) antes de la primera entrega; lo que se difiere es la descripción de cada incidencia y,
+    para las fuentes reutilizadas, la creación de sus registros.
+    """
+    cache = cache if cache is not None else get_default_cache()
+    with profiling.span("result_cache.keys", "cache", rows=len(daily_files_df)):
+        keys = source_keys(daily_files_df, historical_files_df, cv_patterns_by_source, date_str, history_index, cv_digests)
+    cached = {source_id: cache.get(key) for source_id, key in keys.items()}
+    stale = [source_id for source_id, rows in cached.items() if rows is None]
+    fresh: Dict[str, List[Incident]] = {source_id: [] for source_id in stale}
+    if stale:
+        # El motor agrupa la salida por fuente (en el orden de la lista), así cada grupo es la entrada de su fuente.
+        for incident in detection_engine.iter_all_detectors(daily_files_df, historical_files_df,
+                                                            {source_id: cv_patterns_by_source[source_id] for source_id in stale}, date_str, history_index):
+            fresh[incident.source_id].append(incident)
+        for source_id in stale: cache.put(keys[source_id], [incident.to_row() for incident in fresh[source_id]])
+    cache.save()
+    logging.info(f"--- Caché de resultados: {len(keys) - len(stale)} fuentes reutilizadas, {len(stale)} recalculadas ({cache.stats['evictions']} desalojos en el proceso).")
+    for source_id in keys:
+        if source_id in fresh: yield from fresh[source_id]
+        else:
+            for row in cached[source_id]: yield Incident.from_row(source_id, date_str, row)
+
+
+def run_memoized(daily_files_df: pd.DataFrame, historical_files_df: pd.DataFrame, cv_patterns_by_source: Dict[str, Dict[str, Any]],
+                 date_str: str, history_index: Optional[Any] = None, cache: Optional[ResultCache] = None,
+                 cv_digests: Optional[Dict[str, str]] = None) -> List[Dict[str, Any]]:
+    """Como `iter_memoized`, pero devuelve la lista de diccionarios de siempre."""
+    return [incident.to_dict() for incident in iter_memoized(daily_files_df, historical_files_df, cv_patterns_by_source, date_str,
+                                                             history_index, cache, cv_digests)]
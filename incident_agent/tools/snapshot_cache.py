@@ -0,0 +1,232 @@
+# incident_agent/tools/snapshot_cache.py
+
+import errno
+import json
+import logging
+import os
+import shutil
+from typing import Any, Collection, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from . import data_loaders, profiling
+
+# --- CACHÉ COLUMNAR DE LAS FOTOS DIARIAS (files.json / files_last_weekday.json) ---
+# La primera vez que se usa una foto, se convierte a columnas .npy en data/.cache/snapshots/.
+# Las siguientes lecturas abren esas columnas con memory-map y solo materializan las filas del día
+# pedido (búsqueda binaria sobre uploaded_at ordenado). Un cambio en el JSON invalida la caché.
+
+# Subir este número cuando cambie el formato en disco: invalida todas las cachés.
+SNAPSHOT_CACHE_VERSION = 1
+SNAPSHOTS_CACHE_DIR = "snapshots"
+META_FILENAME = "meta.json"
+# Marcador de nulo en las columnas de códigos de diccionario / booleanos (NaT se guarda como el mínimo int64).
+NULL_CODE = -1
+
+# Columnas con codificación propia; el resto se guarda como diccionario genérico de valores JSON.
+FLOAT_COLUMNS = ("rows", "file_size")
+
+
+def get_cache_path(json_path: str) -> str:
+    """data/<fecha>_20_00_UTC/files.json -> data/.cache/snapshots/<fecha>_20_00_UTC/files/"""
+    snapshot_dir = os.path.basename(os.path.dirname(os.path.abspath(json_path)))
+    stem = os.path.splitext(os.path.basename(json_path))[0]
+    return os.path.join(data_loaders.get_cache_dir(), SNAPSHOTS_CACHE_DIR, snapshot_dir, stem)
+
+
+def _iter_snapshot_items(json_path: str):
+    try:
+        for source_id, record_text in data_loaders.iter_snapshot_records(json_path):
+            yield source_id, json.loads(record_text)
+    except data_loaders.SnapshotFormatError:
+        # Forma que el escáner no reconoce: se recorre el JSON completo (solo ocurre al construir la caché).
+        with open(json_path, 'r', encoding='utf-8') as f: data = json.load(f)
+        for source_id, files_list in data.items():
+            for record in files_list: yield source_id, record
+
+
+def _dictionary_encode(values: List[Any]) -> Tuple[np.ndarray, List[Any]]:
+    """Codifica valores como índices a una tabla de únicos; los nulos quedan como NULL_CODE."""
+    table: Dict[Any, int] = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        codes[i] = NULL_CODE if value is None else table.setdefault(value, len(table))
+    return codes, list(table)
+
+
+def _save_string_table(directory: str, name: str, strings: List[str]) -> None:
+    # Tabla de cadenas como un blob UTF-8 + offsets: se puede abrir con memory-map sin pickle.
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    np.save(os.path.join(directory, f"{name}_blob.npy"), np.frombuffer(b"".join(encoded), dtype=np.uint8))
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+
+def build_snapshot_cache(json_path: str, cache_path: Optional[str] = None) -> str:
+    """Convierte una foto diaria completa (todas las fechas) a columnas .npy y devuelve la carpeta de caché."""
+    cache_path = cache_path or get_cache_path(json_path)
+    fingerprint = data_loaders.file_fingerprint(json_path)
+    sha1 = data_loaders.file_sha1(json_path)
+    logging.info(f"--- Lógica: Convirtiendo '{json_path}' a caché columnar ---")
+
+    source_ids, records = [], []
+    for source_id, record in _iter_snapshot_items(json_path):
+        source_ids.append(source_id); records.append(record)
+    fields = list(dict.fromkeys(key for record in records for key in record if key != 'source_id'))
+
+    tmp_path = data_loaders.get_tmp_path(cache_path)
+    shutil.rmtree(tmp_path, ignore_errors=True); os.makedirs(tmp_path)
+    meta: Dict[str, Any] = {"version": SNAPSHOT_CACHE_VERSION, **fingerprint, "sha1": sha1, "n_rows": len(records), "columns": fields + ["source_id"], "dictionaries": {}}
+
+    source_codes, meta["dictionaries"]["source_id"] = _dictionary_encode(source_ids)
+    np.save(os.path.join(tmp_path, "source_id.npy"), source_codes)
+    for name in fields:
+        values = [record.get(name) for record in records]
+        if name == "filename":
+            codes, table = _dictionary_encode(values)
+            np.save(os.path.join(tmp_path, "filename.npy"), codes)
+            _save_string_table(tmp_path, "filename", table)
+        elif name in FLOAT_COLUMNS:
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.array([np.nan if v is None else v for v in values], dtype=np.float64))
+        elif name == "is_duplicated":
+            np.save(os.path.join(tmp_path, f"{name}.npy"), np.array([NULL_CODE if v is None else int(bool(v)) for v in values], dtype=np.int8))
+        elif name == "uploaded_at":
+            uploaded_at = pd.to_datetime(pd.Series(values, dtype=object), utc=True, format='ISO8601').dt.as_unit('ns')
+            as_int = uploaded_at.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            order = np.argsort(as_int, kind='stable')
+            np.save(os.path.join(tmp_path, "uploaded_at.npy"), as_int)
+            # Índice por tiempo: permite seleccionar un día con dos búsquedas binarias.
+            np.save(os.path.join(tmp_path, "time_order.npy"), order.astype(np.int64))
+            np.save(os.path.join(tmp_path, "uploaded_at_sorted.npy"), as_int[order])
+        else:
+            codes, meta["dictionaries"][name] = _dictionary_encode(values)
+            np.save(os.path.join(tmp_path, f"{name}.npy"), codes)
+
+    # meta.json se escribe al final: una caché sin meta se considera incompleta.
+    with open(os.path.join(tmp_path, META_FILENAME), 'w', encoding='utf-8') as f: json.dump(meta, f, ensure_ascii=False)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    _install(tmp_path, cache_path, sha1)
+    return cache_path
+
+
+def _install(tmp_path: str, cache_path: str, sha1: str) -> None:
+    # La carpeta terminada reemplaza a la anterior sin dejar nunca una a medias: data/.cache puede ser compartida
+    # entre nodos que construyen la misma caché a la vez.
+    while True:
+        try: os.replace(tmp_path, cache_path); return
+        except OSError as e:
+            if e.errno not in (errno.ENOTEMPTY, errno.EEXIST): raise
+        current = _read_meta(cache_path)
+        if current is not None and current.get("sha1") == sha1:
+            # Otro proceso ya instaló la misma caché: se usa esa y se descarta la propia.
+            shutil.rmtree(tmp_path, ignore_errors=True); return
+        # La existente es de otra versión del JSON (o quedó incompleta): se aparta con un renombrado y se reintenta.
+        stale_path = data_loaders.get_tmp_path(f"{cache_path}.old")
+        try: os.replace(cache_path, stale_path)
+        except FileNotFoundError: continue
+        shutil.rmtree(stale_path, ignore_errors=True)
+
+
+def _read_meta(cache_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(os.path.join(cache_path, META_FILENAME), 'r', encoding='utf-8') as f: meta = json.load(f)
+    except (FileNotFoundError, ValueError): return None
+    return meta if meta.get("version") == SNAPSHOT_CACHE_VERSION else None
+
+
+def _rewrite_meta(cache_path: str, meta: Dict[str, Any]) -> None:
+    # Temporal + reemplazo: un corte a mitad de la escritura deja el meta.json anterior, nunca uno truncado.
+    meta_path = os.path.join(cache_path, META_FILENAME)
+    tmp_path = data_loaders.get_tmp_path(meta_path)
+    with open(tmp_path, 'w', encoding='utf-8') as f: json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, meta_path)
+
+
+def current_snapshot_cache(json_path: str) -> Optional[str]:
+    """La carpeta de caché del JSON si ya está construida y vigente; None si habría que (re)construirla."""
+    cache_path = get_cache_path(json_path)
+    meta = _read_meta(cache_path)
+    if meta is None: return None
+    fingerprint = data_loaders.file_fingerprint(json_path)
+    if all(meta.get(k) == v for k, v in fingerprint.items()): return cache_path
+    # El mtime cambió: solo se reconstruye si el contenido también cambió.
+    if meta.get("sha1") != data_loaders.file_sha1(json_path): return None
+    meta.update(fingerprint)
+    _rewrite_meta(cache_path, meta)
+    return cache_path
+
+
+def ensure_snapshot_cache(json_path: str) -> str:
+    """Devuelve la carpeta de caché vigente para el JSON, construyéndola o reconstruyéndola si hace falta."""
+    return current_snapshot_cache(json_path) or build_snapshot_cache(json_path)
+
+
+def _load_column(cache_path: str, name: str) -> np.ndarray:
+    return np.load(os.path.join(cache_path, f"{name}.npy"), mmap_mode='r')
+
+
+def _decode_strings(cache_path: str, name: str, codes: np.ndarray) -> List[Optional[str]]:
+    blob = _load_column(cache_path, f"{name}_blob"); offsets = _load_column(cache_path, f"{name}_offsets")
+    return [None if c == NULL_CODE else bytes(blob[offsets[c]:offsets[c + 1]]).decode('utf-8') for c in codes]
+
+
+def load_cached_files_frame(cache_path: str, date_str: str, source_ids: Optional[Collection[str]] = None) -> pd.DataFrame:
+    """Lee de la caché solo las filas subidas el día `date_str` (UTC) (y de `source_ids`, si se indica), en el orden original de la foto."""
+    meta = _read_meta(cache_path)
+    if meta is None: raise FileNotFoundError(f"caché columnar inexistente o incompleta: '{cache_path}'")
+    if not meta["n_rows"]: return pd.DataFrame()
+    day_start = pd.Timestamp(date_str, tz='UTC').normalize()
+    bounds = np.array([day_start.value, (day_start + pd.Timedelta(days=1)).value], dtype=np.int64)
+    lo, hi = np.searchsorted(_load_column(cache_path, "uploaded_at_sorted"), bounds, side='left')
+    rows = np.sort(_load_column(cache_path, "time_order")[lo:hi])
+    if source_ids is not None:
+        # Filtro sobre los códigos del diccionario: las demás columnas solo se leen para las filas que quedan.
+        wanted = [code for code, source_id in enumerate(meta["dictionaries"]["source_id"]) if source_id in source_ids]
+        rows = rows[np.isin(_load_column(cache_path, "source_id")[rows], wanted)]
+
+    columns: Dict[str, Any] = {}
+    for name in meta["columns"]:
+        values = _load_column(cache_path, name)[rows]
+        if name == "filename": columns[name] = _decode_strings(cache_path, name, values)
+        elif name in FLOAT_COLUMNS: columns[name] = np.asarray(values, dtype=np.float64)
+        elif name == "is_duplicated": columns[name] = [None if v == NULL_CODE else bool(v) for v in values]
+        elif name == "uploaded_at": columns[name] = pd.to_datetime(np.asarray(values, dtype=np.int64), unit='ns', utc=True)
+        else:
+            table = meta["dictionaries"][name]
+            columns[name] = [None if c == NULL_CODE else table[c] for c in values]
+    df = pd.DataFrame(columns, columns=meta["columns"])
+    return data_loaders.normalize_files_frame(df)
+
+
+def load_files_frame(json_path: str, date_str: str, source_ids: Optional[Collection[str]] = None, build: bool = True) -> pd.DataFrame:
+    """
+    Equivalente cacheado de `data_loaders.process_files_json`. Si la caché no se puede usar
+    (p. ej. carpeta de solo lectura), se lee el JSON en streaming como siempre.
+    Con `build=False` una caché fría no se construye: se leen en streaming solo los registros de `source_ids`
+    (una partición no decodifica la foto completa para construir una caché que comparte con los demás nodos).
+    """
+    if not os.path.exists(json_path): return pd.DataFrame()
+    with profiling.span(os.path.basename(json_path), "load", path=json_path) as step:
+        try:
+            with profiling.span("ensure_snapshot_cache", "load"):
+                cache_path = ensure_snapshot_cache(json_path) if build else current_snapshot_cache(json_path)
+            if cache_path is None: df = data_loaders.process_files_json(json_path, date_str, source_ids)
+            else: df = load_cached_files_frame(cache_path, date_str, source_ids)
+        except Exception as e:
+            logging.warning(f"--- ↳ ⚠️  ADVERTENCIA: Caché columnar no disponible para '{json_path}' ({e}); se lee el JSON.")
+            df = data_loaders.process_files_json(json_path, date_str, source_ids)
+        step.rows = len(df)
+    return df
+
+
+def warm_snapshot_caches(dates: Optional[List[str]] = None) -> List[str]:
+    """Convierte de antemano las fotos de todas las fechas de data/ (o de las indicadas)."""
+    built = []
+    for date_str in dates or data_loaders.list_snapshot_dates():
+        snapshot_dir = data_loaders.get_snapshot_dir(date_str)
+        for filename in ("files.json", "files_last_weekday.json"):
+            json_path = os.path.join(snapshot_dir, filename)
+            if os.path.exists(json_path): built.append(ensure_snapshot_cache(json_path))
+    return built
@@ -1,73 +1,54 @@
 # main.py
 
-import asyncio
-import os
-import ast
-import json
-import logging # <-- Importamos logging
 import argparse # <-- Importamos el manejador de argumentos
-from dotenv import load_dotenv
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai.types import Content, Part
-from incident_agent.agent import root_agent
+import sys
 
-# --- Lógica para configurar el logging y los argumentos ---
+# --- Punto de entrada histórico ---
+# La lógica vive en incident_agent/cli.py (python -m incident_agent <subcomando>). Este script conserva las
+# opciones planas de siempre y las traduce al subcomando equivalente; sin opciones, sigue usando el agente.
 parser = argparse.ArgumentParser()
-parser.add_argument(
-    "--json-only",
-    action="store_true",
-    help="Si se especifica, solo imprime el JSON final, sin logs de proceso."
-)
-args = parser.parse_args()
+parser.add_argument("--json-only", action="store_true", help="Si se especifica, solo imprime el JSON final, sin logs de proceso.")
+parser.add_argument("--warm-cv-cache", action="store_true", help="Pre-compila el almacén de líneas base de los CVs (data/.cache) y termina.")
+parser.add_argument("--warm-snapshot-cache", action="store_true", help="Convierte todas las fotos diarias de data/ a la caché columnar (data/.cache/snapshots) y termina.")
+parser.add_argument("--ingest-history", action="store_true", help="Ingresa los archivos de cada fecha (todas, o --start/--end) al índice persistente de nombres y termina.")
+parser.add_argument("--direct", action="store_true", help="Ejecuta el análisis sin agente ni LLM (no requiere GOOGLE_API_KEY ni importa google.adk).")
+parser.add_argument("--incremental", action="store_true", help="Modo intradía: procesa solo los archivos nuevos desde la última ejecución de --date e imprime solo las incidencias nuevas.")
+parser.add_argument("--close-day", action="store_true", help="Con --incremental, cierra el día: evalúa además archivos faltantes y variación de volumen.")
+parser.add_argument("--date", default="2025-09-08", help="Fecha a analizar (YYYY-MM-DD).")
+parser.add_argument("--batch", action="store_true", help="Analiza varias fechas en paralelo (modo directo). Sin --start/--end usa todas las carpetas de data/.")
+parser.add_argument("--start", help="Primera fecha del lote (YYYY-MM-DD, inclusive).")
+parser.add_argument("--end", help="Última fecha del lote (YYYY-MM-DD, inclusive).")
+parser.add_argument("--workers", type=int, help="Procesos del lote (por defecto, uno por CPU).")
+parser.add_argument("--output-dir", help="Con --batch, escribe un incidents_<fecha>.json por fecha aquí en lugar de un único JSON combinado.")
+parser.add_argument("--watch", action="store_true", help="Servicio de larga vida: vigila data/ y analiza cada foto diaria nueva o modificada (sin agente).")
+parser.add_argument("--sink", default="stdout", help="Con --watch: stdout, jsonl:<ruta> o sqlite:<ruta>.")
+parser.add_argument("--interval", type=float, default=5.0, help="Con --watch: segundos entre sondeos.")
+parser.add_argument("--debounce", type=float, default=2.0, help="Con --watch: segundos sin cambios antes de encolar una fecha.")
+parser.add_argument("--queue-size", type=int, default=8, help="Con --watch: fechas pendientes como máximo antes de frenar el sondeo.")
+parser.add_argument("--metrics-file", help="Con --watch: escribe aquí las métricas del servicio (JSON) en cada sondeo.")
+parser.add_argument("--profile", nargs="?", const="profile.json", help="Mide tiempos, CPU, memoria y filas por fase, archivo, CV y detector, y escribe el reporte JSON (por defecto profile.json).")
+parser.add_argument("--profile-trace", help="Además del reporte, escribe los tramos en formato Chrome trace (chrome://tracing, Perfetto).")
 
-# Si no es json-only, configuramos un logging visible. Si lo es, los logs se ocultarán.
-log_level = logging.CRITICAL if args.json_only else logging.INFO
-logging.basicConfig(level=log_level, format='%(message)s')
 
-# --- El resto del script ---
-load_dotenv("incident_agent/.env")
-if not os.getenv("GOOGLE_API_KEY"):
-    logging.critical("ERROR: La variable GOOGLE_API_KEY no está en incident_agent/.env")
-    exit()
+def to_subcommand(args: argparse.Namespace) -> list:
+    """Traduce las opciones planas al argv de `python -m incident_agent`."""
+    common = (["--json-only"] if args.json_only else []) + (["--profile", args.profile] if args.profile else []) \
+        + (["--profile-trace", args.profile_trace] if args.profile_trace else [])
+    dates = (["--start", args.start] if args.start else []) + (["--end", args.end] if args.end else [])
+    workers = ["--workers", str(args.workers)] if args.workers else []
+    if args.warm_cv_cache: return common + ["warm-cache", "cv"]
+    if args.warm_snapshot_cache: return common + ["warm-cache", "snapshots"]
+    if args.ingest_history: return common + ["warm-cache", "history"] + dates
+    if args.incremental: return common + ["analyze", "--date", args.date, "--incremental"] + (["--close-day"] if args.close_day else [])
+    if args.watch:
+        return common + ["watch", "--sink", args.sink, "--interval", str(args.interval), "--debounce", str(args.debounce),
+                         "--queue-size", str(args.queue_size)] + workers + (["--metrics-file", args.metrics_file] if args.metrics_file else [])
+    if args.batch: return common + ["batch"] + dates + workers + (["--output-dir", args.output_dir] if args.output_dir else [])
+    if args.direct: return common + ["analyze", "--date", args.date]
+    # --- El resto del script (modo agente) ---
+    return common + ["analyze", "--date", args.date, "--agent"]
 
-async def main_workflow(date_to_analyze: str):
-    logging.info(f"\n🚀 === INICIANDO ANÁLISIS DE INCIDENCIAS PARA LA FECHA: {date_to_analyze} === 🚀")
-    
-    session_service = InMemorySessionService()
-    runner = Runner(agent=root_agent, app_name="incident_factory_app", session_service=session_service)
-    session_id = f"daily_run_{date_to_analyze}"
-    await session_service.create_session(app_name=runner.app_name, user_id="system_supervisor", session_id=session_id)
-    initial_prompt = f"Ejecuta el análisis completo para la fecha '{date_to_analyze}'."
-    
-    logging.info(f"💬 Enviando orden al agente: '{initial_prompt}'")
-    content = Content(role="user", parts=[Part(text=initial_prompt)])
-    final_response_text = ""
-    async for event in runner.run_async(user_id="system_supervisor", session_id=session_id, new_message=content):
-        if event.is_final_response() and event.content and event.content.parts:
-            if event.content.parts[0].function_response:
-                 final_response_text = str(event.content.parts[0].function_response.response)
-            else: # Si el agente responde con texto por algún error
-                 final_response_text = event.content.parts[0].text
-            break
-            
-    logging.info("\n✅ === WORKFLOW COMPLETADO === ✅")
-    
-    try:
-        all_incidents = ast.literal_eval(final_response_text)
-        
-        # El print final es el único que no es un log, es el resultado.
-        # Siempre se imprimirá en la salida estándar.
-        print(json.dumps(all_incidents, indent=4))
-
-    except Exception as e:
-        logging.error("\nNo se pudo procesar la respuesta final del agente.")
-        logging.error(f"Error de parseo: {e}")
-        # Si hay un error, imprimimos la respuesta en bruto para depurar
-        print(f'{{"error": "Failed to parse agent response", "raw_response": "{final_response_text}"}}')
 
 if __name__ == "__main__":
-    FECHA_DE_ANALISIS = "2025-09-08"
-    if os.name == 'nt':
-        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-    asyncio.run(main_workflow(FECHA_DE_ANALISIS))
\ No newline at end of file
+    from incident_agent import cli
+    sys.exit(cli.main(to_subcommand(parser.parse_args())))
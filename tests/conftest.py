@@ -0,0 +1,28 @@
+# tests/conftest.py
+
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path: sys.path.insert(0, ROOT)
+
+from incident_agent.tools import data_loaders  # noqa: E402
+
+SOURCE_DATA = os.path.join(ROOT, "data")
+# Fechas con foto diaria en data/ (las pruebas recorren todas).
+REAL_DATES = sorted(name[:10] for name in os.listdir(SOURCE_DATA) if name.endswith(data_loaders.SNAPSHOT_DIR_SUFFIX))
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch) -> str:
+    """Copia de data/ (fotos diarias y CVs, sin cachés): las pruebas nunca escriben en data/.cache."""
+    target = tmp_path / "data"
+    target.mkdir()
+    for name in os.listdir(SOURCE_DATA):
+        source = os.path.join(SOURCE_DATA, name)
+        if name != data_loaders.CACHE_DIR_NAME and os.path.isdir(source): shutil.copytree(source, target / name)
+    monkeypatch.setattr(data_loaders, "DATA_BASE_PATH", str(target))
+    return str(target)
@@ -0,0 +1,56 @@
+# tests/test_agent_parity.py
+
+import ast
+import asyncio
+import json
+from typing import AsyncGenerator
+
+import pytest
+
+pytest.importorskip("google.adk")
+
+from google.adk.agents import Agent  # noqa: E402
+from google.adk.models.base_llm import BaseLlm  # noqa: E402
+from google.adk.models.llm_response import LlmResponse  # noqa: E402
+from google.genai.types import Content, FunctionCall, Part  # noqa: E402
+
+from incident_agent import agent as agent_module, cli, direct  # noqa: E402
+from conftest import REAL_DATES  # noqa: E402
+
+# El modo agente y el modo directo deben entregar las mismas incidencias. El modelo se reemplaza por uno
+# determinista que invoca la herramienta con la fecha del mensaje y devuelve su resultado como texto.
+
+
+class StubLlm(BaseLlm):
+    async def generate_content_async(self, llm_request, stream=False) -> AsyncGenerator[LlmResponse, None]:
+        last = llm_request.contents[-1].parts[0]
+        if last.function_response:
+            yield LlmResponse(content=Content(role="model", parts=[Part(text=str(last.function_response.response["result"]))]))
+        else:
+            date_str = last.text.split("'")[1]
+            yield LlmResponse(content=Content(role="model", parts=[Part(function_call=FunctionCall(name="run_full_analysis", args={"date_str": date_str}))]))
+
+
+@pytest.fixture
+def stub_agent(monkeypatch):
+    root = agent_module.root_agent
+    stub = Agent(name=root.name, model=StubLlm(model="stub"), instruction=root.instruction, tools=root.tools)
+    monkeypatch.setattr(agent_module, "root_agent", stub)
+    monkeypatch.setenv("GOOGLE_API_KEY", "stub")
+    return stub
+
+
+@pytest.mark.parametrize("date_str", [REAL_DATES[0], REAL_DATES[-1]])
+def test_agent_and_direct_paths_return_the_same_incidents(data_dir, stub_agent, date_str):
+    agent_incidents = ast.literal_eval(asyncio.run(cli.run_agent_analysis(date_str, stub_agent)))
+    assert agent_incidents == direct.run_analysis(date_str)
+    assert agent_incidents
+
+
+def test_agent_and_direct_cli_print_the_same_json(data_dir, stub_agent, capsys):
+    date_str = REAL_DATES[-1]
+    assert cli.main(["--json-only", "analyze", "--date", date_str]) == 0
+    direct_output = capsys.readouterr().out
+    assert cli.main(["--json-only", "analyze", "--date", date_str, "--agent"]) == 0
+    assert capsys.readouterr().out == direct_output
+    assert json.loads(direct_output)
@@ -0,0 +1,73 @@
+# tests/test_cv_store.py
+
+import os
+
+import pytest
+
+from incident_agent.tools import cv_store, data_loaders
+
+# El almacén compilado se reutiliza mientras el CV no cambie: mtime/tamaño iguales evitan leerlo,
+# un mtime distinto con el mismo contenido (SHA-1) solo actualiza la huella y un contenido distinto recompila.
+
+
+@pytest.fixture
+def source_ids(data_dir):
+    return sorted(data_loaders.get_all_source_ids())[:3]
+
+
+def _store() -> cv_store.CVBaselineStore:
+    return cv_store.CVBaselineStore(os.path.join(data_loaders.get_cache_dir(), cv_store.CV_STORE_FILENAME))
+
+
+def test_store_is_reused_from_disk(data_dir, source_ids):
+    assert _store().warm(source_ids) == {"hits": 0, "compiled": len(source_ids), "errors": 0}
+    store = _store()
+    assert store.warm(source_ids) == {"hits": len(source_ids), "compiled": 0, "errors": 0}
+    assert all(store.get(source_id).to_cv_patterns()["file_processing_stats"] is not None for source_id in source_ids)
+
+
+def test_touched_cv_keeps_its_baseline(data_dir, source_ids):
+    source_id = source_ids[0]
+    _store().warm(source_ids)
+    digest = _store().digest(source_id)
+    stat = os.stat(data_loaders.get_cv_path(source_id))
+    os.utime(data_loaders.get_cv_path(source_id), ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    store = _store()
+    assert store.warm(source_ids) == {"hits": len(source_ids), "compiled": 0, "errors": 0}
+    assert store.digest(source_id) == digest
+    # La huella nueva queda guardada: la próxima lectura ni siquiera rehace el SHA-1.
+    assert _store()._entries[source_id]["mtime_ns"] == stat.st_mtime_ns + 10**9
+
+
+@pytest.mark.parametrize("same_size", [False, True], ids=["appended", "same_size"])
+def test_changed_cv_is_recompiled(data_dir, source_ids, same_size):
+    source_id = source_ids[0]
+    _store().warm(source_ids)
+    digest = _store().digest(source_id)
+    cv_path = data_loaders.get_cv_path(source_id)
+    with open(cv_path, 'rb') as f: content = f.read()
+    # Mismo tamaño: solo el SHA-1 distingue el cambio (el mtime podría coincidir en sistemas de archivos gruesos).
+    content = content[:-1] + (b"X" if content[-1:] != b"X" else b"Y") if same_size else content + b"\nNota agregada.\n"
+    with open(cv_path, 'wb') as f: f.write(content)
+
+    store = _store()
+    assert store.warm(source_ids) == {"hits": len(source_ids) - 1, "compiled": 1, "errors": 0}
+    assert store.digest(source_id) != digest
+
+
+def test_compiler_version_bump_recompiles_everything(data_dir, source_ids, monkeypatch):
+    _store().warm(source_ids)
+    monkeypatch.setattr(cv_store, "CV_STORE_VERSION", cv_store.CV_STORE_VERSION + 1)
+    assert _store().warm(source_ids)["compiled"] == len(source_ids)
+
+
+def test_save_writes_through_a_host_and_pid_temporary(data_dir, source_ids, monkeypatch):
+    replaced = []
+    real_replace = os.replace
+    monkeypatch.setattr(data_loaders.socket, "gethostname", lambda: "nodo-a")
+    monkeypatch.setattr(os, "replace", lambda src, dst: (replaced.append(src), real_replace(src, dst)))
+    store = _store()
+    store.warm(source_ids)
+    assert replaced == [f"{store.store_path}.nodo-a.{os.getpid()}.tmp"]
+    assert not [name for name in os.listdir(os.path.dirname(store.store_path)) if name.endswith(".tmp")]
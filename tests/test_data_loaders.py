@@ -0,0 +1,85 @@
+# tests/test_data_loaders.py
+
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from incident_agent.tools import data_loaders, snapshot_cache
+from conftest import REAL_DATES
+
+# Las tres lecturas de una foto diaria (streaming, carga completa de respaldo y caché columnar)
+# deben entregar el mismo DataFrame: mismas filas, mismas columnas y mismos tipos.
+
+
+def _files_json(date_str: str) -> str:
+    return os.path.join(data_loaders.get_snapshot_dir(date_str), "files.json")
+
+
+def _comparable(df: pd.DataFrame) -> pd.DataFrame:
+    # Las categorías dependen de qué registros leyó cada cargador (el streaming descarta otros días sin decodificarlos).
+    df = df.copy()
+    for column in df.columns[df.dtypes == 'category']: df[column] = df[column].astype(object)
+    return df.sort_values(['source_id', 'uploaded_at', 'filename'], kind='stable').reset_index(drop=True)
+
+
+def _assert_same_frame(left: pd.DataFrame, right: pd.DataFrame) -> None:
+    assert list(left.dtypes.astype(str)) == list(right.dtypes.astype(str))
+    pd.testing.assert_frame_equal(_comparable(left), _comparable(right))
+
+
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_streaming_loader_matches_eager_loader(data_dir, date_str):
+    streamed = data_loaders.process_files_json(_files_json(date_str), date_str)
+    assert len(streamed) > 0
+    _assert_same_frame(streamed, data_loaders._process_files_json_eager(_files_json(date_str), date_str))
+
+
+def _write_snapshot(path, records_by_source) -> str:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f: json.dump(records_by_source, f, indent=4)
+    return path
+
+
+def _record(filename, uploaded_at, **extra):
+    return {"filename": filename, "rows": 10, "status": "processed", "is_duplicated": False, "file_size": 0.1,
+            "uploaded_at": uploaded_at, "status_message": None, **extra}
+
+
+MIXED_PRECISION = {
+    "1001": [_record("a.csv", "2025-09-12T08:00:00+00:00"), _record("b.csv", "2025-09-12T08:30:00.123456+00:00"),
+             _record("c.csv", "2025-09-11T23:59:59.5+00:00")],
+    "1002": [_record("d.csv", "2025-09-12T23:59:59.999999+00:00"), _record("e.csv", "2025-09-13T00:00:00+00:00")],
+}
+
+
+def test_mixed_timestamp_precision(tmp_path):
+    path = _write_snapshot(str(tmp_path / "2025-09-12_20_00_UTC" / "files.json"), MIXED_PRECISION)
+    streamed = data_loaders.process_files_json(path, "2025-09-12")
+    assert sorted(streamed['filename']) == ["a.csv", "b.csv", "d.csv"]
+    _assert_same_frame(streamed, data_loaders._process_files_json_eager(path, "2025-09-12"))
+
+
+def test_eager_fallback_is_typed_like_streaming(tmp_path):
+    flat = _write_snapshot(str(tmp_path / "flat" / "files.json"), MIXED_PRECISION)
+    # Un campo anidado hace fallar al escáner: la lectura cae a la carga completa.
+    nested = {source_id: [dict(record, extra={"k": 1}) for record in records] for source_id, records in MIXED_PRECISION.items()}
+    fallback = data_loaders.process_files_json(_write_snapshot(str(tmp_path / "nested" / "files.json"), nested), "2025-09-12")
+    assert list(fallback['extra']) == [{"k": 1}] * 3
+    _assert_same_frame(fallback.drop(columns='extra'), data_loaders.process_files_json(flat, "2025-09-12"))
+
+
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_source_filter_keeps_only_requested_sources(data_dir, date_str):
+    full = data_loaders.process_files_json(_files_json(date_str), date_str)
+    wanted = set(full['source_id'].astype(str).unique()[:3])
+    expected = int(full['source_id'].astype(str).isin(wanted).sum())
+
+    subset = data_loaders.process_files_json(_files_json(date_str), date_str, wanted)
+    assert len(subset) == expected > 0
+    assert set(subset['source_id'].astype(str)) == wanted
+    assert len(data_loaders._process_files_json_eager(_files_json(date_str), date_str, wanted)) == expected
+    # La caché columnar (que se construye en la primera lectura) filtra igual.
+    assert len(snapshot_cache.load_files_frame(_files_json(date_str), date_str, wanted)) == expected
+    assert len(snapshot_cache.load_files_frame(_files_json(date_str), date_str, wanted)) == expected
@@ -0,0 +1,136 @@
+# tests/test_detection_engine.py
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from incident_agent.tools import cv_store, data_loaders, detection_engine, snapshot_cache
+from conftest import REAL_DATES
+
+# El motor vectorizado debe producir exactamente las mismas incidencias (mismo texto, mismo orden)
+# que la implementación de referencia fuente por fuente, en los datos reales y en variantes perturbadas.
+
+FULL_DAY_NAMES = {name[:3].lower(): name for name in ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")}
+CV_PROJECTIONS = pytest.mark.parametrize("all_tables", [False, True], ids=["cv_patterns", "all_tables"])
+LOADERS = {"streaming": data_loaders.process_files_json, "columnar": snapshot_cache.load_files_frame}
+
+
+def _cv_patterns_by_source(all_tables=False):
+    # Tablas nuevas en cada llamada: la referencia modifica los nombres de columnas del CV que recibe.
+    # `to_cv_patterns` solo expone las estadísticas de archivos y los CVs reales abrevian los días ('Mon'), que las
+    # reglas comparan con el nombre completo. Con `all_tables` se exponen todas las tablas con los días completos,
+    # así también se comparan las reglas de faltantes, volumen, vacíos esperados y subidas tardías.
+    store = cv_store.get_default_store()
+    if not all_tables: return {source_id: store.get_cv_patterns(source_id) for source_id in data_loaders.get_all_source_ids()}
+    cv_patterns_by_source = {}
+    for source_id in data_loaders.get_all_source_ids():
+        baseline = store.get(source_id)
+        cv_patterns_by_source[source_id] = {"cv_type": baseline.cv_type}
+        for role, table in baseline.tables.items():
+            frame = table.to_frame()
+            frame['Day'] = frame['Day'].map(lambda day: FULL_DAY_NAMES.get(str(day)[:3].lower(), day))
+            cv_patterns_by_source[source_id][role] = frame
+    return cv_patterns_by_source
+
+
+def _frames(date_str, loader=data_loaders.process_files_json):
+    snapshot_dir = data_loaders.get_snapshot_dir(date_str)
+    return (loader(os.path.join(snapshot_dir, "files.json"), date_str),
+            loader(os.path.join(snapshot_dir, "files_last_weekday.json"), date_str))
+
+
+def _assert_equivalent(daily, historical, date_str, all_tables, without_cv=frozenset(), perturb_table=None):
+    def cv_patterns_by_source():
+        cv_patterns_by_source = {source_id: {} if source_id in without_cv else cv_patterns
+                                 for source_id, cv_patterns in _cv_patterns_by_source(all_tables).items()}
+        if perturb_table is None: return cv_patterns_by_source
+        return {source_id: {role: perturb_table(table) if isinstance(table, pd.DataFrame) else table for role, table in cv_patterns.items()}
+                for source_id, cv_patterns in cv_patterns_by_source.items()}
+    expected = detection_engine.run_per_source_detectors(daily, historical, cv_patterns_by_source(), date_str)
+    assert detection_engine.run_all_detectors(daily, historical, cv_patterns_by_source(), date_str) == expected
+    return expected
+
+
+@pytest.mark.parametrize("loader", LOADERS.values(), ids=LOADERS.keys())
+@CV_PROJECTIONS
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_engine_matches_reference_on_real_dates(data_dir, date_str, loader, all_tables):
+    daily, historical = _frames(date_str, loader)
+    assert _assert_equivalent(daily, historical, date_str, all_tables)
+
+
+@CV_PROJECTIONS
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_empty_day(data_dir, date_str, all_tables):
+    daily, historical = _frames(date_str)
+    # Sin archivos hoy: solo quedan los faltantes y la variación de volumen.
+    incidents = _assert_equivalent(daily.iloc[:0], historical, date_str, all_tables)
+    assert {incident["incident_type"] for incident in incidents} <= {"Missing File", "Unexpected Volume Variation"}
+
+
+@CV_PROJECTIONS
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_sources_without_cv_are_skipped(data_dir, date_str, all_tables):
+    daily, historical = _frames(date_str)
+    without_cv = frozenset(data_loaders.get_all_source_ids()[::2])
+    incidents = _assert_equivalent(daily, historical, date_str, all_tables, without_cv)
+    assert not {incident["source_id"] for incident in incidents} & without_cv
+
+
+@CV_PROJECTIONS
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_mixed_case_status(data_dir, date_str, all_tables):
+    daily, historical = _frames(date_str)
+    daily = daily.copy()
+    daily['status'] = [[str.upper, str.title, str.lower][pos % 3](str(status)) for pos, status in enumerate(daily['status'])]
+    daily.loc[daily.index[::4], 'is_duplicated'] = True
+    daily.loc[daily.index[::4], 'status'] = 'Stopped'
+    _assert_equivalent(daily, historical, date_str, all_tables)
+
+
+@CV_PROJECTIONS
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_duplicates_within_the_day_and_across_the_week(data_dir, date_str, all_tables):
+    daily, historical = _frames(date_str)
+    # Re-subidas del mismo archivo más tarde en el día (algunas fuera de horario) y con más filas.
+    resent = daily.iloc[::3].copy()
+    resent['uploaded_at'] = pd.Timestamp(f"{date_str} 23:59", tz="UTC")
+    resent['rows'] = resent['rows'] * 1000
+    daily = pd.concat([daily, resent], ignore_index=True)
+    # Archivos de hoy que ya estaban en la foto de la semana anterior.
+    historical = pd.concat([historical, daily.iloc[1::4]], ignore_index=True)
+    incidents = _assert_equivalent(daily, historical, date_str, all_tables)
+    found = {incident["incident_type"] for incident in incidents}
+    assert {"Intraday Duplicate", "Historical Duplicate"} <= found
+    if all_tables: assert {"File Upload After Schedule", "Unexpected Volume Variation", "Missing File"} <= found
+
+
+@CV_PROJECTIONS
+def test_numeric_rows_with_missing_values(data_dir, all_tables):
+    date_str = REAL_DATES[-1]
+    daily, historical = _frames(date_str)
+    daily = daily.copy()
+    daily['rows'] = daily['rows'].astype(float)
+    daily.loc[daily.index[::5], 'rows'] = np.nan
+    _assert_equivalent(daily, historical, date_str, all_tables)
+
+
+def _irregular_days(table):
+    # Nombres en mayúsculas, una fila sin día y el mismo día repetido más abajo con otros valores (gana el primero).
+    table = table.copy()
+    table['Day'] = table['Day'].map(lambda day: day.upper() if isinstance(day, str) else day)
+    blank = table.iloc[:1].copy(); blank['Day'] = None
+    repeated = table.copy()
+    for column in repeated.columns.drop('Day'):
+        numeric = pd.api.types.is_numeric_dtype(repeated[column])
+        repeated[column] = repeated[column] * 10 if numeric else "Min: 1<br>Max: 2<br>Mean: 99 – 23:00:00–23:59:00 UTC"
+    return pd.concat([blank, table, repeated], ignore_index=True)
+
+
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_irregular_cv_day_rows(data_dir, date_str):
+    daily, historical = _frames(date_str)
+    incidents = _assert_equivalent(daily, historical, date_str, all_tables=True, perturb_table=_irregular_days)
+    assert incidents
@@ -0,0 +1,119 @@
+# tests/test_filename_index.py
+
+import os
+
+import pandas as pd
+import pytest
+
+from incident_agent.tools import data_loaders, detection_engine, filename_index
+
+# El índice de nombres guarda, por (source_id, filename), el primer día visto y el total de subidas.
+# Debe dar lo mismo sin importar el orden de ingesta ni cuántas veces se compacte.
+
+
+def _files(date_str, *entries):
+    """entries: (source_id, filename) por cada subida del día."""
+    records = [{"filename": filename, "rows": 10, "status": "processed", "is_duplicated": False, "file_size": 0.1,
+                "uploaded_at": f"{date_str}T08:00:00+00:00", "status_message": None} for _, filename in entries]
+    return data_loaders._typed_files_frame([source_id for source_id, _ in entries], records)
+
+
+DAYS = {
+    "2025-09-08": _files("2025-09-08", ("1001", "a.csv"), ("1001", "b.csv")),
+    "2025-09-09": _files("2025-09-09", ("1001", "a.csv"), ("1002", "a.csv"), ("1002", "a.csv")),
+    "2025-09-10": _files("2025-09-10", ("1001", "c.csv")),
+    "2025-09-11": _files("2025-09-11", ("1001", "b.csv"), ("1002", "d.csv")),
+}
+QUERY = pd.DataFrame({"source_id": ["1001", "1001", "1001", "1002", "1002", "1003"],
+                      "filename": ["a.csv", "b.csv", "c.csv", "a.csv", "d.csv", "a.csv"]})
+# Lo esperado tras ingerir todos los días: (primer día visto, nº de subidas).
+EXPECTED = [("2025-09-08", 2), ("2025-09-08", 2), ("2025-09-10", 1), ("2025-09-09", 2), ("2025-09-11", 1), (None, 0)]
+
+
+@pytest.fixture
+def index_path(tmp_path) -> str:
+    return str(tmp_path / "filename_index")
+
+
+def _lookup(index):
+    first_seen, count = index.lookup(QUERY['source_id'], QUERY['filename'])
+    return [(filename_index._day_str(day) if day >= 0 else None, int(n)) for day, n in zip(first_seen, count)]
+
+
+def _ingest(index_path, dates):
+    index = filename_index.FilenameIndex(index_path)
+    for date_str in dates: index.ingest(DAYS[date_str], date_str)
+    return index
+
+
+def test_ingest_is_idempotent_per_date(index_path):
+    index = _ingest(index_path, DAYS)
+    manifest = dict(index.manifest)
+    assert index.ingest(DAYS["2025-09-09"], "2025-09-09") == 0
+    # También desde otra instancia (el manifiesto en disco manda).
+    assert filename_index.FilenameIndex(index_path).ingest(DAYS["2025-09-09"], "2025-09-09") == 0
+    assert filename_index.FilenameIndex(index_path).manifest == manifest
+    assert _lookup(filename_index.FilenameIndex(index_path)) == EXPECTED
+
+
+@pytest.mark.parametrize("order", [["2025-09-11", "2025-09-09", "2025-09-10", "2025-09-08"],
+                                   ["2025-09-10", "2025-09-08", "2025-09-11", "2025-09-09"]], ids=["reversed", "shuffled"])
+def test_out_of_order_ingests_keep_the_earliest_day(index_path, order):
+    index = _ingest(index_path, order)
+    assert index.manifest["ingested_dates"] == sorted(DAYS)
+    assert _lookup(filename_index.FilenameIndex(index_path)) == EXPECTED
+
+
+def test_n_keys_counts_distinct_keys(index_path):
+    index = _ingest(index_path, DAYS)
+    assert len(index.manifest["segments"]) == len(DAYS)
+    assert index.manifest["n_keys"] == 5
+
+
+def test_compaction_merges_first_seen_and_counts(index_path, monkeypatch):
+    monkeypatch.setattr(filename_index, "MAX_SEGMENTS", 2)
+    index = _ingest(index_path, ["2025-09-11", "2025-09-09", "2025-09-10", "2025-09-08"])
+    assert len(index.manifest["segments"]) <= 2
+    assert index.manifest["n_keys"] == 5
+    assert _lookup(filename_index.FilenameIndex(index_path)) == EXPECTED
+    # Los segmentos fusionados y los filtros de Bloom anteriores se borran.
+    listed = {f"{segment}_{column}.npy" for segment in index.manifest["segments"] for column in ("keys", "first_seen", "count")}
+    listed |= {index.manifest["bloom"]["file"], filename_index.MANIFEST_FILENAME}
+    assert set(os.listdir(index_path)) == listed
+
+
+def test_bloom_filter_rejects_unseen_files(index_path):
+    index = _ingest(index_path, DAYS)
+    index._load()
+    unseen = pd.Series([f"nunca_{i}.csv" for i in range(2000)])
+    first_seen, count = index.lookup(pd.Series(["1001"] * len(unseen)), unseen)
+    assert (first_seen == -1).all() and (count == 0).all()
+
+    def maybe(source_ids, filenames):
+        keys = filename_index.hash_keys(pd.Series(source_ids), pd.Series(filenames))
+        positions = filename_index._bloom_positions(keys, index._bloom.size * 8)
+        return ((index._bloom[positions >> 3] >> (positions & 7)) & 1).all(axis=1)
+
+    # Sin falsos negativos, y casi todo lo nunca visto se descarta antes de buscar en los segmentos.
+    assert maybe(QUERY['source_id'][:5], QUERY['filename'][:5]).all()
+    assert maybe(["1001"] * len(unseen), unseen).mean() < 0.05
+
+
+def test_seen_before_only_counts_earlier_days(index_path):
+    index = _ingest(index_path, DAYS)
+    mask, first_days = index.seen_before(QUERY['source_id'], QUERY['filename'], "2025-09-10")
+    assert list(mask) == [True, True, False, True, False, False]
+    assert first_days == ["2025-09-08", "2025-09-08", None, "2025-09-09", None, None]
+
+
+def test_engine_reports_files_already_received(index_path):
+    index = _ingest(index_path, ["2025-09-08", "2025-09-09"])
+    today = _files("2025-09-12", ("1001", "a.csv"), ("1001", "nuevo.csv"), ("1002", "a.csv"))
+    cv_patterns = {"1001": {"cv_type": "Tipo A (Tabla)"}, "1002": {"cv_type": "Tipo A (Tabla)"}}
+
+    without_index = detection_engine.run_all_detectors(today, pd.DataFrame(), cv_patterns, "2025-09-12")
+    assert not [i for i in without_index if i["incident_type"] == "Historical Duplicate"]
+    incidents = detection_engine.run_all_detectors(today, pd.DataFrame(), cv_patterns, "2025-09-12", index)
+    historical = [(i["source_id"], i["description"]) for i in incidents if i["incident_type"] == "Historical Duplicate"]
+    assert historical == [("1001", "Archivo ya recibido el 2025-09-08: 'a.csv'."),
+                          ("1002", "Archivo ya recibido el 2025-09-09: 'a.csv'.")]
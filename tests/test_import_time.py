@@ -0,0 +1,13 @@
+# tests/test_import_time.py
+
+import os
+
+from benchmarks import import_time
+
+# Los presupuestos viven en benchmarks/import_time.py. En una máquina lenta o compartida se pueden escalar
+# con IMPORT_TIME_SCALE (equivale a `python -m benchmarks.import_time --scale N`).
+
+
+def test_entry_points_stay_within_their_import_budget():
+    failures = import_time.check(scale=float(os.environ.get("IMPORT_TIME_SCALE", "1")))
+    assert not failures, "\n".join(failures)
@@ -0,0 +1,103 @@
+# tests/test_incidents.py
+
+import ast
+import collections
+import json
+import os
+
+import numpy as np
+import pytest
+
+from incident_agent import cli
+from incident_agent.tools import data_loaders, detection_engine, result_cache
+from incident_agent.tools.incidents import Incident, summarize
+from conftest import REAL_DATES
+
+# Cada plantilla del motor con valores como los que recibe (escalares de numpy incluidos) y el texto que
+# producía el f-string original. La descripción debe ser la misma al armarla directamente y después de
+# pasar por la caché de resultados (JSON).
+FILENAME = np.array(["S1_report_20250801.csv"], dtype=object)[0]
+TEMPLATE_CASES = [
+    ("Faltan {} archivos. Se esperaban ~{:.0f}, se recibieron {}.", (3, np.float64(5.6), 2),
+     "Faltan 3 archivos. Se esperaban ~6, se recibieron 2."),
+    ("Faltan {} archivos. Se esperaban ~{:.0f}, se recibieron {}.", (4, np.int64(4), 0),
+     "Faltan 4 archivos. Se esperaban ~4, se recibieron 0."),
+    ("Archivo marcado como duplicado: '{}'.", (FILENAME,), f"Archivo marcado como duplicado: '{FILENAME}'."),
+    ("Archivo subido múltiples veces hoy: '{}'.", (np.str_("a.csv"),), "Archivo subido múltiples veces hoy: 'a.csv'."),
+    ("Archivo duplicado de la semana anterior: '{}'.", (FILENAME,), f"Archivo duplicado de la semana anterior: '{FILENAME}'."),
+    ("Archivo ya recibido el {}: '{}'.", (str(np.datetime64("2025-09-01")), FILENAME), f"Archivo ya recibido el 2025-09-01: '{FILENAME}'."),
+    ("Archivo con procesamiento fallido: '{}' (Estado: {}).", (FILENAME, "empty"), f"Archivo con procesamiento fallido: '{FILENAME}' (Estado: empty)."),
+    ("Archivo vacío inesperado: '{}'.", (FILENAME,), f"Archivo vacío inesperado: '{FILENAME}'."),
+    ("Variación de volumen: Se recibieron {:,} filas, fuera del rango esperado ({:,} - {:,}).", (np.int64(1234567), 1000, 20000),
+     "Variación de volumen: Se recibieron 1,234,567 filas, fuera del rango esperado (1,000 - 20,000)."),
+    ("Variación de volumen: Se recibieron {:,} filas, fuera del rango esperado ({:,} - {:,}).", (np.float64(2500.0), 1000, 2000),
+     "Variación de volumen: Se recibieron 2,500.0 filas, fuera del rango esperado (1,000 - 2,000)."),
+    ("Archivo '{}' subido a las {} UTC, más de 4h después del límite esperado de las {} UTC.", (FILENAME, "23:59", "09:00"),
+     f"Archivo '{FILENAME}' subido a las 23:59 UTC, más de 4h después del límite esperado de las 09:00 UTC."),
+    ("Archivo '{}' parece ser de un período anterior (Fecha en nombre: {}, Fecha de subida: {}).", (FILENAME, "2025-08-01", "2025-09-12"),
+     f"Archivo '{FILENAME}' parece ser de un período anterior (Fecha en nombre: 2025-08-01, Fecha de subida: 2025-09-12)."),
+]
+
+
+def _engine_templates():
+    with open(detection_engine.__file__, encoding="utf-8") as f: tree = ast.parse(f.read())
+    return {node.value for node in ast.walk(tree) if isinstance(node, ast.Constant) and isinstance(node.value, str)
+            and ("{}" in node.value or "{:" in node.value)}
+
+
+def test_every_engine_template_is_covered():
+    assert _engine_templates() == {template for template, _, _ in TEMPLATE_CASES}
+
+
+@pytest.mark.parametrize("template, args, expected", TEMPLATE_CASES)
+def test_description_matches_the_original_text(data_dir, template, args, expected):
+    incident = Incident("207936", "Tipo", template, "REQUIERE ATENCIÓN", "2025-09-12", args)
+    old = {"source_id": "207936", "incident_type": "Tipo", "description": expected, "severity": "REQUIERE ATENCIÓN", "date": "2025-09-12"}
+    assert incident.to_dict() == old
+    assert list(incident.to_dict()) == list(old)
+
+    restored = Incident.from_row("207936", "2025-09-12", json.loads(json.dumps(incident.to_row())))
+    assert restored.to_dict() == old
+
+    path = os.path.join(data_loaders.get_cache_dir(), "results.json")
+    cache = result_cache.ResultCache(path)
+    cache.put("clave", [incident.to_row()]); cache.save()
+    (row,) = result_cache.ResultCache(path).get("clave")
+    assert Incident.from_row("207936", "2025-09-12", row).to_dict() == old
+
+
+def test_process_error_keeps_its_keys():
+    incident = Incident(None, "Process Error", "No se encontraron Hojas de Vida (CVs).")
+    assert incident.to_dict() == {"incident_type": "Process Error", "description": "No se encontraron Hojas de Vida (CVs)."}
+    # Sin valores, la plantilla es texto literal: las llaves no se interpretan.
+    assert Incident(None, "Process Error", "Falló {x}.").description == "Falló {x}."
+
+
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_ndjson_and_summary_agree_with_the_json_array(data_dir, capsys, date_str):
+    assert cli.main(["--json-only", "analyze", "--date", date_str]) == 0
+    array = json.loads(capsys.readouterr().out)
+    assert cli.main(["--json-only", "analyze", "--date", date_str, "--format", "ndjson"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line) for line in lines] == array
+    # Mismo escape que el array: el texto de cada línea es el de `json.dumps` por defecto.
+    assert lines == [json.dumps(incident) for incident in array]
+
+    assert cli.main(["--json-only", "analyze", "--date", date_str, "--summary"]) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary == summarize(array)
+    assert summary["total"] == len(array)
+    assert summary["by_type"] == dict(collections.Counter(incident["incident_type"] for incident in array))
+    assert summary["by_severity"] == dict(collections.Counter(incident["severity"] for incident in array))
+
+
+def test_consumer_that_stops_early_leaves_no_open_profiling_span(data_dir, monkeypatch):
+    from incident_agent.tools import orchestrator_tools, profiling
+    monkeypatch.setattr(profiling, "_enabled", True)
+    monkeypatch.setattr(profiling, "_records", [])
+    incidents = orchestrator_tools.iter_full_analysis(REAL_DATES[-1])
+    assert next(incidents) is not None
+    assert profiling._stack() == []
+    incidents.close()
+    assert profiling._stack() == []
+    assert {record["name"] for record in profiling._records} >= {"fase 1: recolección", "fase 2: detección"}
@@ -0,0 +1,121 @@
+# tests/test_intraday.py
+
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from incident_agent.tools import cv_store, data_loaders, detection_engine, intraday, snapshot_cache
+from conftest import REAL_DATES
+
+# El modo incremental debe terminar el día con las mismas incidencias que una sola pasada sobre el día
+# completo, aunque los registros lleguen a files.json en otro orden que su uploaded_at.
+
+
+def _inputs(date_str):
+    snapshot_dir = data_loaders.get_snapshot_dir(date_str)
+    store = cv_store.get_default_store()
+    cv_patterns_by_source = {source_id: store.get_cv_patterns(source_id) for source_id in data_loaders.get_all_source_ids()}
+    return (data_loaders.process_files_json(os.path.join(snapshot_dir, "files.json"), date_str),
+            snapshot_cache.load_files_frame(os.path.join(snapshot_dir, "files_last_weekday.json"), date_str), cv_patterns_by_source)
+
+
+def _sorted(incidents):
+    return sorted(json.dumps(incident, sort_keys=True) for incident in incidents)
+
+
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_late_records_older_than_processed_ones_are_analyzed(data_dir, date_str):
+    daily, historical, cv_patterns_by_source = _inputs(date_str)
+    one_pass = intraday.process_update(intraday.IntradayState(date=date_str), daily, historical, cv_patterns_by_source, close_day=True)
+
+    # Primero llegan los registros más recientes; los más antiguos aparecen en la foto siguiente.
+    by_upload = daily.sort_values('uploaded_at', kind='stable')
+    newest = by_upload.iloc[len(by_upload) // 2:].sort_index()
+    state = intraday.IntradayState(date=date_str)
+    incidents = intraday.process_update(state, newest, historical, cv_patterns_by_source)
+    intraday.save_state(state)
+    state = intraday.load_state(date_str)
+    assert state.watermark is not None and len(intraday.select_new_records(daily, state)) == len(daily) - len(newest)
+    incidents += intraday.process_update(state, daily, historical, cv_patterns_by_source, close_day=True)
+
+    assert sum(totals["files"] for totals in state.sources.values()) == len(daily)
+    assert _sorted(incidents) == _sorted(one_pass)
+
+
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_repeated_snapshot_emits_nothing_new(data_dir, date_str):
+    daily, historical, cv_patterns_by_source = _inputs(date_str)
+    state = intraday.IntradayState(date=date_str)
+    intraday.process_update(state, daily, historical, cv_patterns_by_source, close_day=True)
+    assert intraday.select_new_records(daily, state).empty
+    assert intraday.process_update(state, daily, historical, cv_patterns_by_source, close_day=True) == []
+
+
+def test_seen_keys_are_appended_not_rewritten(data_dir):
+    date_str = REAL_DATES[-1]
+    daily, historical, cv_patterns_by_source = _inputs(date_str)
+    first, second = daily.iloc[:len(daily) // 2], daily
+    state = intraday.IntradayState(date=date_str)
+    intraday.process_update(state, first, historical, cv_patterns_by_source)
+    intraday.save_state(state)
+    n_first = state.seen.size
+    assert os.path.getsize(intraday.get_seen_path(date_str)) == n_first * 8
+
+    state = intraday.load_state(date_str)
+    intraday.process_update(state, second, historical, cv_patterns_by_source)
+    with open(intraday.get_seen_path(date_str), 'rb') as f: before = f.read()
+    intraday.save_state(state)
+    with open(intraday.get_seen_path(date_str), 'rb') as f: after = f.read()
+    assert after[:len(before)] == before and len(after) == state.seen.size * 8 > len(before)
+    # El estado JSON ya no lleva las claves: solo cuántas confirma del registro.
+    with open(intraday.get_state_path(date_str), 'r', encoding='utf-8') as f: saved = json.load(f)
+    assert "seen" not in saved and saved["n_seen"] == state.seen.size
+
+
+def test_unconfirmed_seen_keys_are_ignored(data_dir):
+    date_str = REAL_DATES[-1]
+    daily, historical, cv_patterns_by_source = _inputs(date_str)
+    state = intraday.IntradayState(date=date_str)
+    intraday.process_update(state, daily.iloc[:10], historical, cv_patterns_by_source)
+    intraday.save_state(state)
+    # Un corte entre el registro y el estado deja hashes de más: no cuentan como vistos y se pisan al guardar.
+    extra = intraday._record_hashes(daily.iloc[10:20])
+    with open(intraday.get_seen_path(date_str), 'ab') as f: f.write(extra.tobytes())
+    state = intraday.load_state(date_str)
+    assert len(intraday.select_new_records(daily, state)) == len(daily) - 10
+    intraday.process_update(state, daily, historical, cv_patterns_by_source)
+    intraday.save_state(state)
+    assert os.path.getsize(intraday.get_seen_path(date_str)) == state.seen.size * 8
+    assert intraday.select_new_records(daily, intraday.load_state(date_str)).empty
+
+
+def _day(records):
+    return data_loaders._typed_files_frame([source_id for source_id, _ in records], [record for _, record in records])
+
+
+def test_closing_volume_keeps_the_full_day_numeric_type(data_dir):
+    date_str = "2025-09-12"
+    record = lambda filename, rows: {"filename": filename, "rows": rows, "status": "processed", "is_duplicated": False,
+                                     "file_size": 0.1, "uploaded_at": f"{date_str}T08:00:00+00:00", "status_message": None}
+    complete = [("1001", record("a.csv", 10)), ("1001", record("b.csv", 20))]
+    day = complete + [("1001", record("c.csv", None))]
+    summary = pd.DataFrame({"Day": [pd.Timestamp(date_str).day_name()], "Rows": ["Min: 1<br>Max: 5"]})
+    cv_patterns_by_source = {source_id: {"cv_type": "Tipo A (Tabla)", "day_of_week_summary": summary} for source_id in ("1001", "1002")}
+
+    # Un registro sin filas hace float la columna del día completo: "30.0" y "0.0", también en modo incremental.
+    one_pass = detection_engine.run_all_detectors(_day(day), pd.DataFrame(), cv_patterns_by_source, date_str)
+    assert {incident["description"] for incident in one_pass if incident["incident_type"] == "Unexpected Volume Variation"} == {
+        "Variación de volumen: Se recibieron 30.0 filas, fuera del rango esperado (1 - 5).",
+        "Variación de volumen: Se recibieron 0.0 filas, fuera del rango esperado (1 - 5)."}
+    state = intraday.IntradayState(date=date_str)
+    incidents = intraday.process_update(state, _day(complete), pd.DataFrame(), cv_patterns_by_source)
+    intraday.save_state(state)
+    incidents += intraday.process_update(intraday.load_state(date_str), _day(day), pd.DataFrame(), cv_patterns_by_source, close_day=True)
+    assert _sorted(incidents) == _sorted(one_pass)
+
+    # Sin nulos, enteros en ambos caminos.
+    one_pass = detection_engine.run_all_detectors(_day(complete), pd.DataFrame(), cv_patterns_by_source, date_str)
+    state = intraday.IntradayState(date=date_str)
+    assert _sorted(intraday.process_update(state, _day(complete), pd.DataFrame(), cv_patterns_by_source, close_day=True)) == _sorted(one_pass)
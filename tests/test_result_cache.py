@@ -0,0 +1,86 @@
+# tests/test_result_cache.py
+
+import os
+
+import pandas as pd
+import pytest
+
+from incident_agent.tools import cv_store, data_loaders, detection_engine, filename_index, orchestrator_tools, result_cache, snapshot_cache
+from conftest import REAL_DATES
+
+
+def _inputs(date_str):
+    snapshot_dir = data_loaders.get_snapshot_dir(date_str)
+    store = cv_store.get_default_store()
+    cv_patterns_by_source = orchestrator_tools._cv_patterns_by_source(store, data_loaders.get_all_source_ids())
+    return (snapshot_cache.load_files_frame(os.path.join(snapshot_dir, "files.json"), date_str),
+            snapshot_cache.load_files_frame(os.path.join(snapshot_dir, "files_last_weekday.json"), date_str),
+            cv_patterns_by_source, date_str)
+
+
+@pytest.mark.parametrize("date_str", REAL_DATES)
+def test_memoized_matches_engine_cold_and_warm(data_dir, date_str):
+    inputs = _inputs(date_str)
+    expected = detection_engine.run_all_detectors(*inputs)
+    path = os.path.join(data_loaders.get_cache_dir(), "results.json")
+    assert result_cache.run_memoized(*inputs, cache=result_cache.ResultCache(path)) == expected
+    warm = result_cache.ResultCache(path)
+    assert result_cache.run_memoized(*inputs, cache=warm) == expected
+    assert warm.stats["misses"] == 0 and warm.stats["hits"] > 0
+
+
+def test_all_hit_run_does_not_rewrite_the_store(data_dir):
+    inputs = _inputs(REAL_DATES[-1])
+    path = os.path.join(data_loaders.get_cache_dir(), "results.json")
+    result_cache.run_memoized(*inputs, cache=result_cache.ResultCache(path))
+    before = os.stat(path).st_mtime_ns
+    os.utime(path, ns=(before - 10**9, before - 10**9))
+
+    warm = result_cache.ResultCache(path)
+    result_cache.run_memoized(*inputs, cache=warm)
+    assert os.stat(path).st_mtime_ns == before - 10**9
+    # Los aciertos sí quedan registrados (en el archivo de uso).
+    assert result_cache.ResultCache(path).lifetime()["hits"] == warm.stats["hits"] > 0
+
+
+def test_lru_order_survives_a_reload(data_dir):
+    path = os.path.join(data_loaders.get_cache_dir(), "results.json")
+    cache = result_cache.ResultCache(path, max_entries=3)
+    for key in ("a", "b", "c"): cache.put(key, [])
+    cache.save()
+    touched = result_cache.ResultCache(path, max_entries=3)
+    assert touched.get("a") == []
+    touched.save()
+    # "a" se usó después que "b": al llegar "d" se desaloja "b".
+    reloaded = result_cache.ResultCache(path, max_entries=3)
+    reloaded.put("d", [])
+    assert reloaded.get("b") is None and reloaded.get("a") == []
+
+
+@pytest.mark.parametrize("module", [detection_engine, detection_engine.detectors, filename_index, cv_store],
+                         ids=["engine", "detectors", "history_lookup", "cv_projection"])
+def test_code_version_changes_with_the_detector_source(module, tmp_path, monkeypatch):
+    def version_with(source: bytes) -> str:
+        path = tmp_path / os.path.basename(module.__file__)
+        path.write_bytes(source)
+        monkeypatch.setattr(module, "__file__", str(path))
+        monkeypatch.setattr(result_cache, "_code_version", None)
+        return result_cache.detector_code_version()
+
+    with open(module.__file__, 'rb') as f: source = f.read()
+    unchanged = version_with(source)
+    assert version_with(source + b"\n# cambio de una regla\n") != unchanged
+    assert version_with(source) == unchanged
+
+
+def test_keys_do_not_depend_on_the_timestamp_unit(data_dir):
+    date_str = REAL_DATES[-1]
+    files_json = os.path.join(data_loaders.get_snapshot_dir(date_str), "files.json")
+    streamed = data_loaders.process_files_json(files_json, date_str)
+    cached = snapshot_cache.load_files_frame(files_json, date_str)
+    cv_patterns_by_source = {source_id: {"cv_type": "Tipo A (Tabla)"} for source_id in streamed['source_id'].astype(str).unique()}
+    # µs (streaming) y ns (caché columnar) son el mismo instante: la misma clave.
+    for unit in ("us", "ns"):
+        daily = streamed.assign(uploaded_at=streamed['uploaded_at'].dt.as_unit(unit))
+        assert result_cache.source_keys(daily, pd.DataFrame(), cv_patterns_by_source, date_str) == \
+            result_cache.source_keys(cached, pd.DataFrame(), cv_patterns_by_source, date_str)
@@ -0,0 +1,120 @@
+# tests/test_service.py
+
+import asyncio
+import io
+import json
+import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from incident_agent import service
+from incident_agent.tools import data_loaders, orchestrator_tools
+from conftest import REAL_DATES
+
+_run_full_analysis = orchestrator_tools.run_full_analysis
+
+
+class ListSink:
+    def __init__(self): self.written = {}
+    def write(self, date_str, incidents): self.written[date_str] = incidents
+    def close(self): pass
+
+
+class ThreadedService(service.WatchService):
+    # Hilos en lugar de procesos: los reemplazos de `monkeypatch` llegan a los workers.
+    def _new_pool(self): return ThreadPoolExecutor(max_workers=self.workers)
+
+
+async def _run_until(watch, condition, timeout=60.0):
+    stop = asyncio.Event()
+    task = asyncio.create_task(watch.run(stop))
+    loop = asyncio.get_running_loop(); deadline = loop.time() + timeout
+    while not condition() and loop.time() < deadline: await asyncio.sleep(0.05)
+    stop.set()
+    return await task
+
+
+def test_failed_analysis_is_counted_and_not_marked_done(data_dir, monkeypatch):
+    failing = REAL_DATES[0]
+    run_full_analysis = orchestrator_tools.run_full_analysis
+
+    def flaky(date_str, tool_context=None):
+        if date_str == failing: raise RuntimeError("foto ilegible")
+        return run_full_analysis(date_str)
+
+    monkeypatch.setattr(orchestrator_tools, "run_full_analysis", flaky)
+    sink = ListSink()
+    watch = ThreadedService(sink, workers=2, interval=0.05, debounce=0.0, retry_base=0.01)
+    metrics = asyncio.run(_run_until(watch, lambda: len(sink.written) == len(REAL_DATES) - 1 and watch.metrics.failed >= 2))
+
+    assert metrics.failed >= 2  # la fecha que falla vuelve a la cola
+    assert failing not in sink.written and failing not in watch.done
+    assert set(sink.written) == set(REAL_DATES[1:]) == set(watch.done)
+    assert not any(incident["incident_type"] == "Process Error" for incidents in sink.written.values() for incident in incidents)
+
+
+def test_pool_swap_does_not_break_submissions(data_dir):
+    watch = ThreadedService(ListSink(), workers=2)
+    watch.pool = watch._new_pool()
+    errors, stop = [], threading.Event()
+
+    def reload_forever():
+        while not stop.is_set(): watch._reload_cvs([])
+
+    reloader = threading.Thread(target=reload_forever); reloader.start()
+    try:
+        for _ in range(200):
+            try:
+                with watch._pool_lock: future = watch.pool.submit(sum, [1, 2])
+                assert future.result() == 3
+            except RuntimeError as e: errors.append(e)
+    finally:
+        stop.set(); reloader.join(); watch.pool.shutdown()
+    assert not errors
+
+
+def test_failing_date_backs_off_exponentially(data_dir, monkeypatch):
+    attempts = []
+
+    def always_fails(date_str, tool_context=None):
+        attempts.append(date_str); raise RuntimeError("foto ilegible")
+
+    monkeypatch.setattr(data_loaders, "list_snapshot_dates", lambda: REAL_DATES[:1])
+    monkeypatch.setattr(orchestrator_tools, "run_full_analysis", always_fails)
+    watch = ThreadedService(ListSink(), workers=1, interval=0.01, debounce=0.0, retry_base=0.1, retry_max=10.0)
+    asyncio.run(_run_until(watch, lambda: False, timeout=1.0))
+
+    # Esperas de 0.1, 0.2, 0.4, 0.8 s: en un segundo caben unos cuatro intentos, no uno por sondeo (~100).
+    assert 2 <= len(attempts) <= 5
+    assert [watch._retry_delay(n) for n in (1, 2, 3, 9)] == [0.1, 0.2, 0.4, 10.0]
+
+
+def _dies_once(date_str, tool_context=None):
+    # Corre en el worker (proceso hijo): la primera vez que ve la fecha, el proceso termina sin aviso.
+    marker = os.path.join(data_loaders.DATA_BASE_PATH, f"killed-{date_str}")
+    if date_str == REAL_DATES[0] and not os.path.exists(marker):
+        open(marker, 'w').close(); os._exit(1)
+    return _run_full_analysis(date_str)
+
+
+def test_killed_worker_is_replaced_and_its_date_retried(data_dir, monkeypatch):
+    # Pool de procesos real: los hijos (fork) heredan el reemplazo, que se envía por referencia a este módulo.
+    monkeypatch.setattr(orchestrator_tools, "run_full_analysis", _dies_once)
+    sink = ListSink()
+    watch = service.WatchService(sink, workers=2, interval=0.05, debounce=0.0, retry_base=0.01)
+    metrics = asyncio.run(_run_until(watch, lambda: len(sink.written) == len(REAL_DATES)))
+
+    assert metrics.pool_restarts >= 1 and metrics.failed >= 1
+    assert set(sink.written) == set(REAL_DATES) == set(watch.done)
+    assert os.path.exists(os.path.join(data_dir, f"killed-{REAL_DATES[0]}"))
+
+
+def test_stdout_sink_resolves_stdout_when_writing(monkeypatch):
+    sink = service.StdoutSink()
+    captured = io.StringIO()
+    monkeypatch.setattr(sys, "stdout", captured)
+    incident = {"source_id": "1001", "incident_type": "Failed File", "description": "Archivo con procesamiento fallido: 'ñ.csv'."}
+    sink.write("2025-09-12", [incident])
+    # Mismo formato que --ndjson (acentos escapados).
+    assert captured.getvalue() == json.dumps(incident) + "\n"
@@ -0,0 +1,98 @@
+# tests/test_sharding.py
+
+import json
+import os
+
+import pytest
+
+from incident_agent import sharding
+from incident_agent.tools import data_loaders, orchestrator_tools, snapshot_cache
+from conftest import REAL_DATES
+
+# Las particiones deben combinarse en exactamente la salida de un análisis completo, y la combinación
+# debe señalar (no ocultar) cualquier partición faltante, fallida o calculada sobre otros datos.
+
+DATE = REAL_DATES[-1]
+SOURCES = [str(1000 + i) for i in range(2000)]
+
+
+def test_jump_hash_is_deterministic_and_balanced():
+    assert [sharding.shard_of(source_id, 8) for source_id in SOURCES] == [sharding.shard_of(source_id, 8) for source_id in SOURCES]
+    assert all(sharding.shard_of(source_id, 1) == 0 for source_id in SOURCES)
+    sizes = [len(shard) for shard in sharding.partition(SOURCES, 8)]
+    assert sum(sizes) == len(SOURCES) and max(sizes) < 1.3 * len(SOURCES) / 8
+    with pytest.raises(ValueError): sharding.shard_of("1001", 0)
+
+
+@pytest.mark.parametrize("n_shards", [1, 2, 5, 8, 13])
+def test_growing_by_one_shard_only_moves_sources_to_the_new_one(n_shards):
+    before = {source_id: sharding.shard_of(source_id, n_shards) for source_id in SOURCES}
+    after = {source_id: sharding.shard_of(source_id, n_shards + 1) for source_id in SOURCES}
+    moved = [source_id for source_id in SOURCES if before[source_id] != after[source_id]]
+    assert all(after[source_id] == n_shards for source_id in moved)
+    assert 0 < len(moved) < 1.5 * len(SOURCES) / (n_shards + 1)
+
+
+def test_partition_keeps_the_master_order():
+    for shard in sharding.partition(SOURCES, 5): assert shard == sorted(shard, key=SOURCES.index)
+
+
+def _run_all_shards(output_dir, n_shards):
+    for shard in range(n_shards): sharding.run_shard(DATE, shard, n_shards, output_dir)
+
+
+def test_merged_shards_match_a_full_analysis(data_dir, tmp_path):
+    output_dir = str(tmp_path / "shards")
+    _run_all_shards(output_dir, 3)
+    # Con la caché fría, las particiones leen en streaming solo sus fuentes: no construyen la caché compartida.
+    files_json = os.path.join(data_loaders.get_snapshot_dir(DATE), "files.json")
+    assert not os.path.exists(snapshot_cache.get_cache_path(files_json))
+
+    merged, problems = sharding.merge_shards(DATE, 3, output_dir)
+    assert problems == {}
+    assert merged == orchestrator_tools.run_full_analysis(DATE)
+    # Con la caché ya construida, la misma salida.
+    snapshot_cache.warm_snapshot_caches([DATE])
+    _run_all_shards(output_dir, 3)
+    assert sharding.merge_shards(DATE, 3, output_dir) == (merged, {})
+
+
+def _rewrite_shard(output_dir, shard, n_shards, **changes):
+    path = sharding.get_shard_path(output_dir, DATE, shard, n_shards)
+    with open(path, 'r', encoding='utf-8') as f: payload = json.load(f)
+    payload.update(changes)
+    with open(path, 'w', encoding='utf-8') as f: json.dump(payload, f)
+
+
+def _problems(output_dir, n_shards):
+    merged, problems = sharding.merge_shards(DATE, n_shards, output_dir)
+    errors = [incident for incident in merged if incident["incident_type"] == "Process Error"]
+    assert len(errors) == len(problems)
+    return problems
+
+
+def test_missing_failed_and_stale_shards_are_reported(data_dir, tmp_path, monkeypatch):
+    output_dir = str(tmp_path / "shards")
+    _run_all_shards(output_dir, 3)
+
+    os.remove(sharding.get_shard_path(output_dir, DATE, 0, 3))
+    assert _problems(output_dir, 3) == {0: "faltante"}
+
+    def broken(*args, **kwargs): raise RuntimeError("disco lleno")
+    monkeypatch.setattr(orchestrator_tools, "run_sources_analysis", broken)
+    sharding.run_shard(DATE, 0, 3, output_dir)
+    monkeypatch.undo()
+    problems = _problems(output_dir, 3)
+    assert list(problems) == [0] and problems[0].startswith("fallida") and "disco lleno" in problems[0]
+
+    sharding.run_shard(DATE, 0, 3, output_dir)
+    assert _problems(output_dir, 3) == {}
+    _rewrite_shard(output_dir, 1, 3, sources=sharding.partition(data_loaders.get_all_source_ids(), 3)[1][1:])
+    assert _problems(output_dir, 3) == {1: "calculada con otra lista de fuentes (¿cambiaron los CVs?)"}
+
+    # La foto del día cambió después de calcular las particiones: ninguna se combina.
+    files_json = os.path.join(data_loaders.get_snapshot_dir(DATE), "files.json")
+    stat = os.stat(files_json)
+    os.utime(files_json, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    problems = _problems(output_dir, 3)
+    assert problems[0] == problems[2] == "calculada sobre otra versión de la foto diaria"
@@ -0,0 +1,95 @@
+# tests/test_snapshot_cache.py
+
+import json
+import os
+
+import pytest
+
+from incident_agent.tools import data_loaders, snapshot_cache
+from conftest import REAL_DATES
+
+# La caché columnar se reutiliza mientras el contenido del JSON no cambie: un mtime nuevo con el mismo
+# contenido solo actualiza la huella de meta.json; un contenido distinto reconstruye las columnas.
+
+DATE = REAL_DATES[-1]
+
+
+@pytest.fixture
+def files_json(data_dir) -> str:
+    return os.path.join(data_loaders.get_snapshot_dir(DATE), "files.json")
+
+
+def _meta(cache_path):
+    with open(os.path.join(cache_path, snapshot_cache.META_FILENAME), 'r', encoding='utf-8') as f: return json.load(f)
+
+
+def _no_rebuild(*args, **kwargs):
+    raise AssertionError("la caché no debía reconstruirse")
+
+
+def test_touched_snapshot_keeps_the_cache(files_json, monkeypatch):
+    cache_path = snapshot_cache.ensure_snapshot_cache(files_json)
+    stat = os.stat(files_json)
+    os.utime(files_json, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    monkeypatch.setattr(snapshot_cache, "build_snapshot_cache", _no_rebuild)
+    assert snapshot_cache.ensure_snapshot_cache(files_json) == cache_path
+    assert _meta(cache_path)["mtime_ns"] == stat.st_mtime_ns + 10**9
+    # Con la huella al día, la siguiente lectura ni siquiera rehace el SHA-1.
+    monkeypatch.setattr(data_loaders, "file_sha1", _no_rebuild)
+    assert snapshot_cache.ensure_snapshot_cache(files_json) == cache_path
+
+
+def test_changed_snapshot_rebuilds_the_cache(files_json):
+    before = snapshot_cache.load_files_frame(files_json, DATE)
+    with open(files_json, 'r', encoding='utf-8') as f: data = json.load(f)
+    source_id, records = next((source_id, records) for source_id, records in data.items()
+                              if any(record["uploaded_at"].startswith(DATE) for record in records))
+    record = next(record for record in records if record["uploaded_at"].startswith(DATE))
+    record["rows"] = 123456789
+    with open(files_json, 'w', encoding='utf-8') as f: json.dump(data, f, indent=4)
+
+    after = snapshot_cache.load_files_frame(files_json, DATE)
+    assert len(after) == len(before)
+    changed = after[(after['source_id'].astype(str) == source_id) & (after['filename'] == record["filename"])]
+    assert 123456789 in set(changed['rows'])
+    assert _meta(snapshot_cache.get_cache_path(files_json))["sha1"] == data_loaders.file_sha1(files_json)
+
+
+def test_interrupted_meta_rewrite_leaves_the_previous_meta(files_json, monkeypatch):
+    cache_path = snapshot_cache.ensure_snapshot_cache(files_json)
+    meta = _meta(cache_path)
+    stat = os.stat(files_json)
+    os.utime(files_json, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def crash(src, dst): raise OSError("corte de energía")
+    monkeypatch.setattr(os, "replace", crash)
+    with pytest.raises(OSError): snapshot_cache.ensure_snapshot_cache(files_json)
+    assert _meta(cache_path) == meta
+
+
+def _leftovers(cache_path):
+    parent = os.path.dirname(cache_path)
+    return [name for name in os.listdir(parent) if name != os.path.basename(cache_path)]
+
+
+def test_second_build_of_the_same_snapshot_keeps_the_installed_cache(files_json, monkeypatch):
+    cache_path = snapshot_cache.build_snapshot_cache(files_json)
+    installed = os.stat(os.path.join(cache_path, snapshot_cache.META_FILENAME)).st_ino
+    # Otro nodo termina la misma caché después: su os.replace choca con la carpeta ya instalada.
+    monkeypatch.setattr(data_loaders.socket, "gethostname", lambda: "nodo-b")
+    assert snapshot_cache.build_snapshot_cache(files_json) == cache_path
+    assert os.stat(os.path.join(cache_path, snapshot_cache.META_FILENAME)).st_ino == installed
+    assert _leftovers(cache_path) == []
+    assert len(snapshot_cache.load_files_frame(files_json, DATE)) > 0
+
+
+@pytest.mark.parametrize("stale", ["other_content", "incomplete"])
+def test_build_replaces_a_stale_cache(files_json, stale):
+    cache_path = snapshot_cache.build_snapshot_cache(files_json)
+    if stale == "incomplete": os.remove(os.path.join(cache_path, snapshot_cache.META_FILENAME))
+    else:
+        with open(files_json, 'a', encoding='utf-8') as f: f.write("\n")
+    assert snapshot_cache.build_snapshot_cache(files_json) == cache_path
+    assert _meta(cache_path)["sha1"] == data_loaders.file_sha1(files_json)
+    assert _leftovers(cache_path) == []